@@ -0,0 +1,205 @@
+"""
+Statystyki czasowe (np. godzinowe, dobowe) pomiarów czujnika.
+
+Przebiegi są dzielone na przedziały czasu (liczone od północy czasu
+lokalnego), a dla każdej pozycji i przedziału liczone są min, średnia,
+max i odchylenie standardowe (oraz opcjonalnie percentyle). Wszystkie
+przedziały są liczone naraz operacjami ufunc.reduceat na macierzy
+(przebieg × pozycja); puste komórki (NaN) są pomijane.
+
+Plik wynikowy ma wiersz na przedział i pozycję:
+    bucket_start;position;count;min;mean;max;std[;p05;p95...]
+"""
+
+import csv
+import os
+
+import numpy as np
+
+import dts_metrics as metrics
+from dts_cube import format_values
+from dts_time import format_datetimes
+
+
+# Jednostki długości przedziału -> sekundy
+_UNITS = {'s': 1, 'min': 60, 'h': 3600, 'd': 86400}
+
+# Statystyki zawsze liczone dla przedziału
+STATS = ('min', 'mean', 'max', 'std')
+
+
+def parse_bucket(text):
+    """
+    Parsuje długość przedziału, np. 15min, 1h, 6h, 1d.
+
+    Returns:
+        int: Długość przedziału [s]
+    """
+    text = text.strip().lower()
+    # Najpierw dłuższe jednostki (min przed s)
+    for unit, factor in sorted(_UNITS.items(), key=lambda item: -len(item[0])):
+        if text.endswith(unit):
+            number = text[:-len(unit)] or '1'
+            try:
+                seconds = int(float(number) * factor)
+            except ValueError:
+                break
+            if seconds > 0:
+                return seconds
+            break
+    raise ValueError(f"Niepoprawny przedział czasu: {text} (np. 15min, 1h, 1d)")
+
+
+def parse_percentiles(text):
+    """Parsuje listę percentyli oddzielonych przecinkami, np. 5,95."""
+    if not text:
+        return ()
+    try:
+        values = tuple(float(part) for part in text.split(','))
+    except ValueError:
+        raise ValueError(f"Niepoprawna lista percentyli: {text}")
+    if any(not 0 <= q <= 100 for q in values):
+        raise ValueError(f"Percentyle muszą być z zakresu 0-100: {text}")
+    return values
+
+
+def bucket_label(seconds):
+    """Zwraca krótką nazwę przedziału do nazwy pliku (np. 1h, 15min, 1d)."""
+    for unit, factor in sorted(_UNITS.items(), key=lambda item: -item[1]):
+        if seconds % factor == 0:
+            return f"{seconds // factor}{unit}"
+    return f"{seconds}s"
+
+
+def aggregate(times, data, seconds, percentiles=()):
+    """
+    Liczy statystyki pomiarów w przedziałach czasu.
+
+    Args:
+        times: Czasy przebiegów (datetime64[s])
+        data: Temperatury (przebieg × pozycja), NaN = brak
+        seconds: Długość przedziału [s]
+        percentiles: Percentyle do policzenia (0-100)
+
+    Returns:
+        tuple: (początki przedziałów jako datetime64[s], liczba pomiarów
+            (przedział × pozycja), słownik statystyka -> macierz
+            (przedział × pozycja)); statystyki to STATS i p<q> dla percentyli
+    """
+    times = np.asarray(times, dtype='datetime64[s]')
+    data = np.asarray(data, dtype=np.float64)
+
+    # Przedziały wymagają przebiegów w kolejności czasu
+    if len(times) > 1 and np.any(times[1:] < times[:-1]):
+        order = np.argsort(times, kind='stable')
+        times, data = times[order], data[order]
+
+    bucket_ids = times.astype(np.int64) // seconds
+    starts = np.flatnonzero(np.r_[True, bucket_ids[1:] != bucket_ids[:-1]]) if len(times) else \
+        np.empty(0, dtype=np.intp)
+    bucket_times = (bucket_ids[starts] * seconds).astype('datetime64[s]')
+    if not len(starts):
+        empty = np.empty((0, data.shape[1]))
+        stats = {name: empty for name in STATS}
+        stats.update({percentile_name(q): empty for q in percentiles})
+        return bucket_times, empty.astype(np.int64), stats
+
+    valid = ~np.isnan(data)
+    counts = np.add.reduceat(valid, starts, axis=0)
+    filled = np.where(valid, data, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.add.reduceat(filled, starts, axis=0) / counts
+        # Odchylenie standardowe (populacyjne) z odchyleń od średniej przedziału
+        sizes = np.diff(np.r_[starts, len(times)])
+        deviation = np.where(valid, data - np.repeat(mean, sizes, axis=0), 0.0)
+        std = np.sqrt(np.add.reduceat(deviation ** 2, starts, axis=0) / counts)
+
+    stats = {
+        # fmin/fmax pomijają NaN (NaN tylko, gdy cały przedział jest pusty)
+        'min': np.fmin.reduceat(data, starts, axis=0),
+        'mean': mean,
+        'max': np.fmax.reduceat(data, starts, axis=0),
+        'std': std,
+    }
+
+    if percentiles:
+        bounds = np.r_[starts, len(times)]
+        values = np.full((len(percentiles), len(starts), data.shape[1]), np.nan)
+        for b in range(len(starts)):
+            block = data[bounds[b]:bounds[b + 1]]
+            columns = counts[b] > 0
+            if np.any(columns):
+                values[:, b, columns] = np.nanpercentile(block[:, columns], percentiles, axis=0)
+        for q, value in zip(percentiles, values):
+            stats[percentile_name(q)] = value
+
+    return bucket_times, counts, stats
+
+
+def percentile_name(q):
+    """Zwraca nazwę kolumny percentyla (np. p05, p95, p99.9)."""
+    return f"p{q:02.0f}" if float(q).is_integer() else f"p{q:g}"
+
+
+def write_aggregate_csv(filepath, bucket_times, positions, counts, stats):
+    """
+    Zapisuje statystyki przedziałów (wiersz na przedział i pozycję).
+
+    Args:
+        filepath: Ścieżka pliku
+        bucket_times: Początki przedziałów (datetime64[s])
+        positions: Pozycje [m] (w kolejności kolumn statystyk)
+        counts: Liczba pomiarów (przedział × pozycja)
+        stats: Słownik statystyka -> macierz (przedział × pozycja)
+    """
+    names = list(stats)
+    n_positions = len(positions)
+    position_texts = [f"{position:.2f}" for position in np.asarray(positions).tolist()]
+
+    with open(filepath, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['bucket_start', 'position', 'count'] + names)
+
+        for b, stamp in enumerate(format_datetimes(bucket_times)):
+            columns = [[stamp] * n_positions, position_texts, counts[b].tolist()]
+            for name in names:
+                columns.append(format_values(stats[name][b], 3 if name == 'std' else 2))
+            writer.writerows(zip(*columns))
+
+
+class Aggregation:
+    """Ustawienia statystyk czasowych eksportu (długość przedziału i percentyle)."""
+
+    def __init__(self, bucket, percentiles=()):
+        """
+        Args:
+            bucket: Długość przedziału (tekst jak 1h albo liczba sekund)
+            percentiles: Percentyle do policzenia (0-100)
+        """
+        self.seconds = parse_bucket(bucket) if isinstance(bucket, str) else int(bucket)
+        if self.seconds <= 0:
+            raise ValueError(f"Niepoprawny przedział czasu: {bucket}")
+        self.percentiles = tuple(percentiles)
+        self.label = bucket_label(self.seconds)
+
+    def filename(self, name):
+        """Zwraca nazwę pliku statystyk czujnika (np. Czujnik_A_1h.csv)."""
+        return f"{name.replace(' ', '_')}_{self.label}.csv"
+
+    def export(self, filepath, times, positions, data):
+        """
+        Liczy statystyki i zapisuje je do pliku.
+
+        Returns:
+            int: Liczba przedziałów
+        """
+        with metrics.stage('aggregate') as stage:
+            bucket_times, counts, stats = aggregate(times, data, self.seconds, self.percentiles)
+            stage.add(rows=len(bucket_times), cells=np.size(data))
+
+        with metrics.stage('csv_write') as stage:
+            write_aggregate_csv(filepath, bucket_times, positions, counts, stats)
+            stage.add(rows=counts.size, cells=counts.size * (len(stats) + 1),
+                      bytes_written=os.path.getsize(filepath))
+        return len(bucket_times)
@@ -0,0 +1,89 @@
+"""
+Oś pozycji pomiarowych z wyszukiwaniem najbliższej pozycji w O(1).
+
+Reflektometr zapisuje pozycje na równomiernej siatce (zwykle co 0.25 m),
+więc indeks najbliższej pozycji można wyliczyć arytmetycznie zamiast
+przeszukiwać całą oś. Dla siatki nierównomiernej (ale rosnącej) używane
+jest wyszukiwanie binarne, a dla pozostałych - pełne przeszukanie.
+Wynik jest zawsze taki sam jak np.argmin(np.abs(pozycje - wartość)),
+łącznie z wyborem niższego indeksu przy remisie.
+"""
+
+import numpy as np
+
+
+# Względna tolerancja odchyleń kroku siatki (zaokrąglenia zapisu pozycji)
+UNIFORM_TOLERANCE = 1e-6
+
+
+class PositionAxis:
+    """Oś pozycji [m] z szybkim wyszukiwaniem najbliższego indeksu."""
+
+    def __init__(self, positions):
+        self.positions = np.asarray(positions, dtype=np.float64)
+        self.step = None
+        self.increasing = False
+
+        n = len(self.positions)
+        if n >= 2:
+            steps = np.diff(self.positions)
+            self.increasing = bool(np.all(steps > 0))
+            step = (self.positions[-1] - self.positions[0]) / (n - 1)
+            if self.increasing and np.allclose(steps, step, rtol=0,
+                                               atol=abs(step) * UNIFORM_TOLERANCE):
+                self.step = step
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def uniform(self):
+        """Czy pozycje tworzą równomierną siatkę."""
+        return self.step is not None
+
+    def index(self, value):
+        """
+        Zwraca indeks pozycji najbliższej podanej wartości.
+
+        Args:
+            value: Pozycja [m] (liczba lub napis)
+
+        Returns:
+            int: Indeks najbliższej pozycji
+
+        Raises:
+            ValueError: Dla wartości, która nie jest skończoną liczbą (np. inf, nan)
+        """
+        value = float(value)
+        if not np.isfinite(value):
+            raise ValueError(f"Niepoprawna pozycja: {value}")
+        n = len(self.positions)
+        if n == 0:
+            raise ValueError("Brak pozycji pomiarowych")
+
+        if self.step is not None:
+            guess = int(np.floor((value - self.positions[0]) / self.step + 0.5))
+        elif self.increasing:
+            guess = int(np.searchsorted(self.positions, value))
+        else:
+            return int(np.argmin(np.abs(self.positions - value)))
+
+        # Sprawdź sąsiadów wyliczonego indeksu (zaokrąglenia, remisy)
+        lo = min(max(guess - 1, 0), n - 1)
+        hi = min(max(guess + 1, 0), n - 1)
+        candidates = self.positions[lo:hi + 1]
+        return lo + int(np.argmin(np.abs(candidates - value)))
+
+    def nearest(self, value):
+        """Zwraca najbliższą dostępną pozycję [m]."""
+        return float(self.positions[self.index(value)])
+
+    def index_range(self, start, end):
+        """
+        Zwraca zakres indeksów dla pozycji od start do end (najbliższe pozycje).
+
+        Returns:
+            tuple: (pierwszy_indeks, ostatni_indeks) - rosnąco, włącznie
+        """
+        first, last = self.index(start), self.index(end)
+        return min(first, last), max(first, last)
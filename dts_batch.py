@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Przetwarzanie wsadowe pomiarów AP Sensing bez interfejsu graficznego.
+
+Scala pliki CSV z folderu, kalibruje czujniki pomiarami referencyjnymi
+i eksportuje wszystkie czujniki zdefiniowane w pliku układu (JSON/TOML).
+Korzysta z tego samego kodu co aplikacja (dts_engine.py).
+"""
+
+import argparse
+import os
+import sys
+
+import dts_metrics as metrics
+from dts_aggregate import Aggregation, parse_percentiles
+from dts_cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE, ParsedFileCache
+from dts_dedup import DuplicateReport
+from dts_engine import load_sensor_layout, run_batch
+from dts_export import EXPORT_FORMATS
+from dts_grid import GridResampler, parse_grid
+from dts_source import find_data_files
+from dts_time import parse_time_bound, timezone_offset
+
+
+def main():
+    """Główna funkcja programu."""
+    parser = argparse.ArgumentParser(description="Wsadowe przetwarzanie pomiarów AP Sensing")
+    parser.add_argument('input_folder', help="folder z plikami CSV (także .csv.gz/.bz2/.xz i .zip)")
+    parser.add_argument('layout', help="układ czujników (.json lub .toml)")
+    parser.add_argument('-o', '--output', default='eksport',
+                        help="folder zapisu plików czujników (domyślnie: %(default)s)")
+    parser.add_argument('--reference', help="plik referencyjny svws_measurements.csv")
+    parser.add_argument('--merged', help="zapisz także scalony plik pod podaną ścieżką "
+                                         "(.npz, .parquet, .long.csv lub .long.csv.gz "
+                                         "wybiera format)")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv',
+                        help="format plików czujników (domyślnie: %(default)s; "
+                             "parquet wymaga pakietu pyarrow, long/long-gz - format długi)")
+    parser.add_argument('--aggregate', metavar='PRZEDZIAŁ',
+                        help="zamiast pomiarów zapisz statystyki min/mean/max/std skalibrowanych "
+                             "temperatur w przedziałach czasu, np. 15min, 1h, 1d")
+    parser.add_argument('--percentiles', metavar='P1,P2',
+                        help="dodatkowe percentyle statystyk (np. 5,95; wymaga --aggregate)")
+    parser.add_argument('--timezone',
+                        help="strefa czasowa nagłówków plików DTS, np. Europe/Warsaw "
+                             "(domyślnie z pliku układu, AP_SENSING_TIMEZONE lub strefa systemu)")
+    parser.add_argument('--start', help="początek zakresu czasu (RRRR-MM-DD [GG:MM[:SS]]); "
+                                        "wczytywane są tylko pliki zachodzące na zakres")
+    parser.add_argument('--end', help="koniec zakresu czasu włącznie (sama data = cały dzień)")
+    parser.add_argument('--max-time-diff', type=float,
+                        help="maks. różnica czasu dopasowania referencji [s] "
+                             "(domyślnie z pliku układu lub 600)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="liczba procesów parsujących pliki (domyślnie: liczba rdzeni)")
+    parser.add_argument('--threads', type=int, default=1,
+                        help="liczba wątków zapisujących pliki czujników (domyślnie: %(default)s)")
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help="nie pomijaj przebiegów o powtórzonym czasie i tych samych wartościach")
+    parser.add_argument('--resample', action='store_true',
+                        help="przelicz pliki o innej osi pozycji na wspólną siatkę")
+    parser.add_argument('--grid', metavar='START:KONIEC:KROK',
+                        help="siatka dla --resample [m] (domyślnie: oś pierwszego pliku)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="nie używaj pamięci podręcznej sparsowanych plików")
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR),
+                        help="katalog pamięci podręcznej (domyślnie: %(default)s)")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE // 2**20,
+                        help="limit rozmiaru pamięci podręcznej [MB] (domyślnie: %(default)s)")
+    parser.add_argument('--metrics', metavar='PLIK.json',
+                        help="zmierz czas i liczniki etapów i zapisz je w raporcie JSON")
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enable()
+
+    try:
+        csv_files = find_data_files(args.input_folder)
+    except (OSError, ValueError) as e:
+        print(f"BŁĄD: {e}")
+        return 1
+    if not csv_files:
+        print(f"BŁĄD: Nie znaleziono plików CSV w folderze: {args.input_folder}")
+        return 1
+
+    cache = None
+    if not args.no_cache:
+        cache = ParsedFileCache(args.cache_dir, max_size=args.cache_size * 2**20)
+
+    duplicates = None
+    if not args.keep_duplicates:
+        duplicates = DuplicateReport()
+
+    try:
+        resampler = None
+        if args.resample:
+            resampler = GridResampler(parse_grid(args.grid) if args.grid else None)
+
+        if args.timezone:
+            timezone_offset(args.timezone)  # Nieznana strefa - błąd przed scalaniem
+
+        start = parse_time_bound(args.start)
+        end = parse_time_bound(args.end, end=True)
+
+        aggregation = None
+        if args.aggregate:
+            aggregation = Aggregation(args.aggregate, parse_percentiles(args.percentiles))
+        elif args.percentiles:
+            raise ValueError("Opcja --percentiles wymaga opcji --aggregate")
+
+        layout = load_sensor_layout(args.layout)
+        exported = run_batch(csv_files, layout, args.output,
+                             reference_file=args.reference, merged_file=args.merged,
+                             workers=args.workers, cache=cache, max_diff=args.max_time_diff,
+                             threads=args.threads, duplicates=duplicates, resampler=resampler,
+                             timezone=args.timezone, fmt=args.format, start=start, end=end,
+                             aggregation=aggregation)
+    except (OSError, ValueError) as e:
+        print(f"BŁĄD: {e}")
+        return 1
+
+    print(f"\nWyeksportowano {len(exported)} czujników do folderu: {args.output}")
+    metrics.publish(args.metrics)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
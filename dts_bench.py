@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Pomiary wydajności przetwarzania na danych syntetycznych (dts_synth.py).
+
+Dla każdej skali (np. 10MB, 1GB, 10GB) mierzone są etapy:
+    - read: parsowanie każdego pliku (read_dts_csv),
+    - parse / parse_cells: wczytanie próbki plików przez read_dts_csv
+      i przez csv.reader, jak dawne read_csv_file (napisy komórek), także
+      dla plików z pustymi komórkami (parse_missing / parse_missing_cells),
+    - merge: wczytanie i scalenie wszystkich plików (merge_files),
+    - reference_match: dopasowanie pomiarów referencyjnych do przebiegów,
+    - export_merged: zapis scalonego pliku (write_dts_csv),
+    - export_sensor: eksport czujnika z kalibracją (export_sensor).
+
+Każda skala jest uruchamiana w osobnym procesie, więc szczytowe zużycie
+pamięci (peak RSS) dotyczy tylko jej. Wyniki (czas, przepustowość, RSS)
+są zapisywane jako JSON, aby można było śledzić regresje między wersjami.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from dts_cube import read_dts_csv, write_dts_csv
+from dts_engine import ExportContext, export_sensor, make_sensor, merge_files
+from dts_reference import read_reference_csv
+from dts_source import open_data_file
+from dts_synth import dataset_shape, generate_dataset, parse_size
+
+
+# Skale uruchamiane domyślnie (większe podaje się w --scales)
+DEFAULT_SCALES = ['10MB']
+
+# Wersja formatu raportu
+REPORT_VERSION = 2
+
+# Liczba plików, na których read_dts_csv jest porównywane z read_cells
+PARSE_FILES = 10
+
+# Udział pustych komórek w plikach drugiego porównania
+PARSE_MISSING = 0.01
+
+# Wymagane przyspieszenie read_dts_csv względem read_cells
+PARSE_TARGET = 10
+
+
+def peak_rss():
+    """Zwraca szczytowe zużycie pamięci procesu [B] (None, gdy niedostępne, np. w Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux podaje kB, macOS bajty
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def stage_result(seconds, n_bytes, cells):
+    """Zwraca wynik etapu z przepustowością."""
+    return {
+        'seconds': round(seconds, 4),
+        'bytes': n_bytes,
+        'cells': cells,
+        'mb_per_s': round(n_bytes / seconds / 1e6, 2) if seconds > 0 else None,
+        'mcells_per_s': round(cells / seconds / 1e6, 2) if seconds > 0 else None,
+        'peak_rss': peak_rss(),
+    }
+
+
+def prepare_dataset(data_dir, scale, max_files=None, missing=0.0):
+    """
+    Zwraca zestaw danych dla skali, generując go tylko przy pierwszym użyciu.
+
+    Args:
+        data_dir: Katalog danych syntetycznych
+        scale: Nazwa skali (rozmiar danych, np. 10MB)
+        max_files: Największa liczba plików (None = wszystkie pliki skali)
+        missing: Udział pustych komórek
+
+    Returns:
+        dict: Opis zestawu z generate_dataset
+    """
+    folder = Path(data_dir) / (f"{scale}-missing" if missing else scale)
+    meta_path = folder / 'dataset.json'
+    n_files, n_positions, traces = dataset_shape(parse_size(scale))
+    if max_files is not None:
+        n_files = min(n_files, max_files)
+
+    if meta_path.exists():
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            dataset = json.load(f)
+        if dataset['n_files'] == n_files and all(os.path.exists(p) for p in dataset['files']):
+            return dataset
+
+    dataset = generate_dataset(folder, n_files, n_positions, traces, timezone='UTC',
+                               missing=missing)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(dataset, f, indent=2)
+    return dataset
+
+
+def read_cells(filepath):
+    """
+    Czyta plik jak dawne read_csv_file: csv.reader i napisy komórek, bez
+    zamiany na liczby (punkt odniesienia dla read_dts_csv).
+
+    Returns:
+        tuple: (napisy pozycji, napisy pomiarów (kolumna × pozycja))
+    """
+    with open_data_file(filepath) as f:
+        reader = csv.reader(io.TextIOWrapper(f, encoding='latin-1', newline=''), delimiter=';')
+        date_row = next(reader)
+        for _ in range(3):
+            next(reader)
+        positions = []
+        measurements = [[] for _ in date_row[1:]]
+        for row in reader:
+            if not row or not row[0]:
+                continue
+            positions.append(row[0].replace(',', '.'))
+            for column, value in zip(measurements, row[1:]):
+                column.append(value.replace('"', '').replace(',', '.'))
+    return positions, measurements
+
+
+def compare_readers(files, repeats=5):
+    """
+    Mierzy wczytanie plików przez read_dts_csv i przez read_cells (dla
+    każdego najlepszy z repeats przebiegów).
+
+    Returns:
+        tuple: (wynik read_dts_csv, wynik read_cells, przyspieszenie)
+    """
+    n_bytes = sum(os.path.getsize(filepath) for filepath in files)
+    cells = sum(read_dts_csv(filepath).data.size for filepath in files)
+
+    times = []
+    for read in (read_dts_csv, read_cells):
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for filepath in files:
+                read(filepath)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        times.append(best)
+
+    bulk, by_cell = times
+    return (stage_result(bulk, n_bytes, cells), stage_result(by_cell, n_bytes, cells),
+            round(by_cell / bulk, 1) if bulk > 0 else None)
+
+
+def run_scale(scale, data_dir, workers=1):
+    """
+    Mierzy wszystkie etapy dla jednej skali.
+
+    Args:
+        scale: Nazwa skali (rozmiar danych, np. 10MB)
+        data_dir: Katalog danych syntetycznych
+        workers: Liczba procesów parsujących pliki przy scalaniu
+
+    Returns:
+        dict: Wyniki skali (opis danych i wyniki etapów)
+    """
+    dataset = prepare_dataset(data_dir, scale)
+    files = dataset['files']
+    input_bytes = dataset['bytes']
+    stages = {}
+
+    start = time.perf_counter()
+    cells = 0
+    for filepath in files:
+        cells += read_dts_csv(filepath).data.size
+    stages['read'] = stage_result(time.perf_counter() - start, input_bytes, cells)
+
+    speedup = {}
+    stages['parse'], stages['parse_cells'], speedup['full'] = compare_readers(files[:PARSE_FILES])
+    missing = prepare_dataset(data_dir, scale, PARSE_FILES, PARSE_MISSING)
+    stages['parse_missing'], stages['parse_missing_cells'], speedup['missing'] = \
+        compare_readers(missing['files'])
+
+    start = time.perf_counter()
+    merged = merge_files(files, workers)
+    stages['merge'] = stage_result(time.perf_counter() - start, input_bytes, merged.data.size)
+
+    # Czasy referencji są w UTC, tak jak nagłówki wygenerowanych plików
+    start = time.perf_counter()
+    reference = read_reference_csv(dataset['reference'], timezone='UTC')
+    context = ExportContext(merged, reference)
+    for channel in dataset['channels']:
+        context.reference_channel(channel)
+    stages['reference_match'] = stage_result(time.perf_counter() - start,
+                                             dataset['reference_bytes'],
+                                             merged.n_traces * len(dataset['channels']))
+
+    with tempfile.TemporaryDirectory(prefix='dts_bench_') as out_dir:
+        merged_path = Path(out_dir) / 'merged.csv'
+        start = time.perf_counter()
+        write_dts_csv(merged, merged_path, units=False)
+        stages['export_merged'] = stage_result(time.perf_counter() - start,
+                                               merged_path.stat().st_size, merged.data.size)
+        merged_path.unlink()
+
+        # Czujnik na środkowej części światłowodu, skalibrowany pierwszym kanałem
+        channel, ref_position = next(iter(dataset['channels'].items()))
+        positions = merged.positions
+        sensor = make_sensor(merged.axis, 'bench', positions[len(positions) // 4],
+                             positions[3 * len(positions) // 4], ref_channel=channel,
+                             ref_position=ref_position)
+        start = time.perf_counter()
+        path = export_sensor(merged, sensor, out_dir, reference, log=lambda message: None)
+        start_idx, end_idx = merged.axis.index_range(sensor['start'], sensor['end'])
+        stages['export_sensor'] = stage_result(time.perf_counter() - start,
+                                               os.path.getsize(path),
+                                               merged.n_traces * (end_idx - start_idx + 1))
+
+    return {
+        'scale': scale,
+        'dataset': {key: dataset[key] for key in
+                    ('n_files', 'n_positions', 'traces_per_file', 'bytes', 'reference_bytes')},
+        'workers': workers,
+        'stages': stages,
+        'parse_speedup': speedup,
+    }
+
+
+def run_scale_process(scale, data_dir, workers):
+    """Uruchamia pomiar skali w osobnym procesie (osobny peak RSS) i zwraca jego wynik."""
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', scale,
+         '--data-dir', str(data_dir), '--workers', str(workers)],
+        stdout=subprocess.PIPE, check=True, text=True)
+    return json.loads(completed.stdout)
+
+
+def main():
+    """Główna funkcja programu."""
+    parser = argparse.ArgumentParser(description="Pomiary wydajności przetwarzania pomiarów AP Sensing")
+    parser.add_argument('--scales', default=','.join(DEFAULT_SCALES),
+                        help="rozmiary danych oddzielone przecinkami, np. 10MB,1GB,10GB "
+                             "(domyślnie: %(default)s)")
+    parser.add_argument('--data-dir', default=str(Path(tempfile.gettempdir()) / 'dts_bench'),
+                        help="katalog danych syntetycznych, używanych ponownie "
+                             "(domyślnie: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="liczba procesów parsujących pliki przy scalaniu (domyślnie: %(default)s)")
+    parser.add_argument('-o', '--output', help="plik raportu JSON (domyślnie: standardowe wyjście)")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        json.dump(run_scale(args.child, args.data_dir, args.workers), sys.stdout)
+        return
+
+    results = []
+    for scale in args.scales.split(','):
+        scale = scale.strip()
+        print(f"Skala {scale}...", file=sys.stderr)
+        result = run_scale_process(scale, args.data_dir, args.workers)
+        for stage, timing in result['stages'].items():
+            print(f"  {stage:16s} {timing['seconds']:9.3f} s  {timing['mb_per_s'] or 0:8.1f} MB/s",
+                  file=sys.stderr)
+        for kind, speedup in result['parse_speedup'].items():
+            status = "OK" if speedup is not None and speedup >= PARSE_TARGET else "poniżej celu"
+            print(f"  read_dts_csv/{kind}: {speedup}x szybciej niż read_cells "
+                  f"(cel {PARSE_TARGET}x: {status})", file=sys.stderr)
+        results.append(result)
+
+    report = {
+        'version': REPORT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
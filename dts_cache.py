@@ -0,0 +1,161 @@
+"""
+Trwała pamięć podręczna sparsowanych plików CSV AP Sensing.
+
+Pliki z reflektometru nie zmieniają się po zapisaniu, więc wynik
+parsowania (DtsCube) jest zapisywany na dysku jako nieskompresowany
+plik .npz. Kluczem jest ścieżka + rozmiar + czas modyfikacji pliku
+(opcjonalnie skrót zawartości). Wpis zawiera też odcisk osi pozycji,
+aby przy scalaniu nie liczyć go ponownie. Rozmiar katalogu jest ograniczony,
+a najdawniej używane wpisy są usuwane (LRU według czasu modyfikacji
+wpisu, odświeżanego przy każdym trafieniu).
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from dts_cube import DtsCube, read_dts_csv
+from dts_source import open_data_file, source_signature
+
+
+# Wersja formatu wpisów - zmiana unieważnia całą pamięć podręczną
+CACHE_VERSION = 1
+
+# Domyślny katalog (można zmienić zmienną środowiskową AP_SENSING_CACHE_DIR)
+DEFAULT_CACHE_DIR = Path(os.environ.get('AP_SENSING_CACHE_DIR',
+                                        Path.home() / '.cache' / 'ap_sensing'))
+
+# Domyślny limit rozmiaru katalogu [B]
+DEFAULT_CACHE_SIZE = 2 * 1024 ** 3
+
+
+class ParsedFileCache:
+    """Katalog z wpisami .npz dla sparsowanych plików CSV."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_CACHE_SIZE,
+                 content_hash=False):
+        """
+        Args:
+            cache_dir: Katalog pamięci podręcznej (tworzony w razie potrzeby)
+            max_size: Maksymalny łączny rozmiar wpisów [B]
+            content_hash: Czy kluczem ma być skrót zawartości zamiast ścieżki i mtime
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.content_hash = content_hash
+
+    def key(self, filepath):
+        """Zwraca klucz wpisu dla pliku (zależny od ścieżki, rozmiaru i mtime)."""
+        digest = hashlib.sha1(f"v{CACHE_VERSION}|".encode())
+
+        if self.content_hash:
+            with open_data_file(filepath) as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        else:
+            size, mtime_ns = source_signature(filepath)
+            digest.update(f"{Path(filepath).resolve()}|{size}|{mtime_ns}".encode())
+
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        """Zwraca ścieżkę wpisu dla klucza."""
+        return self.cache_dir / f"{key}.npz"
+
+    def load(self, filepath, key=None):
+        """
+        Zwraca kostkę z pamięci podręcznej.
+
+        Args:
+            filepath: Ścieżka do pliku CSV
+            key: Gotowy klucz wpisu (opcjonalnie, aby nie liczyć go ponownie)
+
+        Returns:
+            DtsCube lub None, jeśli brak wpisu
+        """
+        entry = self.entry_path(key or self.key(filepath))
+        try:
+            with np.load(entry) as npz:
+                cube = DtsCube(npz['times'].astype('datetime64[s]'), npz['positions'], npz['data'])
+                if 'grid' in npz.files:
+                    cube.grid_fingerprint = str(npz['grid'])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError):
+            # Uszkodzony wpis - usuń i parsuj ponownie
+            entry.unlink(missing_ok=True)
+            return None
+
+        # Odśwież czas użycia (LRU)
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            pass
+        return cube
+
+    def store(self, filepath, cube, key=None):
+        """Zapisuje kostkę w pamięci podręcznej (atomowo, przez plik tymczasowy)."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = self.entry_path(key or self.key(filepath))
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, times=cube.times.astype(np.int64), positions=cube.positions,
+                         data=cube.data, grid=cube.grid_fingerprint)
+            os.replace(tmp_path, entry)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    def read(self, filepath):
+        """
+        Wczytuje plik CSV, korzystając z pamięci podręcznej.
+
+        Args:
+            filepath: Ścieżka do pliku CSV
+
+        Returns:
+            DtsCube: Przebiegi z pliku
+        """
+        key = self.key(filepath)
+        cube = self.load(filepath, key)
+        if cube is None:
+            cube = read_dts_csv(filepath)
+            self.store(filepath, cube, key)
+        return cube
+
+    def evict(self):
+        """
+        Usuwa najdawniej używane wpisy, aż łączny rozmiar zmieści się w limicie.
+
+        Returns:
+            int: Liczba usuniętych wpisów
+        """
+        if not self.cache_dir.exists():
+            return 0
+
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
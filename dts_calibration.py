@@ -0,0 +1,175 @@
+"""
+Kalibracja czujników pomiarami referencyjnymi (jeden lub wiele punktów).
+
+W każdym punkcie referencyjnym (kanał + metr światłowodu) poprawka
+przebiegu to różnica temperatury referencyjnej i temperatury
+światłowodu w tym miejscu. Poprawka dla pozostałych pozycji czujnika
+zależy od trybu:
+    - offset: jedna poprawka dla całego przebiegu (przy kilku punktach
+      średnia z dostępnych) - dotychczasowa kalibracja jednopunktowa,
+    - linear: prosta poprawka = offset + gradient × pozycja dopasowana
+      metodą najmniejszych kwadratów do punktów przebiegu,
+    - piecewise: interpolacja liniowa między sąsiednimi punktami (poza
+      skrajnymi punktami - wartość najbliższego punktu).
+
+Punkty bez wartości w danym przebiegu (NaN) są pomijane tylko w tym
+przebiegu; przebieg bez żadnego punktu nie jest korygowany (poprawka 0).
+Poprawki są liczone dla wszystkich przebiegów naraz (macierz
+przebieg × pozycja), a przy zapisie porcjami - dla zakresu przebiegów.
+"""
+
+import numpy as np
+
+from dts_cube import to_float64
+
+
+# Tryby kalibracji
+CALIBRATION_MODES = ('offset', 'linear', 'piecewise')
+
+
+def sensor_references(sensor):
+    """
+    Zwraca punkty referencyjne czujnika jako listę (kanał, metr).
+
+    Czujniki bez pola references (np. z formularza aplikacji) mają co
+    najwyżej jeden punkt z pól ref_channel i ref_position.
+    """
+    references = sensor.get('references')
+    if references is not None:
+        return [tuple(reference) for reference in references]
+    if sensor['ref_channel'] is not None and sensor['ref_position'] is not None:
+        return [(sensor['ref_channel'], sensor['ref_position'])]
+    return []
+
+
+def default_mode(n_references):
+    """Zwraca domyślny tryb kalibracji dla liczby punktów referencyjnych."""
+    return 'offset' if n_references < 2 else 'linear'
+
+
+def sensor_mode(sensor):
+    """Zwraca tryb kalibracji czujnika (domyślny, gdy czujnik go nie podaje)."""
+    return sensor.get('calibration') or default_mode(len(sensor_references(sensor)))
+
+
+def check_mode(mode, n_references):
+    """Sprawdza tryb kalibracji (ValueError dla nieznanego lub zbyt małej liczby punktów)."""
+    if mode not in CALIBRATION_MODES:
+        raise ValueError(f"Nieznany tryb kalibracji: {mode} (dostępne: {', '.join(CALIBRATION_MODES)})")
+    if mode != 'offset' and n_references < 2:
+        raise ValueError(f"Kalibracja {mode} wymaga co najmniej dwóch punktów referencyjnych")
+
+
+class SensorCalibration:
+    """Poprawki kalibracji czujnika dla wszystkich przebiegów."""
+
+    def __init__(self, ref_positions, ref_temps, fiber_temps, mode='offset'):
+        """
+        Args:
+            ref_positions: Metry punktów referencyjnych (k)
+            ref_temps: Temperatury referencyjne (przebieg × k), NaN = brak
+            fiber_temps: Temperatury światłowodu w punktach (przebieg × k)
+            mode: Tryb kalibracji (offset, linear lub piecewise)
+        """
+        ref_positions = np.asarray(ref_positions, dtype=np.float64)
+        ref_temps = np.asarray(ref_temps, dtype=np.float64).reshape(-1, len(ref_positions))
+        check_mode(mode, len(ref_positions))
+
+        # Punkty w kolejności pozycji (dla interpolacji)
+        order = np.argsort(ref_positions, kind='stable')
+        self.mode = mode
+        self.ref_positions = ref_positions[order]
+        self.corrections = (ref_temps - np.asarray(fiber_temps, dtype=np.float64)
+                            .reshape(ref_temps.shape))[:, order]
+        self.unmatched = int(np.count_nonzero(np.isnan(ref_temps).any(axis=1)))
+
+    @property
+    def n_traces(self):
+        """Liczba przebiegów."""
+        return len(self.corrections)
+
+    def correction(self, positions, start=0, stop=None):
+        """
+        Zwraca poprawki dla zakresu przebiegów.
+
+        Args:
+            positions: Pozycje kolumn danych [m]
+            start: Pierwszy przebieg
+            stop: Koniec zakresu przebiegów (None = ostatni)
+
+        Returns:
+            np.ndarray: Poprawki (przebieg × 1) w trybie offset albo
+                (przebieg × pozycja) - do dodania do danych
+        """
+        corrections = self.corrections[start:stop]
+        if self.mode == 'offset':
+            return _offsets(corrections)[:, np.newaxis]
+
+        positions = np.asarray(positions, dtype=np.float64)
+        return _project(self.mode, corrections, self.ref_positions, positions)
+
+    def apply(self, data, positions, start=0):
+        """
+        Zwraca skalibrowane dane (float64) dla przebiegów od start.
+
+        Args:
+            data: Temperatury (przebieg × pozycja)
+            positions: Pozycje kolumn danych [m]
+            start: Numer przebiegu pierwszego wiersza data
+        """
+        return to_float64(data) + self.correction(positions, start, start + len(data))
+
+
+def _offsets(corrections):
+    """Poprawka jednopunktowa (średnia z dostępnych punktów, 0 gdy brak)."""
+    if corrections.shape[1] == 1:
+        return np.nan_to_num(corrections[:, 0], nan=0.0)
+
+    valid = ~np.isnan(corrections)
+    counts = valid.sum(axis=1)
+    sums = np.where(valid, corrections, 0.0).sum(axis=1)
+    return np.divide(sums, counts, out=np.zeros(len(sums)), where=counts > 0)
+
+
+def _weights(mode, ref_positions, positions):
+    """
+    Zwraca wagi punktów dla pozycji: poprawka = poprawki_punktów @ wagi.
+
+    Obie metody są liniowe względem poprawek punktów, więc dla danego
+    zestawu dostępnych punktów wystarczy jedna macierz wag (punkt × pozycja).
+    """
+    if len(ref_positions) == 1:
+        return np.ones((1, len(positions)))
+
+    if mode == 'linear':
+        # Prosta najmniejszych kwadratów; pozycje względem środka punktów
+        # (lepsze uwarunkowanie dla długich światłowodów)
+        center = ref_positions.mean()
+        design = np.column_stack([np.ones(len(ref_positions)), ref_positions - center])
+        basis = np.vstack([np.ones(len(positions)), positions - center])
+        return np.linalg.pinv(design).T @ basis
+
+    # Interpolacja liniowa (poza skrajnymi punktami - wartość najbliższego)
+    return np.array([np.interp(positions, ref_positions, unit)
+                     for unit in np.eye(len(ref_positions))])
+
+
+def _project(mode, corrections, ref_positions, positions):
+    """
+    Liczy poprawki (przebieg × pozycja) osobno dla każdego zestawu dostępnych punktów.
+
+    Przebiegi są grupowane według tego, które punkty mają wartość (zwykle
+    wszystkie), a każda grupa to jedno mnożenie macierzy.
+    """
+    valid = ~np.isnan(corrections)
+    result = np.zeros((len(corrections), len(positions)))
+
+    patterns, groups = np.unique(valid, axis=0, return_inverse=True)
+    groups = groups.ravel()
+    for g, pattern in enumerate(patterns):
+        if not pattern.any():
+            continue  # Przebiegi bez żadnego punktu nie są korygowane
+        rows = np.flatnonzero(groups == g)
+        weights = _weights(mode, ref_positions[pattern], positions)
+        result[rows] = corrections[np.ix_(rows, np.flatnonzero(pattern))] @ weights
+    return result
@@ -0,0 +1,429 @@
+"""
+Kolumnowa struktura danych dla pomiarów temperatury AP Sensing (DTS).
+
+DtsCube przechowuje wszystkie przebiegi jako jedną macierz float32
+o wymiarach (liczba_przebiegów, liczba_pozycji), oś czasu jako tablicę
+datetime64 i oś pozycji jako tablicę float. Wycinanie czujnika,
+odwracanie i kalibracja to operacje na widokach tablicy, a nie pętle
+po napisach.
+"""
+
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from functools import cached_property, partial
+
+import numpy as np
+
+import dts_metrics as metrics
+from dts_axis import PositionAxis
+from dts_grid import grid_fingerprint
+from dts_source import open_data_file
+from dts_time import HEADER_FORMAT, format_dates, format_times, parse_header_datetimes
+from dts_tokenize import parse_body
+
+DATE_FORMAT = "%d.%m.%Y"
+TIME_FORMAT = "%H:%M:%S"
+
+# Liczba pozycji zapisywanych naraz przy eksporcie do CSV
+WRITE_BLOCK_POSITIONS = 256
+
+# Rozszerzenie pliku zapisywanego w trakcie eksportu (podmienianego po zakończeniu)
+PART_SUFFIX = '.part'
+
+# Dokładność, z jaką odtwarzamy wartości dziesiętne z pliku przy przejściu
+# float32 -> float64 (AP Sensing zapisuje temperatury z 2 miejscami po przecinku)
+VALUE_DECIMALS = 4
+
+
+def parse_datetime(date_str, time_str):
+    """
+    Parsuje datę i czas z formatu DD.MM.YYYY i HH:MM:SS.
+
+    Args:
+        date_str: Data w formacie DD.MM.YYYY
+        time_str: Czas w formacie HH:MM:SS
+
+    Returns:
+        datetime: Obiekt datetime
+    """
+    datetime_str = f"{date_str} {time_str}"
+    return datetime.strptime(datetime_str, HEADER_FORMAT)
+
+
+def parse_value(text):
+    """
+    Zamienia komórkę z pomiarem (np. '"14,48"') na liczbę.
+
+    Args:
+        text: Tekst komórki (przecinek dziesiętny, opcjonalne cudzysłowy)
+
+    Returns:
+        float: Wartość pomiaru lub NaN dla pustej/niepoprawnej komórki
+    """
+    try:
+        return float(text.replace('"', '').replace(',', '.'))
+    except ValueError:
+        return np.nan
+
+
+def to_float64(values):
+    """
+    Zamienia pomiary float32 na float64 do obliczeń (np. kalibracji).
+
+    Zaokrągla do VALUE_DECIMALS miejsc, dzięki czemu np. 14.48 zapisane
+    jako float32 daje dokładnie float('14.48'), a nie 14.479999542.
+
+    Args:
+        values: Tablica wartości float32
+
+    Returns:
+        np.ndarray: Tablica float64
+    """
+    return np.round(np.asarray(values, dtype=np.float64), VALUE_DECIMALS)
+
+
+def format_values(values, precision=2):
+    """
+    Formatuje wiersz wartości do zapisu w CSV.
+
+    Args:
+        values: Tablica wartości (NaN oznacza brak pomiaru)
+        precision: Liczba miejsc po przecinku
+
+    Returns:
+        list: Lista napisów (pusty napis dla NaN)
+    """
+    fmt = f"{{:.{precision}f}}"
+    return ['' if v != v else fmt.format(v) for v in np.asarray(values).tolist()]
+
+
+class DtsCube:
+    """
+    Macierz pomiarów DTS z osią czasu i osią pozycji.
+
+    Atrybuty:
+        times: datetime64[s], kształt (n_traces,) - czas każdego przebiegu
+        positions: float64, kształt (n_positions,) - pozycje wzdłuż światłowodu [m]
+        data: float32, kształt (n_traces, n_positions) - temperatury [°C], NaN = brak
+    """
+
+    def __init__(self, times, positions, data):
+        self.times = np.asarray(times, dtype='datetime64[s]')
+        self.positions = np.asarray(positions, dtype=np.float64)
+        self.data = np.asarray(data, dtype=np.float32)
+
+        if self.data.shape != (len(self.times), len(self.positions)):
+            raise ValueError(f"Niezgodny kształt danych {self.data.shape}, oczekiwano "
+                             f"({len(self.times)}, {len(self.positions)})")
+
+    @property
+    def n_traces(self):
+        """Liczba przebiegów (kolumn czasowych)."""
+        return len(self.times)
+
+    @property
+    def n_positions(self):
+        """Liczba pozycji pomiarowych."""
+        return len(self.positions)
+
+    @cached_property
+    def axis(self):
+        """Oś pozycji z szybkim wyszukiwaniem najbliższej pozycji (PositionAxis)."""
+        return PositionAxis(self.positions)
+
+    @cached_property
+    def grid_fingerprint(self):
+        """Odcisk osi pozycji (do szybkiego porównywania osi plików)."""
+        return grid_fingerprint(self.positions)
+
+    def datetimes(self):
+        """Zwraca czasy przebiegów jako listę obiektów datetime."""
+        return self.times.astype(object).tolist()
+
+    def date_strings(self):
+        """Zwraca daty przebiegów w formacie DD.MM.YYYY."""
+        return format_dates(self.times)
+
+    def time_strings(self):
+        """Zwraca czasy przebiegów w formacie HH:MM:SS."""
+        return format_times(self.times)
+
+    def take_traces(self, indices):
+        """Zwraca nową kostkę z wybranymi przebiegami (w podanej kolejności)."""
+        return DtsCube(self.times[indices], self.positions, self.data[indices])
+
+    def sort_by_time(self):
+        """Zwraca kostkę z przebiegami posortowanymi chronologicznie (sortowanie stabilne)."""
+        order = np.argsort(self.times, kind='stable')
+        return self.take_traces(order)
+
+    def time_window(self, start=None, end=None):
+        """
+        Zwraca kostkę ograniczoną do przebiegów z zakresu czasu [start, end].
+
+        Przebiegi muszą być posortowane chronologicznie (jak po scaleniu).
+
+        Args:
+            start: Początek zakresu (datetime/datetime64, None = bez ograniczenia)
+            end: Koniec zakresu włącznie (None = bez ograniczenia)
+
+        Returns:
+            DtsCube: Kostka z widokami na wybrane przebiegi
+        """
+        i0, i1 = 0, self.n_traces
+        if start is not None:
+            i0 = int(np.searchsorted(self.times, np.datetime64(start, 's'), side='left'))
+        if end is not None:
+            i1 = int(np.searchsorted(self.times, np.datetime64(end, 's'), side='right'))
+        return self.trace_slice(i0, max(i0, i1))
+
+    def trace_slice(self, start, stop):
+        """Zwraca kostkę z przebiegami [start, stop) (widoki, bez kopiowania)."""
+        return DtsCube(self.times[start:stop], self.positions, self.data[start:stop])
+
+    def column(self, idx):
+        """Zwraca temperatury na jednej pozycji dla wszystkich przebiegów (widok)."""
+        return self.data[:, idx]
+
+    def position_slice(self, start_idx, end_idx, reverse=False):
+        """
+        Wycina zakres pozycji jako widok (bez kopiowania danych).
+
+        Args:
+            start_idx: Indeks pierwszej pozycji
+            end_idx: Indeks ostatniej pozycji (włącznie)
+            reverse: Czy odwrócić kolejność pozycji
+
+        Returns:
+            tuple: (pozycje, dane) - widoki na oś pozycji i macierz danych
+        """
+        if start_idx > end_idx:
+            start_idx, end_idx = end_idx, start_idx
+
+        if reverse:
+            columns = slice(end_idx, start_idx - 1 if start_idx > 0 else None, -1)
+        else:
+            columns = slice(start_idx, end_idx + 1)
+        return self.positions[columns], self.data[:, columns]
+
+
+def read_dts_csv(filepath):
+    """
+    Wczytuje pojedynczy plik CSV AP Sensing do kostki DtsCube.
+
+    Blok danych jest parsowany hurtowo (dts_tokenize.parse_body); pliki
+    w nietypowym układzie są czytane komórka po komórce.
+
+    Args:
+        filepath: Ścieżka do pliku CSV (także .csv.gz/.bz2/.xz lub pliku
+            z archiwum ZIP - patrz dts_source)
+
+    Returns:
+        DtsCube: Przebiegi z pliku (w kolejności kolumn pliku)
+    """
+    with open_data_file(filepath) as f:
+        content = f.read()
+
+    # Pierwsze 4 wiersze to nagłówek (X Units i Y Units pomijamy); blok
+    # danych jest parsowany w miejscu, od bajtu start
+    header = []
+    start = 0
+    for _ in range(4):
+        end = content.find(b'\n', start) + 1 or len(content)
+        header.append(content[start:end].decode('latin-1'))
+        start = end
+
+    date_row, time_row = csv.reader(header[:2], delimiter=';')
+
+    # Wyciągnij daty i czasy (pomijając pierwszą kolumnę z etykietami)
+    try:
+        datetimes = parse_header_datetimes(date_row[1:], time_row[1:])
+    except ValueError as e:
+        raise ValueError(f"Błąd parsowania daty/czasu w pliku {filepath}: {e}") from e
+
+    # Wczytaj dane pomiarowe
+    n_traces = len(datetimes)
+    parsed = parse_body(content, n_traces, start)
+    if parsed is None:
+        parsed = _parse_body_cells(content[start:], n_traces)
+
+    positions, data = parsed
+    return DtsCube(datetimes, positions, data)
+
+
+def _parse_body_cells(body, n_traces):
+    """
+    Parsuje blok danych komórka po komórce (csv.reader + parse_value).
+
+    Returns:
+        tuple: (pozycje, dane float32 (n_traces, n_pozycji))
+    """
+    positions = []
+    rows = []
+
+    for row in csv.reader(io.StringIO(body.decode('latin-1'), newline=''), delimiter=';'):
+        if not row or not row[0]:  # Pomiń puste wiersze
+            continue
+
+        # Pierwsza kolumna to pozycja (zamień przecinek na kropkę)
+        positions.append(float(row[0].replace(',', '.')))
+
+        values = [parse_value(value) for value in row[1:n_traces + 1]]
+        values.extend([np.nan] * (n_traces - len(values)))
+        rows.append(values)
+
+    data = np.array(rows, dtype=np.float64).reshape(len(positions), n_traces)
+    return positions, np.ascontiguousarray(data.T, dtype=np.float32)
+
+
+def read_dts_file(filepath, cache=None):
+    """
+    Wczytuje plik CSV, korzystając z pamięci podręcznej, jeśli ją podano.
+
+    Args:
+        filepath: Ścieżka do pliku CSV
+        cache: Obiekt z metodą read(filepath), np. dts_cache.ParsedFileCache
+
+    Returns:
+        DtsCube: Przebiegi z pliku
+    """
+    if cache is not None:
+        return cache.read(filepath)
+    return read_dts_csv(filepath)
+
+
+def iter_dts_files(filepaths, workers=1, cache=None):
+    """
+    Wczytuje wiele plików CSV, opcjonalnie równolegle w puli procesów.
+
+    Każdy plik jest parsowany w osobnym procesie, a do procesu głównego
+    wracają gotowe kostki (tablice numeryczne, nie listy napisów). Wyniki
+    są zwracane w kolejności plików wejściowych, więc scalenie daje ten
+    sam wynik co wczytywanie sekwencyjne.
+
+    Args:
+        filepaths: Lista ścieżek do plików CSV
+        workers: Liczba procesów (1 = sekwencyjnie, None = liczba rdzeni)
+        cache: Pamięć podręczna sparsowanych plików (opcjonalnie); po
+            wczytaniu wszystkich plików usuwane są najstarsze wpisy
+
+    Yields:
+        tuple: (ścieżka, DtsCube) w kolejności plików wejściowych
+    """
+    filepaths = list(filepaths)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(filepaths))
+    read = partial(read_dts_file, cache=cache)
+
+    if workers <= 1:
+        for filepath in filepaths:
+            yield filepath, read(filepath)
+    else:
+        chunksize = max(1, len(filepaths) // (workers * 4))
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            yield from zip(filepaths, executor.map(read, filepaths, chunksize=chunksize))
+        finally:
+            # Przy przerwaniu nie czekaj na pliki, których parsowanie jeszcze się nie zaczęło
+            executor.shutdown(cancel_futures=True)
+
+    if cache is not None:
+        cache.evict()
+
+
+def merge_cubes(cubes, duplicates=None, names=None):
+    """
+    Łączy kostki w jedną, posortowaną chronologicznie.
+
+    Oś pozycji jest brana z pierwszej kostki; wszystkie kostki muszą mieć
+    tę samą liczbę pozycji.
+
+    Args:
+        cubes: Lista obiektów DtsCube
+        duplicates: Raport duplikatów (DuplicateReport); gdy podany, z przebiegów
+            o tym samym czasie i tych samych wartościach zachowywany jest tylko pierwszy
+        names: Nazwy plików źródłowych kostek (do raportu duplikatów)
+
+    Returns:
+        DtsCube: Scalone przebiegi posortowane według czasu
+    """
+    if not cubes:
+        raise ValueError("Brak danych do scalenia")
+
+    positions = cubes[0].positions
+    for cube in cubes[1:]:
+        if cube.n_positions != len(positions):
+            raise ValueError(f"Niezgodna liczba pozycji: {cube.n_positions} "
+                             f"zamiast {len(positions)}")
+
+    times = np.concatenate([cube.times for cube in cubes])
+    order = np.argsort(times, kind='stable')
+    data = np.concatenate([cube.data for cube in cubes])
+    if duplicates is not None:
+        sources = np.repeat(np.arange(len(cubes)), [cube.n_traces for cube in cubes])
+        order = duplicates.drop(times, order, sources, data, names)
+    return DtsCube(times[order], positions, data[order])
+
+
+@contextmanager
+def replace_when_done(filepath):
+    """
+    Zapis do pliku tymczasowego, który pojawia się pod docelową nazwą w całości albo wcale.
+
+    Użycie:
+        with replace_when_done(filepath) as part:
+            ... zapis do part ...
+
+    Po udanym zapisie plik tymczasowy zastępuje docelowy; przy błędzie
+    lub przerwaniu jest usuwany.
+    """
+    part = f"{filepath}{PART_SUFFIX}"
+    try:
+        yield part
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    os.replace(part, filepath)
+
+
+def write_dts_csv(cube, filepath, units=True, progress=None):
+    """
+    Zapisuje kostkę w układzie AP Sensing (wiersz = pozycja, kolumna = przebieg).
+
+    Dane są pobierane blokami pozycji przez position_slice, więc funkcja
+    działa również dla magazynu DtsStore bez wczytywania go w całości.
+
+    Args:
+        cube: DtsCube (lub DtsStore) do zapisania
+        filepath: Ścieżka do pliku wyjściowego
+        units: Czy zapisać wiersze X Units i Y Units
+        progress: Funkcja progress(zapisane_pozycje, wszystkie_pozycje) wywoływana po każdym bloku
+    """
+    with metrics.stage('csv_write') as stage:
+        with open(filepath, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter=';')
+
+            writer.writerow(['Date:'] + cube.date_strings())
+            writer.writerow(['Time:'] + cube.time_strings())
+
+            if units:
+                writer.writerow(['X Units:'] + ['[m]'] * cube.n_traces)
+                writer.writerow(['Y Units:'] + ['[°C]'] * cube.n_traces)
+
+            for first in range(0, cube.n_positions, WRITE_BLOCK_POSITIONS):
+                last = min(first + WRITE_BLOCK_POSITIONS, cube.n_positions) - 1
+                positions, block = cube.position_slice(first, last)
+                for i, position in enumerate(positions):
+                    writer.writerow([f"{position:.2f}"] + format_values(block[:, i]))
+
+                if progress is not None:
+                    progress(last + 1, cube.n_positions)
+
+        stage.add(rows=cube.n_positions, cells=cube.n_positions * cube.n_traces,
+                  bytes_written=os.path.getsize(filepath))
@@ -0,0 +1,171 @@
+"""
+Wykrywanie zduplikowanych przebiegów podczas scalania plików.
+
+Ten sam przedział czasu bywa wyeksportowany dwa razy (np. plik dobowy
+i pliki godzinowe), więc po scaleniu część przebiegów się powtarza.
+Kandydaci na duplikaty są wykrywani po znaczniku czasu: po stabilnym
+sortowaniu przebiegi o tym samym czasie leżą obok siebie, więc wystarcza
+jedno porównanie sąsiednich czasów. Następnie porównywane są sumy
+kontrolne wartości: pomijany jest tylko przebieg o tych samych
+wartościach co wcześniejszy (z wcześniejszego pliku). Pomiary o tym
+samym czasie, ale innych wartościach (konflikty - np. powtórzona
+godzina przy zmianie czasu z letniego na zimowy) są zachowywane
+i zgłaszane w raporcie.
+"""
+
+import hashlib
+
+import numpy as np
+
+
+class TraceChecksum:
+    """Suma kontrolna wartości przebiegu, liczona przyrostowo (np. blokami pozycji)."""
+
+    def __init__(self):
+        self._hash = hashlib.blake2b(digest_size=16)
+
+    def update(self, values):
+        """Dodaje kolejne wartości przebiegu (float32, wszystkie NaN traktowane jako równe)."""
+        values = np.asarray(values, dtype=np.float32)
+        values = np.where(np.isnan(values), np.float32(np.nan), values)
+        self._hash.update(values.tobytes())
+
+    def digest(self):
+        """Zwraca sumę kontrolną."""
+        return self._hash.digest()
+
+
+def trace_checksum(values):
+    """Zwraca sumę kontrolną wszystkich wartości przebiegu."""
+    checksum = TraceChecksum()
+    checksum.update(values)
+    return checksum.digest()
+
+
+def find_duplicates(times):
+    """
+    Wyszukuje powtórzone czasy w posortowanej tablicy czasów.
+
+    Args:
+        times: Posortowana tablica czasów przebiegów
+
+    Returns:
+        tuple: (indeksy duplikatów, indeksy zachowanych przebiegów o tym samym czasie)
+    """
+    times = np.asarray(times)
+    repeated = np.flatnonzero(times[1:] == times[:-1]) + 1
+    if not len(repeated):
+        return repeated, repeated
+
+    # Dla każdego przebiegu indeks pierwszego przebiegu o tym samym czasie
+    run_start = np.arange(len(times))
+    run_start[repeated] = 0
+    first = np.maximum.accumulate(run_start)
+    return repeated, first[repeated]
+
+
+class DuplicateReport:
+    """Liczba pominiętych przebiegów dla każdego pliku i zachowanych konfliktów dla par plików."""
+
+    def __init__(self):
+        self.dropped = {}
+        self.conflicts = {}
+
+    @property
+    def n_dropped(self):
+        """Łączna liczba pominiętych przebiegów."""
+        return sum(self.dropped.values())
+
+    @property
+    def n_conflicts(self):
+        """Łączna liczba zachowanych przebiegów o tym samym czasie, ale innych wartościach."""
+        return sum(self.conflicts.values())
+
+    def record(self, source, original=None, conflict=False):
+        """
+        Zapisuje przebieg z pliku source o tym samym czasie co przebieg z pliku original.
+
+        Args:
+            source: Plik późniejszego przebiegu
+            original: Plik wcześniejszego przebiegu o tym samym czasie
+            conflict: Czy wartości się różnią (przebieg jest wtedy zachowany, nie pominięty)
+        """
+        if conflict:
+            pair = (original, source)
+            self.conflicts[pair] = self.conflicts.get(pair, 0) + 1
+        else:
+            self.dropped[source] = self.dropped.get(source, 0) + 1
+
+    def messages(self):
+        """Zwraca komunikaty podsumowania (pusta lista, gdy nie było duplikatów ani konfliktów)."""
+        messages = []
+        if self.dropped:
+            per_file = ', '.join(f"{source} ({count})" for source, count in self.dropped.items())
+            messages.append(f"Pominięto {self.n_dropped} zduplikowanych pomiarów: {per_file}")
+        if self.conflicts:
+            per_pair = ', '.join(f"{original} i {source} ({count})"
+                                 for (original, source), count in self.conflicts.items())
+            messages.append(f"UWAGA: {self.n_conflicts} pomiarów ma ten sam czas co wcześniejsze, "
+                            f"ale inne wartości - zachowano oba: {per_pair}")
+        return messages
+
+    def drop(self, times, order, sources, data, names=None):
+        """
+        Usuwa duplikaty z kolejności przebiegów i zapisuje je w raporcie.
+
+        Przebieg o tym samym czasie co wcześniejszy jest pomijany tylko wtedy,
+        gdy ma te same wartości co któryś z zachowanych przebiegów o tym czasie.
+
+        Args:
+            times: Czasy przebiegów
+            order: Stabilna kolejność chronologiczna (np.argsort(times, kind='stable'))
+            sources: Numer pliku źródłowego każdego przebiegu
+            data: Wartości przebiegów (wiersze)
+            names: Nazwy plików źródłowych (domyślnie numery)
+
+        Returns:
+            np.ndarray: Kolejność order bez duplikatów
+        """
+        repeated, first = find_duplicates(np.asarray(times)[order])
+        if not len(repeated):
+            return order
+
+        def name(trace):
+            source = int(sources[trace])
+            return names[source] if names is not None else f"#{source + 1}"
+
+        candidates = zip(order[repeated].tolist(), order[first].tolist())
+        dropped = set(self.resolve(candidates, lambda trace: trace_checksum(data[trace]), name))
+        return np.delete(order, [i for i in repeated.tolist() if order[i] in dropped])
+
+    def resolve(self, candidates, checksum, name):
+        """
+        Rozstrzyga, które przebiegi o powtórzonym czasie są duplikatami, i zapisuje je w raporcie.
+
+        Przebieg jest duplikatem, gdy ma te same wartości co któryś z zachowanych
+        przebiegów o tym samym czasie; w przeciwnym razie jest zachowywany
+        jako konflikt.
+
+        Args:
+            candidates: Pary (przebieg, pierwszy przebieg o tym samym czasie)
+                w kolejności chronologicznej
+            checksum: Funkcja zwracająca sumę kontrolną przebiegu
+            name: Funkcja zwracająca nazwę pliku źródłowego przebiegu
+
+        Returns:
+            list: Przebiegi z candidates do pominięcia
+        """
+        kept = {}  # Sumy kontrolne zachowanych przebiegów każdej grupy o tym samym czasie
+        dropped = []
+        for duplicate, original in candidates:
+            if original not in kept:
+                kept[original] = {checksum(original): original}
+            group = kept[original]
+            digest = checksum(duplicate)
+            if digest in group:
+                self.record(name(duplicate), name(group[digest]))
+                dropped.append(duplicate)
+            else:
+                self.record(name(duplicate), name(original), conflict=True)
+                group[digest] = duplicate
+        return dropped
@@ -0,0 +1,559 @@
+"""
+Przetwarzanie pomiarów DTS bez interfejsu graficznego.
+
+Wspólny rdzeń aplikacji (sensor_data_processor.py) i przetwarzania
+wsadowego (dts_batch.py): scalanie plików, opis czujników z pliku
+układu (JSON/TOML), kalibracja referencyjna i eksport. Moduł nie
+importuje tkinter, więc może działać np. w zadaniu cron.
+"""
+
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+
+import dts_metrics as metrics
+from dts_calibration import (SensorCalibration, check_mode, default_mode, sensor_mode,
+                             sensor_references)
+from dts_cube import format_values, iter_dts_files, merge_cubes, replace_when_done, to_float64, write_dts_csv
+from dts_export import (EXPORT_FORMATS, LONG_FORMATS, check_format, format_for_path, write_cube,
+                        write_long_csv, write_matrix)
+from dts_index import select_files
+from dts_reference import DEFAULT_MAX_TIME_DIFF, read_reference_csv, reference_temperatures
+from dts_source import source_name, source_size
+from dts_time import DEFAULT_TIMEZONE, timezone_offset
+
+
+def make_sensor(axis, name, start, end, reversed=False, ref_channel=None, ref_position=None,
+                references=None, calibration=None):
+    """
+    Tworzy opis czujnika z pozycjami dopasowanymi do najbliższych dostępnych.
+
+    Args:
+        axis: Oś pozycji scalonych danych (PositionAxis)
+        name: Nazwa czujnika (także nazwa pliku wyjściowego)
+        start: Metr początkowy
+        end: Metr końcowy
+        reversed: Czy odwrócić kolejność pozycji
+        ref_channel: Kanał referencyjny (np. CH001, None = bez kalibracji)
+        ref_position: Metr czujnika referencyjnego na światłowodzie
+        references: Punkty kalibracji wielopunktowej jako lista (kanał, metr)
+            - zamiast ref_channel i ref_position
+        calibration: Tryb kalibracji (offset, linear lub piecewise - patrz
+            dts_calibration; None = offset dla jednego punktu, linear dla wielu)
+
+    Returns:
+        dict: Czujnik (name, start, end, reversed, ref_channel, ref_position,
+            references, calibration); ref_channel i ref_position opisują
+            pierwszy punkt referencyjny
+    """
+    if ref_channel is not None and ref_position is None:
+        raise ValueError(f"Czujnik {name}: podaj metr czujnika referencyjnego (ref_position)")
+    if references is None:
+        references = [] if ref_channel is None else [(ref_channel, ref_position)]
+    elif ref_channel is not None:
+        raise ValueError(f"Czujnik {name}: podaj ref_channel i ref_position albo references, nie oba")
+
+    references = [(channel, axis.nearest(position)) for channel, position in references]
+    calibration = calibration or default_mode(len(references))
+    try:
+        check_mode(calibration, len(references))
+    except ValueError as e:
+        raise ValueError(f"Czujnik {name}: {e}") from None
+
+    return {
+        'name': name,
+        'start': axis.nearest(start),
+        'end': axis.nearest(end),
+        'reversed': bool(reversed),
+        'ref_channel': references[0][0] if references else None,
+        'ref_position': references[0][1] if references else None,
+        'references': references,
+        'calibration': calibration
+    }
+
+
+def load_sensor_layout(filepath):
+    """
+    Wczytuje układ czujników z pliku JSON lub TOML.
+
+    Plik zawiera listę "sensors" (w JSON może to być sama lista) z polami
+    name, start, end oraz opcjonalnie reversed, ref_channel, ref_position.
+    Kalibrację wielopunktową opisuje lista references (obiekty z polami
+    channel i position) i pole calibration (offset, linear, piecewise).
+    Opcjonalne pole "max_time_diff" ustala tolerancję dopasowania
+    pomiarów referencyjnych [s], a "timezone" - strefę czasową nagłówków
+    plików DTS (np. Europe/Warsaw), do której przeliczane są czasy UTC
+    pomiarów referencyjnych.
+
+    Args:
+        filepath: Ścieżka do pliku .json lub .toml
+
+    Returns:
+        dict: Układ z kluczami sensors (lista słowników), max_time_diff i timezone
+    """
+    filepath = Path(filepath)
+    if filepath.suffix.lower() == '.toml':
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError("Pliki TOML wymagają Pythona 3.11 lub nowszego - użyj formatu JSON")
+        with open(filepath, 'rb') as f:
+            layout = tomllib.load(f)
+    else:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            layout = json.load(f)
+
+    if isinstance(layout, list):
+        layout = {'sensors': layout}
+
+    sensors = []
+    for i, entry in enumerate(layout.get('sensors', [])):
+        missing = [key for key in ('name', 'start', 'end') if key not in entry]
+        if missing:
+            raise ValueError(f"Czujnik nr {i + 1} w {filepath.name}: brak pól {', '.join(missing)}")
+        references = entry.get('references')
+        if references is not None:
+            try:
+                references = [(str(point['channel']), float(point['position']))
+                              for point in references]
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"Czujnik nr {i + 1} w {filepath.name}: każdy element references "
+                                 f"musi mieć pola channel i position") from None
+        sensors.append({
+            'name': str(entry['name']),
+            'start': float(entry['start']),
+            'end': float(entry['end']),
+            'reversed': bool(entry.get('reversed', False)),
+            'ref_channel': entry.get('ref_channel') or None,
+            'ref_position': (None if entry.get('ref_position') is None
+                             else float(entry['ref_position'])),
+            'references': references,
+            'calibration': entry.get('calibration') or None
+        })
+
+    if not sensors:
+        raise ValueError(f"Plik {filepath.name} nie zawiera żadnych czujników")
+
+    timezone = layout.get('timezone') or DEFAULT_TIMEZONE
+    timezone_offset(timezone)  # Nieznana strefa - błąd już przy wczytaniu układu
+
+    return {
+        'sensors': sensors,
+        'max_time_diff': layout.get('max_time_diff', DEFAULT_MAX_TIME_DIFF),
+        'timezone': timezone
+    }
+
+
+def sensor_filename(sensor, fmt='csv'):
+    """Zwraca nazwę pliku wyjściowego czujnika (rozszerzenie według formatu)."""
+    return f"{sensor['name'].replace(' ', '_')}{EXPORT_FORMATS[fmt]}"
+
+
+def merge_files(filepaths, workers=1, cache=None, progress=None, duplicates=None,
+                resampler=None):
+    """
+    Wczytuje i scala pliki CSV w jedną kostkę posortowaną chronologicznie.
+
+    Args:
+        filepaths: Lista ścieżek do plików CSV
+        workers: Liczba procesów parsujących pliki
+        cache: Pamięć podręczna sparsowanych plików (ParsedFileCache, opcjonalnie)
+        progress: Funkcja progress(etap, wykonane, wszystkie) (opcjonalnie;
+            wyjątek zgłoszony przez nią przerywa wczytywanie)
+        duplicates: Raport duplikatów (DuplicateReport); gdy podany, z przebiegów
+            o tym samym czasie i tych samych wartościach zachowywany jest tylko pierwszy
+        resampler: Wspólna siatka pozycji (GridResampler); gdy podana, pliki
+            o innej osi pozycji są na nią przeliczane
+
+    Returns:
+        DtsCube: Scalone przebiegi
+    """
+    def report(stage, done, total):
+        if progress is not None:
+            progress(stage, done, total)
+
+    cubes = []
+    names = []
+    report("Wczytywanie plików", 0, len(filepaths))
+    with metrics.stage('file_parse') as stage, \
+            closing(iter_dts_files(filepaths, workers, cache)) as parsed:
+        for i, (filepath, cube) in enumerate(parsed):
+            stage.add(rows=cube.n_positions, cells=cube.data.size,
+                      bytes_read=source_size(filepath))
+            if resampler is not None:
+                cube = resampler.resample(cube, source_name(filepath))
+            cubes.append(cube)
+            names.append(source_name(filepath))
+            report("Wczytywanie plików", i + 1, len(filepaths))
+
+    # Scal i sortuj chronologicznie
+    n_traces = sum(cube.n_traces for cube in cubes)
+    report("Scalanie pomiarów", 0, n_traces)
+    with metrics.stage('merge_sort') as stage:
+        merged = merge_cubes(cubes, duplicates, names)
+        stage.add(rows=merged.n_traces, cells=merged.data.size)
+    report("Scalanie pomiarów", n_traces, n_traces)
+    return merged
+
+
+class ExportContext:
+    """
+    Dane wspólne dla eksportu wielu czujników z jednych scalonych danych.
+
+    Wiersze dat i czasów, dopasowanie pomiarów referencyjnych (raz na kanał)
+    i temperatury światłowodu w miejscach czujników referencyjnych są
+    liczone tylko raz, niezależnie od liczby czujników.
+    """
+
+    def __init__(self, cube, reference=None, max_diff=DEFAULT_MAX_TIME_DIFF):
+        """
+        Args:
+            cube: Scalone dane (DtsCube lub DtsStore)
+            reference: Dane referencyjne z read_reference_csv (opcjonalnie)
+            max_diff: Maksymalna różnica czasu dopasowania referencji [s] (None = bez limitu)
+        """
+        self.cube = cube
+        self.reference = reference
+        self.max_diff = max_diff
+        self.date_row = ['Date:'] + cube.date_strings()
+        self.time_row = ['Time:'] + cube.time_strings()
+        self._channels = {}
+        self._columns = {}
+
+    def reference_channel(self, channel):
+        """
+        Zwraca dopasowanie kanału referencyjnego do przebiegów (liczone raz na kanał).
+
+        Returns:
+            tuple: (temperatury z NaN, wartości wiersza Ref_Temp,
+                wartości wiersza Ref_DateTime, liczba przebiegów bez wartości)
+        """
+        if channel not in self._channels:
+            with metrics.stage('reference_match') as stage:
+                ref_values, ref_times = reference_temperatures(self.reference, self.cube.times,
+                                                               channel, self.max_diff)
+                stage.add(rows=len(ref_values))
+            self._channels[channel] = (
+                ref_values,
+                ['' if np.isnan(t) else t for t in ref_values.tolist()],
+                ['' if t is None else t for t in ref_times],
+                int(np.count_nonzero(np.isnan(ref_values)))
+            )
+        return self._channels[channel]
+
+    def reference_times(self, channel):
+        """Zwraca czasy dopasowanych pomiarów referencyjnych jako datetime64[s] (NaT = brak)."""
+        ref_datetimes = self.reference_channel(channel)[2]
+        return np.array([t or 'NaT' for t in ref_datetimes], dtype='datetime64[s]')
+
+    def fiber_column(self, idx):
+        """Zwraca temperatury światłowodu na pozycji idx (float64, liczone raz)."""
+        if idx not in self._columns:
+            self._columns[idx] = to_float64(self.cube.column(idx))
+        return self._columns[idx]
+
+    def calibration(self, sensor):
+        """
+        Zwraca kalibrację czujnika ze wszystkich jego punktów referencyjnych.
+
+        Returns:
+            SensorCalibration lub None dla czujnika bez punktów referencyjnych
+        """
+        references = sensor_references(sensor)
+        if not references:
+            return None
+        ref_temps = np.column_stack([self.reference_channel(channel)[0]
+                                     for channel, _ in references])
+        fiber_temps = np.column_stack([self.fiber_column(self.cube.axis.index(position))
+                                       for _, position in references])
+        return SensorCalibration([position for _, position in references], ref_temps,
+                                 fiber_temps, sensor_mode(sensor))
+
+    def prepare(self, sensors):
+        """Wylicza z góry dane referencyjne czujników (przed eksportem w wielu wątkach)."""
+        if self.reference is not None:
+            # Kolumny wszystkich potrzebnych kanałów w jednym przejściu po pliku
+            self.reference.load_channels(channel for sensor in sensors
+                                         for channel, _ in sensor_references(sensor))
+        for sensor in sensors:
+            for channel, position in sensor_references(sensor):
+                self.reference_channel(channel)
+                self.fiber_column(self.cube.axis.index(position))
+
+
+def export_sensor(cube, sensor, export_dir, reference=None, max_diff=DEFAULT_MAX_TIME_DIFF,
+                  log=print, context=None, fmt='csv', aggregation=None):
+    """
+    Eksportuje dane pojedynczego czujnika (z kalibracją, jeśli ma punkty referencyjne).
+
+    Args:
+        cube: Scalone dane (DtsCube lub DtsStore)
+        sensor: Opis czujnika (jak z make_sensor)
+        export_dir: Folder zapisu
+        reference: Dane referencyjne z read_reference_csv (opcjonalnie)
+        max_diff: Maksymalna różnica czasu dopasowania referencji [s] (None = bez limitu)
+        log: Funkcja do wypisywania komunikatów
+        context: Wspólne dane eksportu (ExportContext); gdy podane, zastępuje
+            argumenty cube, reference i max_diff
+        fmt: Format pliku (csv, npz, parquet, long lub long-gz - patrz dts_export)
+        aggregation: Statystyki czasowe (Aggregation); gdy podane, zamiast
+            pomiarów zapisywany jest plik CSV statystyk skalibrowanych
+            temperatur (fmt jest pomijany)
+
+    Returns:
+        str: Ścieżka zapisanego pliku
+    """
+    if context is None:
+        context = ExportContext(cube, reference, max_diff)
+    cube = context.cube
+
+    # Zakres indeksów pozycji (wyliczany z kroku siatki, bez przeszukiwania osi)
+    start_idx, end_idx = cube.axis.index_range(sensor['start'], sensor['end'])
+
+    if aggregation is not None:
+        filename = aggregation.filename(sensor['name'])
+    else:
+        filename = sensor_filename(sensor, fmt)
+    filepath = os.path.join(export_dir, filename)
+
+    # Poprawki kalibracji z punktów referencyjnych (pomiary dopasowane raz na kanał)
+    references = sensor_references(sensor)
+    calibration = context.calibration(sensor)
+    ref_values = None
+    unmatched = 0
+    if calibration is not None:
+        # Temperatury każdego punktu (kolumny ref_temp formatów innych niż CSV)
+        ref_values = [context.reference_channel(channel)[0] for channel, _ in references]
+        unmatched = calibration.unmatched
+
+    if aggregation is None and fmt in LONG_FORMATS:
+        # Format długi: fragment czytany i kalibrowany porcjami przebiegów przy zapisie
+        with replace_when_done(filepath) as part:
+            write_long_csv(part, cube, start_idx, end_idx, sensor['reversed'], calibration,
+                           ref_values, compress=fmt == 'long-gz')
+        log_sensor_export(sensor, filename, log, unmatched)
+        return filepath
+
+    # Wytnij fragment (widok na macierz, odwrócony jeśli trzeba)
+    sensor_positions, sensor_data = cube.position_slice(start_idx, end_idx,
+                                                        reverse=sensor['reversed'])
+
+    if calibration is not None:
+        with metrics.stage('calibration') as stage:
+            # Kalibracja całego fragmentu naraz (poprawka dla każdego przebiegu i pozycji)
+            sensor_data = calibration.apply(sensor_data, sensor_positions)
+            stage.add(rows=len(sensor_positions), cells=sensor_data.size)
+
+    # Zapisz do pliku (pojawia się pod docelową nazwą dopiero po zakończeniu zapisu)
+    if aggregation is not None:
+        with replace_when_done(filepath) as part:
+            aggregation.export(part, cube.times, sensor_positions, sensor_data)
+    elif fmt != 'csv':
+        points = []
+        if calibration is not None:
+            points = [{'channel': channel, 'position': position, 'temps': temps,
+                       'times': context.reference_times(channel)}
+                      for (channel, position), temps in zip(references, ref_values)]
+        with replace_when_done(filepath) as part:
+            write_matrix(part, fmt, cube.times, sensor_positions, sensor_data, points)
+    else:
+        write_sensor_csv(filepath, context, sensor, sensor_positions, sensor_data, references)
+
+    log_sensor_export(sensor, filename, log, unmatched)
+    return filepath
+
+
+def log_sensor_export(sensor, filename, log, unmatched=0):
+    """Wypisuje wpis logu o wyeksportowanym czujniku."""
+    ref_info = ""
+    references = sensor_references(sensor)
+    if references:
+        ref_info = " | Ref: " + ", ".join(f"{channel}@{position:.2f}m"
+                                          for channel, position in references)
+        if len(references) > 1:
+            ref_info += f" ({sensor_mode(sensor)})"
+        if unmatched:
+            ref_info += f" (bez wartości ref.: {unmatched})"
+
+    log(f"✓ {sensor['name']}: {sensor['start']:.2f}m - {sensor['end']:.2f}m "
+        f"({'odwrócony' if sensor['reversed'] else 'normalny'}){ref_info} → {filename}")
+
+
+def write_sensor_csv(filepath, context, sensor, sensor_positions, sensor_data, references=()):
+    """
+    Zapisuje plik CSV czujnika (pojawia się pod docelową nazwą dopiero po zakończeniu zapisu).
+
+    Args:
+        filepath: Ścieżka pliku
+        context: Wspólne dane eksportu (wiersze dat i czasów)
+        sensor: Opis czujnika
+        sensor_positions: Pozycje czujnika (w kolejności wierszy)
+        sensor_data: Temperatury (przebieg × pozycja czujnika)
+        references: Punkty referencyjne (kanał, metr) - dla każdego zapisywane
+            są wiersze Ref_Temp i Ref_DateTime
+    """
+    with metrics.stage('csv_write') as stage:
+        with replace_when_done(filepath) as part, \
+                open(part, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter=';')
+
+            # Wiersze dat i czasów
+            writer.writerow(context.date_row)
+            writer.writerow(context.time_row)
+
+            # Jeśli są dane referencyjne, dodaj wiersze temperatury i daty/godziny referencyjnej
+            for channel, position in references:
+                _, ref_temps, ref_datetimes, _ = context.reference_channel(channel)
+                writer.writerow([f'Ref_Temp({channel}@{position:.2f}m):'] + ref_temps)
+                writer.writerow(['Ref_DateTime:'] + ref_datetimes)
+
+            # Dane pomiarowe (w kolejności pozycji czujnika)
+            for i, position in enumerate(sensor_positions):
+                writer.writerow([f"{position:.2f}"] + format_values(sensor_data[:, i]))
+
+        stage.add(rows=len(sensor_positions), cells=sensor_data.size,
+                  bytes_written=os.path.getsize(filepath))
+
+
+def export_sensors(cube, sensors, export_dir, reference=None, max_diff=DEFAULT_MAX_TIME_DIFF,
+                   log=print, threads=1, progress=None, fmt='csv', aggregation=None):
+    """
+    Eksportuje wiele czujników ze wspólnymi danymi liczonymi raz (ExportContext).
+
+    Args:
+        cube: Scalone dane (DtsCube lub DtsStore)
+        sensors: Lista czujników (jak z make_sensor)
+        export_dir: Folder zapisu
+        reference: Dane referencyjne z read_reference_csv (opcjonalnie)
+        max_diff: Maksymalna różnica czasu dopasowania referencji [s] (None = bez limitu)
+        log: Funkcja do wypisywania komunikatów
+        threads: Liczba wątków zapisujących pliki równolegle
+        progress: Funkcja progress(etap, wykonane, wszystkie) (opcjonalnie;
+            wyjątek zgłoszony przez nią przerywa eksport kolejnych czujników)
+        fmt: Format plików (csv, npz, parquet, long lub long-gz)
+        aggregation: Statystyki czasowe zamiast pomiarów (Aggregation, opcjonalnie)
+
+    Returns:
+        list: Ścieżki zapisanych plików (w kolejności czujników)
+    """
+    def report(done):
+        if progress is not None:
+            progress("Eksport czujników", done, len(sensors))
+
+    check_format(fmt)
+    context = ExportContext(cube, reference, max_diff)
+    context.prepare(sensors)
+    report(0)
+
+    if threads <= 1 or len(sensors) <= 1:
+        exported = []
+        for sensor in sensors:
+            exported.append(export_sensor(None, sensor, export_dir, log=log, context=context,
+                                          fmt=fmt, aggregation=aggregation))
+            report(len(exported))
+        return exported
+
+    exported = [None] * len(sensors)
+    executor = ThreadPoolExecutor(max_workers=threads)
+    try:
+        futures = {executor.submit(export_sensor, None, sensor, export_dir, log=log,
+                                   context=context, fmt=fmt, aggregation=aggregation): i
+                   for i, sensor in enumerate(sensors)}
+        for done, future in enumerate(as_completed(futures)):
+            exported[futures[future]] = future.result()
+            report(done + 1)
+    finally:
+        # Przy błędzie lub przerwaniu nie zaczynaj kolejnych plików
+        executor.shutdown(cancel_futures=True)
+    return exported
+
+
+def run_batch(filepaths, layout, export_dir, reference_file=None, merged_file=None,
+              workers=1, cache=None, max_diff=None, threads=1, duplicates=None, resampler=None,
+              timezone=None, log=print, fmt='csv', start=None, end=None, aggregation=None):
+    """
+    Scala pliki, kalibruje i eksportuje wszystkie czujniki z układu w jednym przebiegu.
+
+    Args:
+        filepaths: Lista ścieżek do plików CSV
+        layout: Układ czujników z load_sensor_layout
+        export_dir: Folder zapisu plików czujników (tworzony w razie potrzeby)
+        reference_file: Plik referencyjny svws_measurements.csv (opcjonalnie)
+        merged_file: Ścieżka scalonego pliku do zapisania (opcjonalnie; format
+            według rozszerzenia: .npz, .parquet, .long.csv, .long.csv.gz,
+            w pozostałych przypadkach CSV)
+        workers: Liczba procesów parsujących pliki
+        cache: Pamięć podręczna sparsowanych plików (ParsedFileCache, opcjonalnie)
+        max_diff: Maksymalna różnica czasu dopasowania [s] (None = wartość z układu)
+        threads: Liczba wątków zapisujących pliki czujników
+        duplicates: Raport duplikatów (DuplicateReport, None = bez deduplikacji)
+        resampler: Wspólna siatka pozycji (GridResampler, None = bez przeliczania)
+        timezone: Strefa czasowa nagłówków plików DTS (None = wartość z układu)
+        log: Funkcja do wypisywania komunikatów
+        fmt: Format plików czujników (csv, npz, parquet, long lub long-gz)
+        start: Początek zakresu czasu eksportu (datetime64, None = bez limitu)
+        end: Koniec zakresu czasu włącznie (None = bez limitu); przy zakresie
+            wczytywane są tylko pliki, które na niego zachodzą (dts_index)
+        aggregation: Statystyki czasowe zamiast pomiarów czujników
+            (Aggregation, opcjonalnie)
+
+    Returns:
+        list: Ścieżki zapisanych plików czujników
+    """
+    if not filepaths:
+        raise ValueError("Nie podano żadnych plików CSV")
+    if start is not None or end is not None:
+        selected = select_files(filepaths, start, end)
+        log(f"Zakres czasu: wczytywanie {len(selected)} z {len(filepaths)} plików")
+        if not selected:
+            raise ValueError("Żaden plik nie zawiera pomiarów z wybranego zakresu czasu")
+        filepaths = selected
+    check_format(fmt)
+    if merged_file is not None:
+        check_format(format_for_path(merged_file))
+
+    os.makedirs(export_dir, exist_ok=True)
+
+    reference = None
+    if reference_file is not None:
+        reference = read_reference_csv(reference_file, timezone or layout['timezone'])
+        log(f"Wczytano {len(reference)} pomiarów referencyjnych | "
+            f"Kanały: {', '.join(reference.channels)}")
+
+    merged = merge_files(filepaths, workers, cache, duplicates=duplicates, resampler=resampler)
+    merged = merged.time_window(start, end)
+    if not merged.n_traces:
+        raise ValueError("Brak pomiarów w wybranym zakresie czasu")
+    log(f"Scalono {len(filepaths)} plików | Pomiarów: {merged.n_traces} | "
+        f"Pozycji: {merged.n_positions}")
+    for report in (duplicates, resampler):
+        if report is not None:
+            for message in report.messages():
+                log(message)
+
+    if merged_file is not None:
+        # Jak w aplikacji: scalony plik bez wierszy X Units i Y Units
+        merged_format = format_for_path(merged_file)
+        with replace_when_done(merged_file) as part:
+            if merged_format == 'csv':
+                write_dts_csv(merged, part, units=False)
+            else:
+                write_cube(merged, part, merged_format)
+        log(f"✓ Zapisano scalony plik: {Path(merged_file).name}")
+
+    if max_diff is None:
+        max_diff = layout['max_time_diff']
+
+    sensors = [make_sensor(merged.axis, **entry) for entry in layout['sensors']]
+    for sensor in sensors:
+        for channel, _ in sensor['references']:
+            if reference is None or channel not in reference.channels:
+                log(f"UWAGA: Brak danych kanału {channel} dla czujnika {sensor['name']}")
+
+    return export_sensors(merged, sensors, export_dir, reference, max_diff, log, threads, fmt=fmt,
+                          aggregation=aggregation)
@@ -0,0 +1,266 @@
+"""
+Formaty eksportu obok szerokiego pliku CSV.
+
+Scalona macierz i wycinki czujników mogą być zapisane jako:
+    - npz: archiwum NumPy (skompresowane) z tablicami times (datetime64[s]),
+      positions (float64 [m]) i data (float32, przebieg × pozycja), a przy
+      kalibracji także ref_temp (float64, NaN = brak), ref_time
+      (datetime64[s], NaT = brak), ref_channel i ref_position,
+    - parquet: tabela z wierszem na przebieg - kolumny time, opcjonalnie
+      ref_temp i ref_time, oraz kolumna float32 dla każdej pozycji (nazwa
+      jak w CSV, np. "12.25"). Wymaga pakietu pyarrow.
+    - long / long-gz: format długi (rekord na pomiar) do wczytywania do baz
+      szeregów czasowych - wiersze timestamp;position;temperature, a przy
+      kalibracji także calibrated;ref_temp, w kolejności czasu. Zapis
+      przebiega porcjami przebiegów, więc zużycie pamięci nie zależy od
+      długości kampanii (także dla magazynu DtsStore); long-gz kompresuje
+      plik gzipem.
+
+Przy kalibracji wielopunktowej każdy punkt referencyjny ma własne
+kolumny/tablice z numerem punktu: ref_temp_1, ref_time_1, ref_channel_1,
+ref_position_1, ref_temp_2, ... (kolejność jak w opisie czujnika).
+
+Wczytanie formatów binarnych: np.load(plik)['data'] albo
+pyarrow.parquet.read_table(plik) / pandas.read_parquet(plik) - bez
+parsowania tekstu.
+"""
+
+import csv
+import gzip
+import importlib.util
+import json
+import os
+
+import numpy as np
+
+import dts_metrics as metrics
+from dts_cube import format_values
+from dts_time import format_datetimes
+
+
+# Format -> rozszerzenie pliku
+EXPORT_FORMATS = {
+    'csv': '.csv',
+    'npz': '.npz',
+    'parquet': '.parquet',
+    'long': '.long.csv',
+    'long-gz': '.long.csv.gz',
+}
+
+# Formaty długie (rekord na pomiar)
+LONG_FORMATS = ('long', 'long-gz')
+
+# Liczba rekordów zapisywanych naraz w formacie długim
+LONG_CHUNK_RECORDS = 65536
+
+
+def parquet_available():
+    """Czy zainstalowany jest pakiet pyarrow (format parquet)."""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def available_formats():
+    """Zwraca formaty eksportu możliwe w tym środowisku."""
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'parquet' or parquet_available()]
+
+
+def check_format(fmt):
+    """Sprawdza, czy format jest znany i dostępny (ValueError w przeciwnym razie)."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Nieznany format eksportu: {fmt} (dostępne: {', '.join(EXPORT_FORMATS)})")
+    if fmt == 'parquet' and not parquet_available():
+        raise ValueError("Format parquet wymaga pakietu pyarrow (pip install pyarrow)")
+
+
+def format_for_path(filepath):
+    """Zwraca format eksportu wynikający z rozszerzenia pliku (domyślnie csv)."""
+    name = os.path.basename(str(filepath)).lower()
+    # Najpierw najdłuższe rozszerzenia (.long.csv przed .csv)
+    for fmt, suffix in sorted(EXPORT_FORMATS.items(), key=lambda item: -len(item[1])):
+        if name.endswith(suffix):
+            return fmt
+    return 'csv'
+
+
+def reference_suffixes(n_references):
+    """Zwraca przyrostki nazw kolumn punktów referencyjnych ('' dla jednego, _1, _2, ... dla wielu)."""
+    if n_references == 1:
+        return ['']
+    return [f"_{i + 1}" for i in range(n_references)]
+
+
+def write_npz(filepath, times, positions, data, references=()):
+    """
+    Zapisuje macierz pomiarów jako skompresowane archiwum NumPy.
+
+    Args:
+        filepath: Ścieżka pliku
+        times: Czasy przebiegów (datetime64[s])
+        positions: Pozycje [m] (w kolejności kolumn data)
+        data: Temperatury (przebieg × pozycja)
+        references: Punkty kalibracji - słowniki z kluczami channel,
+            position, temps, times (opcjonalnie)
+    """
+    arrays = {
+        'times': np.asarray(times, dtype='datetime64[s]'),
+        'positions': np.asarray(positions, dtype=np.float64),
+        'data': np.asarray(data, dtype=np.float32),
+    }
+    for suffix, reference in zip(reference_suffixes(len(references)), references):
+        arrays[f'ref_temp{suffix}'] = np.asarray(reference['temps'], dtype=np.float64)
+        arrays[f'ref_time{suffix}'] = np.asarray(reference['times'], dtype='datetime64[s]')
+        arrays[f'ref_channel{suffix}'] = np.array(reference['channel'])
+        arrays[f'ref_position{suffix}'] = np.array(reference['position'], dtype=np.float64)
+
+    # Obiekt pliku - np.savez nie dopisuje wtedy rozszerzenia do nazwy pliku tymczasowego
+    with open(filepath, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+
+
+def write_parquet(filepath, times, positions, data, references=()):
+    """
+    Zapisuje macierz pomiarów jako tabelę Parquet (wiersz na przebieg).
+
+    Brakujące wartości są zapisywane jako null. Oś pozycji oraz kanały
+    i metry punktów referencyjnych są także w metadanych schematu
+    (klucz ap_sensing).
+
+    Args:
+        filepath: Ścieżka pliku
+        times: Czasy przebiegów (datetime64[s])
+        positions: Pozycje [m] (w kolejności kolumn data)
+        data: Temperatury (przebieg × pozycja)
+        references: Punkty kalibracji - słowniki z kluczami channel,
+            position, temps, times (opcjonalnie)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    positions = np.asarray(positions, dtype=np.float64)
+    columns = {'time': pa.array(np.asarray(times, dtype='datetime64[s]'), from_pandas=True)}
+    metadata = {'positions': positions.tolist()}
+    for suffix, reference in zip(reference_suffixes(len(references)), references):
+        temps = np.asarray(reference['temps'], dtype=np.float64)
+        ref_times = np.asarray(reference['times'], dtype='datetime64[s]')
+        columns[f'ref_temp{suffix}'] = pa.array(temps, from_pandas=True)
+        columns[f'ref_time{suffix}'] = pa.array(ref_times, from_pandas=True)
+        metadata[f'ref_channel{suffix}'] = reference['channel']
+        metadata[f'ref_position{suffix}'] = float(reference['position'])
+
+    # Kolumny pozycji z ciągłej kopii transponowanej macierzy (pozycja × przebieg)
+    by_position = np.ascontiguousarray(np.asarray(data, dtype=np.float32).T)
+    for position, values in zip(positions.tolist(), by_position):
+        columns[f"{position:.2f}"] = pa.array(values, from_pandas=True)
+
+    table = pa.table(columns).replace_schema_metadata(
+        {'ap_sensing': json.dumps(metadata)})
+    pq.write_table(table, filepath, compression='zstd')
+
+
+def write_matrix(filepath, fmt, times, positions, data, references=()):
+    """
+    Zapisuje macierz pomiarów w formacie binarnym fmt (npz lub parquet).
+
+    Args:
+        filepath: Ścieżka pliku
+        fmt: Format (klucz EXPORT_FORMATS, poza csv)
+        times: Czasy przebiegów (datetime64[s])
+        positions: Pozycje [m] (w kolejności kolumn data)
+        data: Temperatury (przebieg × pozycja)
+        references: Punkty kalibracji - słowniki z kluczami channel,
+            position, temps, times (opcjonalnie)
+    """
+    check_format(fmt)
+    if fmt not in ('npz', 'parquet'):
+        raise ValueError(f"Format {fmt} nie jest formatem binarnym")
+
+    with metrics.stage('binary_write') as stage:
+        if fmt == 'npz':
+            write_npz(filepath, times, positions, data, references)
+        else:
+            write_parquet(filepath, times, positions, data, references)
+        stage.add(rows=len(positions), cells=np.size(data),
+                  bytes_written=os.path.getsize(filepath))
+
+
+def write_long_csv(filepath, cube, start_idx=0, end_idx=None, reverse=False, calibration=None,
+                   ref_values=None, compress=False, progress=None):
+    """
+    Zapisuje pomiary w formacie długim: rekord (czas, pozycja, temperatura) na pomiar.
+
+    Przebiegi są czytane i zapisywane porcjami po ok. LONG_CHUNK_RECORDS
+    rekordów, więc w pamięci jest tylko bieżąca porcja.
+
+    Args:
+        filepath: Ścieżka pliku
+        cube: Scalone dane (DtsCube lub DtsStore)
+        start_idx: Indeks pierwszej pozycji
+        end_idx: Indeks ostatniej pozycji włącznie (None = ostatnia)
+        reverse: Czy zapisać pozycje w odwrotnej kolejności
+        calibration: Kalibracja czujnika (dts_calibration.SensorCalibration,
+            None = bez kalibracji; dodaje kolumnę calibrated i kolumny ref_temp)
+        ref_values: Temperatury referencyjne przebiegów (NaN = brak) - lista
+            tablic, po jednej na punkt referencyjny
+        compress: Czy kompresować plik gzipem
+        progress: Funkcja progress(zapisane_przebiegi, wszystkie_przebiegi) wywoływana po każdej porcji
+    """
+    if end_idx is None:
+        end_idx = cube.n_positions - 1
+    n_columns = abs(end_idx - start_idx) + 1
+    chunk_traces = max(1, LONG_CHUNK_RECORDS // n_columns)
+
+    header = ['timestamp', 'position', 'temperature']
+    if calibration is not None:
+        header += ['calibrated']
+        header += [f'ref_temp{suffix}' for suffix in reference_suffixes(len(ref_values))]
+
+    opener = gzip.open if compress else open
+    with metrics.stage('csv_write') as stage:
+        with opener(filepath, 'wt', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(header)
+
+            for first in range(0, cube.n_traces, chunk_traces):
+                chunk = cube.trace_slice(first, first + chunk_traces)
+                positions, block = chunk.position_slice(start_idx, end_idx, reverse=reverse)
+                n_traces = chunk.n_traces
+
+                # Kolumny porcji w kolejności (przebieg, pozycja)
+                columns = [
+                    [stamp for stamp in format_datetimes(chunk.times) for _ in range(n_columns)],
+                    [f"{position:.2f}" for position in positions.tolist()] * n_traces,
+                    format_values(block.ravel()),
+                ]
+                if calibration is not None:
+                    calibrated = calibration.apply(block, positions, first)
+                    columns.append(format_values(calibrated.ravel()))
+                    for values in ref_values:
+                        ref_texts = ['' if t != t else str(t)
+                                     for t in values[first:first + n_traces].tolist()]
+                        columns.append([text for text in ref_texts for _ in range(n_columns)])
+
+                writer.writerows(zip(*columns))
+                stage.add(rows=block.size, cells=block.size)
+
+                if progress is not None:
+                    progress(first + n_traces, cube.n_traces)
+
+        stage.add(bytes_written=os.path.getsize(filepath))
+
+
+def write_cube(cube, filepath, fmt, progress=None):
+    """
+    Zapisuje całą scaloną macierz (DtsCube lub DtsStore) w formacie innym niż CSV.
+
+    Args:
+        cube: Scalone dane
+        filepath: Ścieżka pliku
+        fmt: Format (npz, parquet, long lub long-gz)
+        progress: Funkcja progress(wykonane, wszystkie) (tylko format długi)
+    """
+    if fmt in LONG_FORMATS:
+        write_long_csv(filepath, cube, compress=fmt == 'long-gz', progress=progress)
+        return
+
+    positions, data = cube.position_slice(0, cube.n_positions - 1)
+    write_matrix(filepath, fmt, cube.times, positions, data)
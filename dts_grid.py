@@ -0,0 +1,136 @@
+"""
+Ujednolicanie osi pozycji plików przed scaleniem.
+
+Po zmianie konfiguracji reflektometru (inny krok próbkowania lub
+przesunięcie) pliki mają różne osie pozycji, a ich scalenie pod osią
+pierwszego pliku daje błędne dane. GridResampler przelicza przebiegi
+takich plików na wspólną siatkę referencyjną interpolacją liniową -
+jednym działaniem na macierzy dla wszystkich przebiegów pliku.
+
+Każda oś ma odcisk (skrót wartości pozycji). Pliki o odcisku siatki
+referencyjnej są przepuszczane bez sprawdzania, a wagi interpolacji
+są liczone raz dla każdej innej osi.
+"""
+
+import hashlib
+
+import numpy as np
+
+
+def grid_fingerprint(positions):
+    """Zwraca odcisk osi pozycji (skrót wartości float64)."""
+    positions = np.ascontiguousarray(positions, dtype=np.float64)
+    return hashlib.blake2b(positions.tobytes(), digest_size=16).hexdigest()
+
+
+def parse_grid(text):
+    """
+    Parsuje siatkę pozycji w postaci START:KONIEC:KROK (metry, koniec włącznie).
+
+    Returns:
+        np.ndarray: Pozycje siatki [m]
+    """
+    try:
+        start, end, step = (float(part.replace(',', '.')) for part in text.split(':'))
+    except ValueError:
+        raise ValueError(f"Niepoprawna siatka pozycji: {text} (oczekiwano START:KONIEC:KROK)")
+    if step <= 0 or end < start:
+        raise ValueError(f"Niepoprawna siatka pozycji: {text}")
+
+    n = int(np.floor((end - start) / step + 1e-9)) + 1
+    return np.round(start + step * np.arange(n), 6)
+
+
+def interpolation_weights(source, target):
+    """
+    Wylicza indeksy i wagi interpolacji liniowej z osi source na oś target.
+
+    Args:
+        source: Oś pozycji pliku [m] (rosnąca)
+        target: Siatka referencyjna [m]
+
+    Returns:
+        tuple: (indeksy lewych sąsiadów, wagi prawych sąsiadów, maska pozycji
+            poza zakresem osi source)
+    """
+    source = np.asarray(source, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    if not len(source):
+        return np.zeros(len(target), dtype=np.intp), np.zeros(len(target)), np.ones(len(target), dtype=bool)
+
+    outside = (target < source[0]) | (target > source[-1])
+    if len(source) == 1:
+        return np.zeros(len(target), dtype=np.intp), np.zeros(len(target)), outside
+
+    left = np.clip(np.searchsorted(source, target, side='right') - 1, 0, len(source) - 2)
+    weights = (target - source[left]) / (source[left + 1] - source[left])
+    return left, np.clip(weights, 0.0, 1.0), outside
+
+
+class GridResampler:
+    """Przelicza kostki o innych osiach pozycji na wspólną siatkę referencyjną."""
+
+    def __init__(self, positions=None):
+        """
+        Args:
+            positions: Siatka referencyjna [m] (None = oś pierwszej kostki)
+        """
+        self.positions = None
+        self.fingerprint = None
+        self._weights = {}
+        self.resampled = []
+        if positions is not None:
+            self.set_grid(positions)
+
+    def set_grid(self, positions):
+        """Ustawia siatkę referencyjną."""
+        self.positions = np.asarray(positions, dtype=np.float64)
+        self.fingerprint = grid_fingerprint(self.positions)
+        self._weights = {}
+
+    def resample(self, cube, name=None):
+        """
+        Zwraca kostkę na siatce referencyjnej (tę samą, jeśli osie są zgodne).
+
+        Pozycje siatki poza zakresem osi pliku dostają NaN (bez ekstrapolacji).
+
+        Args:
+            cube: Kostka DtsCube
+            name: Nazwa pliku źródłowego (do podsumowania)
+
+        Returns:
+            DtsCube: Kostka na siatce referencyjnej
+        """
+        if self.positions is None:
+            self.set_grid(cube.positions)
+
+        fingerprint = cube.grid_fingerprint
+        if fingerprint == self.fingerprint:
+            return cube
+
+        self.resampled.append(name or f"#{len(self.resampled) + 1}")
+        if not cube.n_positions:
+            data = np.full((cube.n_traces, len(self.positions)), np.nan, dtype=np.float32)
+            return type(cube)(cube.times, self.positions, data)
+
+        if fingerprint not in self._weights:
+            order = np.argsort(cube.positions, kind='stable')
+            left, weights, outside = interpolation_weights(cube.positions[order], self.positions)
+            self._weights[fingerprint] = (order[left], order[np.minimum(left + 1, len(order) - 1)],
+                                          weights, outside)
+        left, right, weights, outside = self._weights[fingerprint]
+
+        # Interpolacja wszystkich przebiegów naraz (przebieg × pozycja siatki)
+        lo = cube.data[:, left].astype(np.float64)
+        hi = cube.data[:, right].astype(np.float64)
+        data = np.where(weights == 0, lo, np.where(weights == 1, hi, lo + weights * (hi - lo)))
+        data[:, outside] = np.nan
+        return type(cube)(cube.times, self.positions, data.astype(np.float32))
+
+    def messages(self):
+        """Zwraca komunikaty podsumowania (pusta lista, gdy wszystkie osie były zgodne)."""
+        if not self.resampled:
+            return []
+        return [f"Przeliczono pozycje {len(self.resampled)} plików na siatkę "
+                f"{self.positions[0]:.2f}m - {self.positions[-1]:.2f}m "
+                f"({len(self.positions)} pozycji): {', '.join(self.resampled)}"]
@@ -0,0 +1,243 @@
+"""
+Indeks plików CSV AP Sensing według zakresu czasu.
+
+Dla każdego pliku czytane są tylko dwa pierwsze wiersze (Date: i Time:),
+więc indeks folderu z tysiącami plików powstaje w ułamku czasu
+parsowania. Indeks każdego folderu jest zapisywany w katalogu pamięci
+podręcznej (dts_cache, podkatalog index/) razem z rozmiarem i czasem
+modyfikacji każdego pliku - przy kolejnym użyciu czytane są tylko
+nagłówki plików nowych lub zmienionych. Folder z danymi nie jest
+modyfikowany.
+
+Zapytanie o zakres czasu zwraca pliki, których przebiegi na niego
+zachodzą, dzięki czemu eksport np. jednego dnia otwiera tylko kilka
+plików zamiast wszystkich.
+"""
+
+import csv
+import hashlib
+import json
+import os
+from itertools import zip_longest
+from pathlib import Path
+
+import numpy as np
+
+from dts_cache import DEFAULT_CACHE_DIR
+from dts_source import find_data_files, open_data_file, source_folder, source_name, source_signature
+from dts_time import parse_header_datetimes
+
+
+# Katalog indeksów folderów (w katalogu pamięci podręcznej)
+DEFAULT_INDEX_DIR = DEFAULT_CACHE_DIR / 'index'
+
+# Wersja formatu indeksu - zmiana powoduje ponowne odczytanie nagłówków
+INDEX_VERSION = 1
+
+
+def read_header_span(filepath):
+    """
+    Odczytuje zakres czasu pliku z wierszy Date: i Time: (bez czytania danych).
+
+    Returns:
+        tuple: (pierwszy czas, ostatni czas, liczba przebiegów) - czasy jako
+            datetime64[s] (None dla pliku bez przebiegów)
+
+    Raises:
+        ValueError: Dla niepoprawnego nagłówka
+    """
+    with open_data_file(filepath) as f:
+        header = [f.readline().decode('latin-1') for _ in range(2)]
+
+    rows = list(csv.reader(header, delimiter=';'))
+    if len(rows) < 2 or not rows[0] or not rows[1] or \
+            rows[0][0].strip() != 'Date:' or rows[1][0].strip() != 'Time:':
+        raise ValueError(f"Plik {source_name(filepath)} nie zaczyna się od wierszy Date: i Time:")
+
+    # Puste kolumny (np. po końcowym średniku) są pomijane w obu wierszach naraz
+    columns = [(date, time_str)
+               for date, time_str in zip_longest(rows[0][1:], rows[1][1:], fillvalue='')
+               if date.strip() or time_str.strip()]
+    dates = [date for date, _ in columns]
+    times = [time_str for _, time_str in columns]
+    try:
+        datetimes = parse_header_datetimes(dates, times)
+    except ValueError as e:
+        raise ValueError(f"Błąd parsowania daty/czasu w pliku {filepath}: {e}") from e
+
+    if not len(datetimes):
+        return None, None, 0
+    return datetimes.min(), datetimes.max(), len(datetimes)
+
+
+def default_index_path(folder, index_dir=DEFAULT_INDEX_DIR):
+    """Zwraca plik indeksu folderu w katalogu index_dir (nazwa to skrót pełnej ścieżki folderu)."""
+    digest = hashlib.sha1(str(Path(folder).resolve()).encode()).hexdigest()
+    return Path(index_dir) / f"{digest}.json"
+
+
+class FileIndex:
+    """Zakresy czasu plików CSV jednego folderu (trwały indeks nagłówków)."""
+
+    def __init__(self, folder, index_path=None):
+        """
+        Args:
+            folder: Folder z plikami CSV
+            index_path: Plik indeksu (domyślnie default_index_path(folder))
+        """
+        self.folder = Path(folder)
+        self.index_path = Path(index_path) if index_path else default_index_path(folder)
+        self.entries = {}
+        self.changed = False
+
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == INDEX_VERSION:
+                self.entries = index['files']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def refresh(self, filepaths=None):
+        """
+        Uzupełnia indeks o pliki nowe lub zmienione (czytając tylko ich nagłówki).
+
+        Args:
+            filepaths: Pliki do zaindeksowania (None = wszystkie pliki z pomiarami
+                w folderze, także skompresowane i z archiwów ZIP); wpisy
+                pozostałych plików (np. usuniętych z folderu lub z archiwum)
+                są kasowane
+
+        Returns:
+            int: Liczba plików, których nagłówki zostały odczytane
+        """
+        if filepaths is None:
+            filepaths = find_data_files(self.folder)
+
+        names = set()
+        n_read = 0
+        for filepath in filepaths:
+            name = source_name(filepath)
+            names.add(name)
+            try:
+                size, mtime_ns = source_signature(filepath)
+            except OSError:
+                continue
+
+            entry = self.entries.get(name)
+            if entry is not None and entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+                continue
+
+            entry = {'size': size, 'mtime_ns': mtime_ns,
+                     'first': None, 'last': None, 'n_traces': 0, 'error': None}
+            try:
+                first, last, entry['n_traces'] = read_header_span(filepath)
+                entry['first'] = None if first is None else str(first)
+                entry['last'] = None if last is None else str(last)
+            except (OSError, ValueError, EOFError) as e:
+                entry['error'] = str(e)
+            self.entries[name] = entry
+            self.changed = True
+            n_read += 1
+
+        for name in set(self.entries) - names:
+            del self.entries[name]
+            self.changed = True
+        return n_read
+
+    def save(self):
+        """
+        Zapisuje indeks, jeśli się zmienił (atomowo, przez plik tymczasowy).
+
+        Brak prawa zapisu w katalogu indeksu nie jest błędem - indeks
+        zostanie wtedy zbudowany ponownie przy następnym użyciu.
+        """
+        if not self.changed:
+            return
+        tmp_path = self.index_path.with_name(self.index_path.name + '.tmp')
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'files': self.entries}, f, indent=1)
+            os.replace(tmp_path, self.index_path)
+            self.changed = False
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+
+    def span(self, filepath):
+        """
+        Zwraca zakres czasu pliku z indeksu.
+
+        Returns:
+            tuple: (pierwszy, ostatni) jako datetime64[s] albo (None, None)
+            dla pliku spoza indeksu, bez przebiegów lub z błędnym nagłówkiem
+        """
+        entry = self.entries.get(source_name(filepath))
+        if entry is None or entry['first'] is None:
+            return None, None
+        return np.datetime64(entry['first'], 's'), np.datetime64(entry['last'], 's')
+
+    def overlaps(self, filepath, start=None, end=None):
+        """
+        Czy przebiegi pliku mogą zachodzić na zakres [start, end].
+
+        Pliki z nieczytelnym nagłówkiem są zawsze wybierane, aby błąd
+        zgłosiło parsowanie.
+        """
+        entry = self.entries.get(source_name(filepath))
+        if entry is None or entry['error']:
+            return True
+        if entry['first'] is None:
+            return False
+        first, last = self.span(filepath)
+        return (start is None or last >= np.datetime64(start, 's')) and \
+            (end is None or first <= np.datetime64(end, 's'))
+
+
+def file_spans(filepaths):
+    """
+    Zwraca zakresy czasu plików (z indeksów ich folderów, odświeżanych i zapisywanych).
+
+    Returns:
+        dict: Ścieżka (jak w filepaths) -> (pierwszy, ostatni) jako datetime64[s]
+            albo (None, None)
+    """
+    spans = {}
+    for index, files in _indexes(filepaths):
+        for filepath in files:
+            spans[filepath] = index.span(filepath)
+    return spans
+
+
+def select_files(filepaths, start=None, end=None):
+    """
+    Wybiera pliki, których przebiegi zachodzą na zakres czasu [start, end].
+
+    Args:
+        filepaths: Lista ścieżek do plików CSV
+        start: Początek zakresu (datetime64/datetime, None = bez ograniczenia)
+        end: Koniec zakresu włącznie (None = bez ograniczenia)
+
+    Returns:
+        list: Wybrane ścieżki (w kolejności filepaths)
+    """
+    if start is None and end is None:
+        return list(filepaths)
+
+    selected = set()
+    for index, files in _indexes(filepaths):
+        selected.update(filepath for filepath in files if index.overlaps(filepath, start, end))
+    return [filepath for filepath in filepaths if filepath in selected]
+
+
+def _indexes(filepaths):
+    """Grupuje pliki według folderów i zwraca pary (odświeżony FileIndex, pliki folderu)."""
+    folders = {}
+    for filepath in filepaths:
+        folders.setdefault(source_folder(filepath), []).append(filepath)
+
+    for folder, files in folders.items():
+        index = FileIndex(folder)
+        index.refresh(files)
+        index.save()
+        yield index, files
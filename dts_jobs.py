@@ -0,0 +1,84 @@
+"""
+Zadania w tle z raportowaniem postępu i możliwością przerwania.
+
+Zadanie wykonuje funkcję w wątku roboczym. Postęp, komunikaty do logu
+i wynik trafiają do kolejki (queue.Queue), którą wątek interfejsu
+odczytuje cyklicznie (np. przez root.after), więc okno pozostaje
+responsywne. Przerwanie ustawia flagę sprawdzaną przy każdym
+raporcie postępu.
+"""
+
+import queue
+import threading
+
+
+class JobCancelled(Exception):
+    """Zadanie zostało przerwane przez użytkownika."""
+
+
+class BackgroundJob:
+    """Funkcja wykonywana w wątku roboczym, raportująca postęp przez kolejkę."""
+
+    def __init__(self, target, *args):
+        """
+        Args:
+            target: Funkcja wywoływana jako target(job, *args); jej wynik
+                jest przekazywany w komunikacie 'done'
+            args: Dodatkowe argumenty funkcji
+        """
+        self.queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(target, args), daemon=True)
+
+    def start(self):
+        """Uruchamia zadanie."""
+        self.thread.start()
+        return self
+
+    def _run(self, target, args):
+        try:
+            result = target(self, *args)
+        except JobCancelled:
+            self.queue.put(('cancelled', None))
+        except Exception as e:
+            self.queue.put(('error', e))
+        else:
+            self.queue.put(('done', result))
+
+    def cancel(self):
+        """Zgłasza przerwanie zadania (zadziała przy najbliższym raporcie postępu)."""
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        """Czy zgłoszono przerwanie."""
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Zgłasza JobCancelled, jeśli zadanie przerwano."""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def progress(self, stage, done, total):
+        """
+        Raportuje postęp etapu i sprawdza, czy zadanie przerwano.
+
+        Args:
+            stage: Nazwa etapu (np. "Wczytywanie plików")
+            done: Liczba wykonanych kroków
+            total: Łączna liczba kroków
+        """
+        self.check_cancelled()
+        self.queue.put(('progress', (stage, done, total)))
+
+    def log(self, message):
+        """Przekazuje komunikat do logu interfejsu."""
+        self.queue.put(('log', message))
+
+    def messages(self):
+        """Zwraca (bez czekania) wszystkie komunikaty oczekujące w kolejce."""
+        while True:
+            try:
+                yield self.queue.get_nowait()
+            except queue.Empty:
+                return
@@ -0,0 +1,177 @@
+"""
+Pomiar czasu i liczników etapów przetwarzania.
+
+Dla każdego etapu (parsowanie plików, scalanie i sortowanie, dopasowanie
+referencji, kalibracja, statystyki czasowe, zapis CSV i formatów binarnych) sumowane są:
+czas, liczba wywołań, wierszy, komórek oraz bajtów przeczytanych i zapisanych.
+
+Pomiary są domyślnie wyłączone - stage() zwraca wtedy wspólny pusty
+obiekt, więc koszt to jedno wywołanie funkcji na etap (nie na komórkę).
+Włącza je enable() (opcja programu) lub zmienna środowiskowa
+AP_SENSING_METRICS=1.
+
+Użycie:
+    with metrics.stage('csv_write') as stage:
+        ...
+        stage.add(rows=n, bytes_written=size)
+"""
+
+import json
+import os
+import threading
+import time
+
+
+# Etapy w kolejności podsumowania (pozostałe są dopisywane na końcu)
+STAGES = ['file_parse', 'merge_sort', 'reference_load', 'reference_match', 'calibration',
+          'aggregate', 'csv_write', 'binary_write']
+
+_COUNTERS = ('rows', 'cells', 'bytes_read', 'bytes_written')
+
+
+class _NullStage:
+    """Etap, gdy pomiary są wyłączone (nic nie robi)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, **counters):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """Pomiar jednego wykonania etapu."""
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.counters = dict.fromkeys(_COUNTERS, 0)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter() - self.start, **self.counters)
+        return False
+
+    def add(self, **counters):
+        """Dodaje liczniki (rows, cells, bytes_read, bytes_written)."""
+        for key, value in counters.items():
+            self.counters[key] += int(value)
+
+
+class Metrics:
+    """Zebrane pomiary etapów (bezpieczne przy wielu wątkach)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+
+    def record(self, name, seconds, calls=1, **counters):
+        """Dodaje wykonanie etapu (calls=0 - same liczniki, bez wykonania)."""
+        with self._lock:
+            stage = self.stages.setdefault(name, dict(calls=0, seconds=0.0,
+                                                      **dict.fromkeys(_COUNTERS, 0)))
+            stage['calls'] += calls
+            stage['seconds'] += seconds
+            for key, value in counters.items():
+                stage[key] += value
+
+    def ordered(self):
+        """Zwraca etapy w kolejności STAGES."""
+        with self._lock:
+            names = [name for name in STAGES if name in self.stages]
+            names += [name for name in self.stages if name not in STAGES]
+            return [(name, dict(self.stages[name])) for name in names]
+
+    def summary(self):
+        """
+        Zwraca podsumowanie jako wiersze tekstu (jeden na etap).
+
+        Przy eksporcie w wielu wątkach czas etapu jest sumą czasów wątków.
+        """
+        lines = []
+        for name, stage in self.ordered():
+            parts = [f"{name:15s} {stage['seconds']:8.3f} s", f"×{stage['calls']}"]
+            if stage['rows']:
+                parts.append(f"wiersze: {stage['rows']}")
+            if stage['cells']:
+                parts.append(f"komórki: {stage['cells']}")
+            if stage['bytes_read']:
+                parts.append(f"odczyt: {stage['bytes_read'] / 1e6:.1f} MB")
+            if stage['bytes_written']:
+                parts.append(f"zapis: {stage['bytes_written'] / 1e6:.1f} MB")
+            lines.append(" | ".join(parts))
+        return lines
+
+    def report(self):
+        """Zwraca pomiary jako słownik (do zapisu w JSON)."""
+        return {'stages': [dict(name=name, **stage) for name, stage in self.ordered()]}
+
+    def write_json(self, filepath):
+        """Zapisuje raport JSON."""
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+_active = Metrics() if os.environ.get('AP_SENSING_METRICS', '') not in ('', '0') else None
+
+
+def enable():
+    """Włącza pomiary (od zera) i zwraca obiekt Metrics."""
+    global _active
+    _active = Metrics()
+    return _active
+
+
+def disable():
+    """Wyłącza pomiary."""
+    global _active
+    _active = None
+
+
+def active():
+    """Zwraca bieżące pomiary (None, gdy wyłączone)."""
+    return _active
+
+
+def publish(filepath=None, log=print):
+    """
+    Przekazuje zebrane pomiary (nic nie robi, gdy są wyłączone).
+
+    Args:
+        filepath: Plik raportu JSON (None = podsumowanie przez log)
+        log: Funkcja log(message) dla komunikatów
+    """
+    metrics = _active
+    if metrics is None:
+        return
+    if filepath:
+        metrics.write_json(filepath)
+        log(f"Pomiary etapów zapisane: {filepath}")
+    else:
+        log("Pomiary etapów:")
+        for line in metrics.summary():
+            log(f"  {line}")
+
+
+def stage(name):
+    """Zwraca kontekst pomiaru etapu name (pusty, gdy pomiary są wyłączone)."""
+    metrics = _active
+    if metrics is None:
+        return _NULL_STAGE
+    return _Stage(metrics, name)
+
+
+def count(name, **counters):
+    """Dodaje liczniki do etapu name bez pomiaru czasu (np. rozmiar pliku po zapisie)."""
+    metrics = _active
+    if metrics is not None:
+        metrics.record(name, 0.0, calls=0, **counters)
@@ -0,0 +1,251 @@
+"""
+Dopasowanie pomiarów referencyjnych (svws_measurements.csv) do przebiegów DTS.
+
+Znaczniki czasu referencji są trzymane jako posortowana tablica sekund
+od epoki, dzięki czemu dopasowanie wszystkich przebiegów to jedno
+wywołanie np.searchsorted zamiast skanowania całego pliku dla każdego
+przebiegu.
+
+Dane są trzymane kolumnowo: jedna tablica czasów i osobna tablica float
+dla każdego kanału. Przy otwarciu pliku czytany jest tylko nagłówek
+(lista kanałów); czasy i kolumny kanałów są wczytywane dopiero przy
+pierwszym użyciu - tylko dla kanałów, których używają czujniki.
+"""
+
+import csv
+import os
+import threading
+
+import numpy as np
+
+import dts_metrics as metrics
+from dts_time import DEFAULT_TIMEZONE, format_datetimes, parse_reference_datetimes, utc_to_local
+
+
+# Domyślna maksymalna różnica czasu między przebiegiem a pomiarem referencyjnym [s]
+DEFAULT_MAX_TIME_DIFF = 600
+
+
+def epoch_seconds(times):
+    """
+    Zamienia znaczniki czasu na sekundy od epoki (int64).
+
+    Args:
+        times: Lista obiektów datetime lub tablica datetime64
+
+    Returns:
+        np.ndarray: Tablica int64 z sekundami
+    """
+    return np.asarray(times, dtype='datetime64[s]').astype(np.int64)
+
+
+def match_nearest(ref_epochs, query_epochs, max_diff=DEFAULT_MAX_TIME_DIFF):
+    """
+    Znajduje najbliższy w czasie pomiar referencyjny dla każdego przebiegu.
+
+    Przy równej odległości wybierany jest wcześniejszy pomiar, a przy
+    zduplikowanych znacznikach czasu - pierwszy z nich.
+
+    Args:
+        ref_epochs: Posortowana rosnąco tablica sekund pomiarów referencyjnych
+        query_epochs: Tablica sekund przebiegów światłowodowych
+        max_diff: Maksymalna dopuszczalna różnica czasu [s] (None = bez limitu)
+
+    Returns:
+        np.ndarray: Indeksy pomiarów referencyjnych (-1 = brak dopasowania)
+    """
+    ref_epochs = np.asarray(ref_epochs, dtype=np.int64)
+    query_epochs = np.asarray(query_epochs, dtype=np.int64)
+
+    if len(ref_epochs) == 0:
+        return np.full(len(query_epochs), -1, dtype=np.intp)
+
+    right = np.searchsorted(ref_epochs, query_epochs, side='left')
+    left = np.clip(right - 1, 0, len(ref_epochs) - 1)
+    right = np.clip(right, 0, len(ref_epochs) - 1)
+
+    left_diff = np.abs(query_epochs - ref_epochs[left])
+    right_diff = np.abs(ref_epochs[right] - query_epochs)
+    use_left = left_diff <= right_diff
+
+    nearest = np.where(use_left, left, right)
+    diff = np.where(use_left, left_diff, right_diff)
+
+    # Pierwsze wystąpienie danego znacznika czasu
+    nearest = np.searchsorted(ref_epochs, ref_epochs[nearest], side='left')
+
+    if max_diff is not None:
+        nearest = np.where(diff <= max_diff, nearest, -1)
+    return nearest.astype(np.intp)
+
+
+def parse_temperatures(cells):
+    """
+    Zamienia komórki kanału na tablicę float64 (NaN dla pustych i niepoprawnych).
+
+    Args:
+        cells: Napisy komórek (mogą być w cudzysłowach, np. "14.934")
+
+    Returns:
+        np.ndarray: Temperatury [°C]
+    """
+    cells = [cell.replace('"', '') for cell in cells]
+    try:
+        return np.array(cells, dtype=np.float64)
+    except ValueError:
+        pass
+
+    values = np.full(len(cells), np.nan)
+    for i, cell in enumerate(cells):
+        try:
+            values[i] = float(cell)
+        except ValueError:
+            pass
+    return values
+
+
+class ReferenceData:
+    """
+    Pomiary referencyjne z pliku svws_measurements.csv w układzie kolumnowym.
+
+    Atrybuty:
+        filepath: Ścieżka do pliku
+        timezone: Strefa czasowa pomiarów po konwersji z UTC (None = strefa systemu)
+        channels: Nazwy kanałów (np. CH001) - z samego nagłówka
+    """
+
+    def __init__(self, filepath, timezone=DEFAULT_TIMEZONE):
+        self.filepath = filepath
+        self.timezone = timezone
+        with open(filepath, 'r', encoding='latin-1') as f:
+            header = next(csv.reader(f, delimiter=';'), [])
+
+        # Znajdź kolumny z kanałami (CHxxx_temp_val_c)
+        self._columns = {}
+        for idx, col_name in enumerate(header):
+            if '_temp_val_c' in col_name:
+                self._columns[col_name.split('_')[0]] = idx  # np. CH001
+        self.channels = list(self._columns)
+
+        self._lock = threading.Lock()
+        self._times = None
+        self._valid = None
+        self._order = None
+        self._values = {}
+
+    def _read_cells(self, columns):
+        """Czyta komórki podanych kolumn ze wszystkich wierszy danych (jedno przejście)."""
+        cells = [[] for _ in columns]
+        with metrics.stage('reference_load') as stage, \
+                open(self.filepath, 'r', encoding='latin-1') as f:
+            reader = csv.reader(f, delimiter=';')
+            next(reader, None)
+            for row in reader:
+                if not row or not row[0]:
+                    continue
+                for column, idx in zip(cells, columns):
+                    column.append(row[idx] if idx < len(row) else '')
+            stage.add(rows=len(cells[0]), cells=len(cells[0]) * len(columns),
+                      bytes_read=os.path.getsize(self.filepath))
+        return cells
+
+    def _load_times(self):
+        """Wczytuje kolumnę czasów (raz)."""
+        if self._times is not None:
+            return
+
+        # Timestampy w pliku są w UTC - parsuj wszystkie naraz i konwertuj na czas lokalny
+        timestamps, valid = parse_reference_datetimes(self._read_cells([0])[0])
+        timestamps = utc_to_local(timestamps[valid], self.timezone)
+
+        # Sortuj chronologicznie (powinny być już posortowane, ale dla pewności)
+        self._order = np.argsort(timestamps, kind='stable')
+        self._valid = valid
+        self._times = timestamps[self._order]
+
+    def load_channels(self, channels):
+        """Wczytuje kolumny kanałów, których jeszcze nie ma w pamięci (jedno przejście po pliku)."""
+        with self._lock:
+            self._load_times()
+            missing = [channel for channel in dict.fromkeys(channels)
+                       if channel in self._columns and channel not in self._values]
+            if not missing:
+                return
+
+            columns = self._read_cells([self._columns[channel] for channel in missing])
+            for channel, cells in zip(missing, columns):
+                if len(cells) != len(self._valid):
+                    raise ValueError(f"Plik {self.filepath} zmienił się podczas wczytywania")
+                self._values[channel] = parse_temperatures(cells)[self._valid][self._order]
+
+    @property
+    def times(self):
+        """Czasy pomiarów (datetime64[s], czas lokalny, rosnąco)."""
+        with self._lock:
+            self._load_times()
+        return self._times
+
+    @property
+    def epochs(self):
+        """Posortowane sekundy od epoki do wyszukiwania binarnego."""
+        return epoch_seconds(self.times)
+
+    def __len__(self):
+        """Liczba pomiarów z poprawnym znacznikiem czasu."""
+        return len(self.times)
+
+    def channel(self, channel):
+        """Zwraca temperatury kanału (float64, NaN = brak wartości), wczytując je przy pierwszym użyciu."""
+        self.load_channels([channel])
+        return self._values[channel]
+
+
+def read_reference_csv(filepath, timezone=DEFAULT_TIMEZONE):
+    """
+    Otwiera plik pomiarów referencyjnych (svws_measurements.csv).
+
+    Czytany jest tylko nagłówek; czasy (w pliku UTC, zamieniane na czas
+    lokalny) i kolumny kanałów są wczytywane przy pierwszym użyciu.
+
+    Args:
+        filepath: Ścieżka do pliku referencyjnego
+        timezone: Strefa czasowa nagłówków plików DTS, np. Europe/Warsaw
+            (None = strefa systemu)
+
+    Returns:
+        ReferenceData: Dane referencyjne
+    """
+    return ReferenceData(filepath, timezone)
+
+
+def reference_temperatures(reference, times, channel, max_diff=DEFAULT_MAX_TIME_DIFF):
+    """
+    Dopasowuje pomiary referencyjne kanału do wszystkich przebiegów naraz.
+
+    Args:
+        reference: Dane referencyjne z read_reference_csv (None = brak)
+        times: Czasy przebiegów (datetime64 lub lista datetime)
+        channel: Nazwa kanału (np. CH001)
+        max_diff: Maksymalna dopuszczalna różnica czasu [s] (None = bez limitu)
+
+    Returns:
+        tuple: (temperatury, daty_ref) - tablica float z NaN tam, gdzie brak
+            dopasowania lub wartości, oraz lista napisów czasu (None = brak)
+    """
+    n = len(times)
+    if reference is None or channel not in reference.channels:
+        return np.full(n, np.nan), [None] * n
+
+    values = reference.channel(channel)
+    indices = match_nearest(reference.epochs, epoch_seconds(times), max_diff)
+
+    # Przebiegi z dopasowanym pomiarem, który ma wartość
+    matched = np.flatnonzero(indices >= 0)
+    matched = matched[~np.isnan(values[indices[matched]])]
+
+    ref_temps = np.full(n, np.nan)
+    ref_temps[matched] = values[indices[matched]]
+    ref_datetimes = [None] * n
+    for j, text in zip(matched.tolist(), format_datetimes(reference.times[indices[matched]])):
+        ref_datetimes[j] = text
+    return ref_temps, ref_datetimes
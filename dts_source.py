@@ -0,0 +1,193 @@
+"""
+Pliki wejściowe AP Sensing: zwykłe, skompresowane i w archiwach ZIP.
+
+Obsługiwane są pliki .csv, .csv.gz, .csv.bz2 i .csv.xz oraz pliki CSV
+wewnątrz archiwów .zip. Dekompresja odbywa się strumieniowo podczas
+czytania (bez rozpakowywania na dysk), a każdy plik z archiwum jest
+osobną pozycją listy plików, więc archiwa są parsowane równolegle tak
+jak zwykłe pliki.
+
+Plik z archiwum ma ścieżkę <archiwum.zip>::<nazwa w archiwum>, np.
+dane/2024-01.zip::pomiary/plik_001.csv.
+"""
+
+import bz2
+import gzip
+import lzma
+import os
+import zipfile
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+
+# Separator ścieżki archiwum i nazwy pliku w archiwum
+ARCHIVE_SEPARATOR = '::'
+
+# Rozszerzenie -> funkcja otwierająca skompresowany plik
+COMPRESSED_OPENERS = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open,
+}
+
+# Rozszerzenia plików z pomiarami (z kompresją lub bez)
+DATA_SUFFIXES = ('.csv',) + tuple(f'.csv{suffix}' for suffix in COMPRESSED_OPENERS)
+
+# Wzorce plików wejściowych dla okien wyboru plików
+DATA_PATTERNS = ' '.join(f'*{suffix}' for suffix in DATA_SUFFIXES + ('.zip',))
+
+
+def is_data_name(name):
+    """Czy nazwa pliku wskazuje na plik z pomiarami (CSV, także skompresowany)."""
+    return name.lower().endswith(DATA_SUFFIXES)
+
+
+def split_member(filepath):
+    """
+    Rozdziela ścieżkę pliku z archiwum.
+
+    Returns:
+        tuple: (ścieżka pliku lub archiwum, nazwa w archiwum albo None)
+    """
+    path, separator, member = str(filepath).partition(ARCHIVE_SEPARATOR)
+    if not separator:
+        return path, None
+    # Nazwy w archiwum ZIP zawsze używają ukośnika
+    return path, member.replace(os.sep, '/')
+
+
+def member_path(archive, member):
+    """Zwraca ścieżkę pliku member z archiwum archive."""
+    return Path(f"{archive}{ARCHIVE_SEPARATOR}{member}")
+
+
+def is_compressed(filepath):
+    """Czy plik jest skompresowany lub pochodzi z archiwum (brak szybkiego przewijania)."""
+    path, member = split_member(filepath)
+    return member is not None or Path(path).suffix.lower() in COMPRESSED_OPENERS
+
+
+@lru_cache(maxsize=64)
+def _archive_members(archive, size, mtime_ns):
+    """Zwraca pliki CSV archiwum (nazwa -> ZipInfo); klucz zawiera rozmiar i mtime archiwum."""
+    with zipfile.ZipFile(archive) as zf:
+        return {info.filename: info for info in zf.infolist()
+                if not info.is_dir() and is_data_name(info.filename)}
+
+
+def archive_members(archive):
+    """
+    Zwraca pliki CSV z archiwum ZIP (odczyt samego katalogu archiwum).
+
+    Returns:
+        dict: Nazwa w archiwum -> zipfile.ZipInfo
+    """
+    stat = os.stat(archive)
+    return _archive_members(str(archive), stat.st_size, stat.st_mtime_ns)
+
+
+def _member_info(archive, member):
+    """Zwraca ZipInfo pliku z archiwum (FileNotFoundError, gdy go nie ma)."""
+    try:
+        return archive_members(archive)[member]
+    except KeyError:
+        raise FileNotFoundError(f"Brak pliku {member} w archiwum {archive}") from None
+
+
+def _archive_files(archive):
+    """Zwraca ścieżki plików CSV z archiwum (ValueError dla uszkodzonego archiwum)."""
+    try:
+        members = archive_members(archive)
+    except (OSError, zipfile.BadZipFile) as e:
+        raise ValueError(f"Nie można odczytać archiwum {Path(archive).name}: {e}") from e
+    return [member_path(archive, member) for member in members]
+
+
+def find_data_files(folder):
+    """
+    Zwraca pliki z pomiarami w folderze: CSV (także skompresowane) i pliki CSV z archiwów ZIP.
+
+    Returns:
+        list: Ścieżki (Path) posortowane według nazwy
+    """
+    files = []
+    for path in Path(folder).iterdir():
+        if not path.is_file():
+            continue
+        if is_data_name(path.name):
+            files.append(path)
+        elif path.suffix.lower() == '.zip':
+            files.extend(_archive_files(path))
+    return sorted(files)
+
+
+def expand_archives(filepaths):
+    """Zastępuje archiwa ZIP na liście plików plikami CSV z ich wnętrza."""
+    files = []
+    for filepath in filepaths:
+        if split_member(filepath)[1] is None and Path(filepath).suffix.lower() == '.zip':
+            files.extend(_archive_files(filepath))
+        else:
+            files.append(filepath)
+    return files
+
+
+@contextmanager
+def open_data_file(filepath):
+    """
+    Otwiera plik z pomiarami do odczytu binarnego, dekompresując go w locie.
+
+    Args:
+        filepath: Ścieżka pliku CSV, skompresowanego CSV lub pliku z archiwum
+
+    Yields:
+        Obiekt pliku binarnego (readline/read)
+    """
+    path, member = split_member(filepath)
+    if member is not None:
+        with zipfile.ZipFile(path) as zf, zf.open(member) as f:
+            yield f
+        return
+
+    opener = COMPRESSED_OPENERS.get(Path(path).suffix.lower(), open)
+    with opener(path, 'rb') as f:
+        yield f
+
+
+def source_name(filepath):
+    """Zwraca nazwę pliku do raportów i indeksów (archiwum::nazwa dla plików z archiwum)."""
+    path, member = split_member(filepath)
+    if member is not None:
+        return f"{Path(path).name}{ARCHIVE_SEPARATOR}{member}"
+    return Path(path).name
+
+
+def source_folder(filepath):
+    """Zwraca folder, w którym leży plik (lub jego archiwum)."""
+    return Path(split_member(filepath)[0]).resolve().parent
+
+
+def source_signature(filepath):
+    """
+    Zwraca rozmiar i czas modyfikacji pliku (do wykrywania zmian).
+
+    Dla pliku z archiwum czas pochodzi z archiwum, a rozmiar jest
+    rozmiarem rozpakowanego pliku.
+
+    Returns:
+        tuple: (rozmiar [B], mtime [ns])
+    """
+    path, member = split_member(filepath)
+    stat = os.stat(path)
+    if member is None:
+        return stat.st_size, stat.st_mtime_ns
+    return _member_info(path, member).file_size, stat.st_mtime_ns
+
+
+def source_size(filepath):
+    """Zwraca liczbę bajtów pliku na dysku (dla pliku z archiwum - rozmiar skompresowany)."""
+    path, member = split_member(filepath)
+    if member is None:
+        return os.path.getsize(path)
+    return _member_info(path, member).compress_size
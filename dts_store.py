@@ -0,0 +1,293 @@
+"""
+Magazyn scalonych pomiarów DTS mapowany w pamięci (np.memmap).
+
+Katalog magazynu zawiera:
+    meta.json     - wersja, liczba przebiegów, rozmiar kafla
+    positions.npy - oś pozycji (float64)
+    times.bin     - czasy przebiegów, int64 (sekundy od epoki), tylko dopisywanie
+    data.bin      - temperatury float32 w kaflach (n_kafli, n_pozycji, TILE)
+
+Kafel to TILE kolejnych przebiegów zapisanych pozycjami, więc fragment
+czujnika w jednym kaflu jest ciągłym obszarem pliku. Nowe przebiegi
+dopisuje się na końcu (muszą być późniejsze od ostatniego), a odczyt
+wycinka pozycji i zakresu czasu dotyka tylko potrzebnych kafli i pozycji.
+Otwarcie magazynu czyta jedynie meta.json i mapuje pliki.
+"""
+
+import json
+import os
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+
+from dts_axis import PositionAxis
+from dts_cube import DtsCube
+from dts_time import format_dates, format_times
+
+
+STORE_VERSION = 1
+
+# Domyślna liczba przebiegów w kaflu
+DEFAULT_TILE_TRACES = 256
+
+
+class DtsStore:
+    """Magazyn przebiegów DTS z dostępem przez np.memmap."""
+
+    def __init__(self, path, start=0, stop=None):
+        """
+        Otwiera istniejący magazyn (lub jego zakres przebiegów [start, stop)).
+
+        Args:
+            path: Katalog magazynu
+            start: Indeks pierwszego przebiegu widoku
+            stop: Indeks za ostatnim przebiegiem widoku (None = do końca)
+        """
+        self.path = Path(path)
+        self.start = start
+        self._stop = stop  # None = widok do końca magazynu (także po dopisaniu)
+        self._load_meta()
+        self.positions = np.load(self.path / 'positions.npy', mmap_mode='r')
+
+    def _load_meta(self):
+        """Wczytuje meta.json i mapuje czasy przebiegów widoku."""
+        with open(self.path / 'meta.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Nieobsługiwana wersja magazynu: {meta.get('version')}")
+
+        self.tile_traces = meta['tile_traces']
+        self.total_traces = meta['n_traces']
+        self.stop = self.total_traces if self._stop is None else min(self._stop, self.total_traces)
+
+        if self.total_traces:
+            all_times = np.memmap(self.path / 'times.bin', dtype=np.int64, mode='r',
+                                  shape=(self.total_traces,))
+            self.times = all_times[self.start:self.stop].view('datetime64[s]')
+        else:
+            self.times = np.empty(0, dtype='datetime64[s]')
+
+    @classmethod
+    def create(cls, path, positions, tile_traces=DEFAULT_TILE_TRACES):
+        """
+        Tworzy pusty magazyn.
+
+        Args:
+            path: Katalog magazynu (nie może zawierać magazynu)
+            positions: Oś pozycji [m]
+            tile_traces: Liczba przebiegów w kaflu
+
+        Returns:
+            DtsStore: Otwarty magazyn
+        """
+        path = Path(path)
+        if (path / 'meta.json').exists():
+            raise FileExistsError(f"Magazyn już istnieje: {path}")
+
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / 'positions.npy', np.asarray(positions, dtype=np.float64))
+        (path / 'times.bin').touch()
+        (path / 'data.bin').touch()
+        _write_meta(path, {'version': STORE_VERSION, 'n_traces': 0,
+                           'tile_traces': tile_traces})
+        return cls(path)
+
+    @classmethod
+    def open_or_create(cls, path, positions):
+        """Otwiera magazyn lub tworzy nowy z podaną osią pozycji."""
+        if (Path(path) / 'meta.json').exists():
+            return cls(path)
+        return cls.create(path, positions)
+
+    @property
+    def n_traces(self):
+        """Liczba przebiegów w widoku."""
+        return self.stop - self.start
+
+    @property
+    def n_positions(self):
+        """Liczba pozycji pomiarowych."""
+        return len(self.positions)
+
+    @cached_property
+    def axis(self):
+        """Oś pozycji z szybkim wyszukiwaniem najbliższej pozycji (PositionAxis)."""
+        return PositionAxis(self.positions)
+
+    def _tiles(self, mode='r'):
+        """Mapuje plik danych jako tablicę (n_kafli, n_pozycji, TILE)."""
+        n_tiles = -(-self.total_traces // self.tile_traces)
+        return np.memmap(self.path / 'data.bin', dtype=np.float32, mode=mode,
+                         shape=(n_tiles, self.n_positions, self.tile_traces))
+
+    def datetimes(self):
+        """Zwraca czasy przebiegów jako listę obiektów datetime."""
+        return self.times.astype(object).tolist()
+
+    def date_strings(self):
+        """Zwraca daty przebiegów w formacie DD.MM.YYYY."""
+        return format_dates(self.times)
+
+    def time_strings(self):
+        """Zwraca czasy przebiegów w formacie HH:MM:SS."""
+        return format_times(self.times)
+
+    def time_window(self, start=None, end=None):
+        """
+        Zwraca widok ograniczony do przebiegów z zakresu czasu [start, end].
+
+        Args:
+            start: Początek zakresu (datetime/datetime64, None = bez ograniczenia)
+            end: Koniec zakresu włącznie (None = bez ograniczenia)
+
+        Returns:
+            DtsStore: Widok magazynu (bez wczytywania danych)
+        """
+        i0, i1 = 0, self.n_traces
+        if start is not None:
+            i0 = int(np.searchsorted(self.times, np.datetime64(start, 's'), side='left'))
+        if end is not None:
+            i1 = int(np.searchsorted(self.times, np.datetime64(end, 's'), side='right'))
+        return DtsStore(self.path, self.start + i0, self.start + max(i0, i1))
+
+    def trace_slice(self, start, stop):
+        """Zwraca widok przebiegów [start, stop) widoku (bez wczytywania danych)."""
+        start = min(max(start, 0), self.n_traces)
+        stop = min(max(stop, start), self.n_traces)
+        return DtsStore(self.path, self.start + start, self.start + stop)
+
+    def read_block(self, first_pos, last_pos):
+        """
+        Wczytuje pozycje [first_pos, last_pos] dla wszystkich przebiegów widoku.
+
+        Args:
+            first_pos: Indeks pierwszej pozycji
+            last_pos: Indeks ostatniej pozycji (włącznie)
+
+        Returns:
+            np.ndarray: Macierz float32 (n_traces, liczba_pozycji)
+        """
+        if self.n_traces == 0:
+            return np.empty((0, last_pos - first_pos + 1), dtype=np.float32)
+
+        t0 = self.start // self.tile_traces
+        t1 = (self.stop - 1) // self.tile_traces + 1
+        tiles = self._tiles()[t0:t1, first_pos:last_pos + 1, :]
+
+        # (kafle, pozycje, przebiegi) -> (przebiegi, pozycje)
+        block = tiles.transpose(0, 2, 1).reshape(-1, last_pos - first_pos + 1)
+        offset = self.start - t0 * self.tile_traces
+        return np.array(block[offset:offset + self.n_traces])
+
+    def column(self, idx):
+        """Zwraca temperatury na jednej pozycji dla wszystkich przebiegów widoku."""
+        return self.read_block(idx, idx)[:, 0]
+
+    def position_slice(self, start_idx, end_idx, reverse=False):
+        """
+        Wczytuje zakres pozycji (tylko potrzebne fragmenty pliku danych).
+
+        Args:
+            start_idx: Indeks pierwszej pozycji
+            end_idx: Indeks ostatniej pozycji (włącznie)
+            reverse: Czy odwrócić kolejność pozycji
+
+        Returns:
+            tuple: (pozycje, dane)
+        """
+        if start_idx > end_idx:
+            start_idx, end_idx = end_idx, start_idx
+
+        positions = self.positions[start_idx:end_idx + 1]
+        data = self.read_block(start_idx, end_idx)
+        if reverse:
+            return positions[::-1], data[:, ::-1]
+        return positions, data
+
+    def to_cube(self):
+        """Wczytuje cały widok do kostki DtsCube."""
+        return DtsCube(self.times, self.positions,
+                       self.read_block(0, self.n_positions - 1))
+
+    def last_time(self):
+        """Zwraca czas ostatniego przebiegu w magazynie (None dla pustego)."""
+        if not self.total_traces:
+            return None
+        return np.memmap(self.path / 'times.bin', dtype=np.int64, mode='r',
+                         shape=(self.total_traces,))[-1].astype('datetime64[s]')
+
+    def append(self, cube, only_newer=False):
+        """
+        Dopisuje przebiegi na końcu magazynu.
+
+        Widok zachowuje swój zakres przebiegów; widok otwarty do końca
+        magazynu (stop=None) obejmuje także dopisane przebiegi.
+
+        Args:
+            cube: DtsCube z przebiegami posortowanymi chronologicznie,
+                późniejszymi niż ostatni przebieg w magazynie
+            only_newer: Pomiń przebiegi nie późniejsze od ostatniego w magazynie
+                zamiast zgłaszać błąd
+
+        Returns:
+            int: Liczba dopisanych przebiegów
+        """
+        if not np.array_equal(cube.positions, self.positions):
+            raise ValueError("Pozycje dopisywanych danych różnią się od pozycji magazynu")
+        if np.any(np.diff(cube.times) < np.timedelta64(0, 's')):
+            raise ValueError("Dopisywane przebiegi nie są posortowane chronologicznie")
+
+        last = self.last_time()
+        if last is not None and cube.n_traces and cube.times[0] <= last:
+            if not only_newer:
+                raise ValueError("Dopisywane przebiegi nie są późniejsze od danych w magazynie")
+            cube = cube.take_traces(np.flatnonzero(cube.times > last))
+
+        if cube.n_traces == 0:
+            return 0
+
+        old_total = self.total_traces
+        new_total = old_total + cube.n_traces
+        tile = self.tile_traces
+
+        # Powiększ plik danych do pełnej liczby kafli
+        n_tiles = -(-new_total // tile)
+        tile_bytes = self.n_positions * tile * np.dtype(np.float32).itemsize
+        with open(self.path / 'data.bin', 'r+b') as f:
+            f.truncate(n_tiles * tile_bytes)
+
+        self.total_traces = new_total
+        tiles = self._tiles(mode='r+')
+        g = old_total
+        while g < new_total:
+            t, slot = divmod(g, tile)
+            n = min(tile - slot, new_total - g)
+            tiles[t, :, slot:slot + n] = cube.data[g - old_total:g - old_total + n].T
+            g += n
+        tiles.flush()
+        del tiles
+
+        # Zapis od pozycji wynikającej z meta.json (nadpisuje resztki przerwanego zapisu)
+        with open(self.path / 'times.bin', 'r+b') as f:
+            f.seek(old_total * np.dtype(np.int64).itemsize)
+            f.write(cube.times.astype(np.int64).tobytes())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Licznik przebiegów zapisywany na końcu - przerwany zapis nie psuje magazynu
+        _write_meta(self.path, {'version': STORE_VERSION, 'n_traces': new_total,
+                                'tile_traces': tile})
+
+        self._load_meta()
+        return cube.n_traces
+
+
+def _write_meta(path, meta):
+    """Zapisuje meta.json atomowo."""
+    tmp_path = Path(path) / 'meta.json.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, Path(path) / 'meta.json')
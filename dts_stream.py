@@ -0,0 +1,407 @@
+"""
+Strumieniowe łączenie plików CSV AP Sensing z ograniczonym zużyciem pamięci.
+
+Każdy plik wejściowy jest traktowany jako posortowany ciąg przebiegów
+(run). Kolejność wszystkich przebiegów wyznacza scalanie k ciągów na
+kopcu (heapq.merge) - do tego wystarczą same nagłówki Date:/Time:.
+Dane są następnie zapisywane blokami pozycji: z każdego pliku czytane
+jest kolejne B wierszy, wartości trafiają do bufora (B × wszystkie
+przebiegi) w kolumnach wyznaczonych przez scalanie, a bufor jest
+zapisywany i zwalniany. Bez powtórzonych czasów każdy plik jest czytany
+dokładnie raz.
+
+Przy deduplikacji (DuplicateReport) przebiegi o czasie równym
+poprzedniemu są wykrywane już przy scalaniu nagłówków. Ich wartości
+nie są wtedy znane, więc pliki z takimi przebiegami są najpierw czytane
+dodatkowo raz, blokami, tylko w celu policzenia sum kontrolnych.
+Pomijane są przebiegi o tych samych wartościach co zachowane; pozostałe
+(konflikty) dostają własne kolumny wyjściowe. Wartości pominiętych
+trafiają do dodatkowej kolumny bufora, która nie jest zapisywana.
+
+Plików skompresowanych nie da się tanio przewijać, więc pozostają
+otwarte przez całe scalanie. Ponad MAX_OPEN_COMPRESSED takich plików
+dane pozostałych są najpierw rozpakowywane do plików tymczasowych obok
+pliku wyjściowego - liczba otwartych deskryptorów jest ograniczona.
+
+Zużycie pamięci:
+    - stała część: ok. 100 B na przebieg (znaczniki czasu i kolejność),
+    - bufor bloku: B × liczba_przebiegów × 4 B (float32) plus tekst
+      wierszy wczytanych z jednego pliku; B jest dobierane tak, aby
+      bufor mieścił się w limicie max_memory.
+"""
+
+import csv
+import heapq
+import os
+import shutil
+import tempfile
+from contextlib import ExitStack
+
+import numpy as np
+
+import dts_metrics as metrics
+from dts_cube import format_values, parse_value
+from dts_dedup import TraceChecksum
+from dts_source import is_compressed, open_data_file, source_name
+from dts_time import format_dates, format_times, parse_header_datetimes
+
+
+# Domyślny limit pamięci bufora bloku pozycji [B]
+DEFAULT_MAX_MEMORY = 256 * 1024 * 1024
+
+# Szacowany rozmiar jednej komórki tekstu wczytanej z pliku (obiekt str) [B]
+_CELL_TEXT_BYTES = 64
+
+# Limit jednocześnie otwartych plików skompresowanych; dane pozostałych
+# są przed scalaniem rozpakowywane do plików tymczasowych
+MAX_OPEN_COMPRESSED = 32
+
+
+class SortedRun:
+    """Jeden plik wejściowy jako posortowany ciąg przebiegów."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.spill_path = None  # Rozpakowane dane pliku skompresowanego (spill)
+        self._stream = self._file = None  # Otwarty plik skompresowany (czytany bez przewijania)
+
+        with open_data_file(filepath) as f:
+            header = [f.readline().decode('latin-1') for _ in range(4)]
+            self.data_offset = f.tell()  # Początek danych (po wierszach X Units i Y Units)
+        self.offset = self.data_offset
+
+        date_row, time_row = csv.reader(header[:2], delimiter=';')
+        try:
+            self.datetimes = parse_header_datetimes(date_row[1:], time_row[1:]).astype(object).tolist()
+        except ValueError as e:
+            raise ValueError(f"Błąd parsowania daty/czasu w pliku {filepath}: {e}") from e
+
+        # Kolejność kolumn w czasie (pliki są zwykle już posortowane)
+        self.order = sorted(range(len(self.datetimes)), key=self.datetimes.__getitem__)
+        self.columns = None  # Kolumny w pliku wyjściowym, ustawiane po scaleniu
+
+    @property
+    def n_traces(self):
+        """Liczba przebiegów w pliku."""
+        return len(self.datetimes)
+
+    def traces(self, run_idx):
+        """Zwraca przebiegi w kolejności czasu jako krotki (czas, nr_pliku, nr_kolumny)."""
+        return ((self.datetimes[i], run_idx, i) for i in self.order)
+
+    def read_rows(self, count):
+        """
+        Czyta kolejne niepuste wiersze danych, kontynuując od poprzedniego miejsca.
+
+        Args:
+            count: Maksymalna liczba wierszy
+
+        Returns:
+            list: Wiersze jako listy komórek (pusta lista na końcu pliku)
+        """
+        if self.spill_path is None and is_compressed(self.filepath):
+            # Przewinięcie strumienia skompresowanego wymaga ponownej dekompresji
+            # od początku - plik pozostaje otwarty do końca odczytu
+            if self._stream is None:
+                self._stream = ExitStack()
+                self._file = self._stream.enter_context(open_data_file(self.filepath))
+                self._file.seek(self.offset)
+            rows = self._read_rows(self._file, count)
+            if len(rows) < count:
+                self.close()
+            return rows
+
+        with open(self.spill_path or self.filepath, 'rb') as f:
+            f.seek(self.offset)
+            return self._read_rows(f, count)
+
+    def spill(self, path):
+        """
+        Rozpakowuje dane pliku (bez nagłówka) do zwykłego pliku path.
+
+        Kolejne odczyty read_rows otwierają ten plik na czas jednego bloku,
+        tak jak pliki nieskompresowane.
+
+        Returns:
+            int: Rozmiar rozpakowanych danych [B]
+        """
+        self.close()
+        with open_data_file(self.filepath) as src, open(path, 'wb') as dst:
+            src.seek(self.data_offset)
+            shutil.copyfileobj(src, dst)
+            size = dst.tell()
+        self.spill_path = path
+        self.offset = self.data_offset = 0
+        return size
+
+    def rewind(self):
+        """Wraca na początek danych - kolejny odczyt read_rows zaczyna od pierwszego wiersza."""
+        self.close()
+        self.offset = self.data_offset
+
+    def close(self):
+        """Zamyka plik skompresowany pozostawiony otwarty przez read_rows."""
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = self._file = None
+
+    def _read_rows(self, f, count):
+        """Czyta do count niepustych wierszy z bieżącego miejsca pliku f."""
+        rows = []
+        lines = (line.decode('latin-1') for line in iter(f.readline, b''))
+        for row in csv.reader(lines, delimiter=';'):
+            if not row or not row[0]:  # Pomiń puste wiersze
+                continue
+            rows.append(row)
+            if len(rows) == count:
+                break
+        self.offset = f.tell()
+        return rows
+
+
+def merge_order(runs, deduplicate=False, keep=frozenset()):
+    """
+    Scala posortowane ciągi przebiegów na kopcu i przypisuje kolumny wyjściowe.
+
+    Przy równych czasach kolejność jest taka jak przy stabilnym sortowaniu
+    wszystkich przebiegów (najpierw wcześniejszy plik, potem wcześniejsza kolumna).
+
+    Args:
+        runs: Lista obiektów SortedRun (ustawia ich atrybut columns)
+        deduplicate: Czy pomijać przebiegi o czasie równym poprzedniemu;
+            dostają one kolejne kolumny za ostatnią kolumną wyjściową
+        keep: Przebiegi (nr_pliku, nr_kolumny) zachowywane mimo powtórzonego czasu
+
+    Returns:
+        tuple: (czasy przebiegów w kolejności wyjściowej,
+            lista (nr_pliku, nr_kolumny, kolumna_pierwszego_przebiegu_o_tym_czasie)
+            dla każdego duplikatu)
+    """
+    for run in runs:
+        run.columns = np.empty(run.n_traces, dtype=np.intp)
+
+    merged = heapq.merge(*(run.traces(i) for i, run in enumerate(runs)),
+                         key=lambda trace: trace[0])
+
+    datetimes = []
+    repeated = []
+    first = 0  # Kolumna pierwszego przebiegu o bieżącym czasie
+    for dt, run_idx, trace_idx in merged:
+        if datetimes and dt == datetimes[-1]:
+            if deduplicate and (run_idx, trace_idx) not in keep:
+                # Tymczasowo ujemny numer duplikatu (-1, -2, ...)
+                runs[run_idx].columns[trace_idx] = -1 - len(repeated)
+                repeated.append((run_idx, trace_idx, first))
+                continue
+        else:
+            first = len(datetimes)
+        runs[run_idx].columns[trace_idx] = len(datetimes)
+        datetimes.append(dt)
+
+    for run in runs:
+        duplicate = run.columns < 0
+        run.columns[duplicate] = len(datetimes) - 1 - run.columns[duplicate]
+    return datetimes, repeated
+
+
+def rows_per_block(n_traces, max_cols, max_memory=DEFAULT_MAX_MEMORY):
+    """
+    Wyznacza liczbę pozycji w bloku tak, aby bufor zmieścił się w limicie pamięci.
+
+    Args:
+        n_traces: Łączna liczba przebiegów (szerokość bufora)
+        max_cols: Największa liczba przebiegów w jednym pliku
+        max_memory: Limit pamięci bufora [B]
+
+    Returns:
+        int: Liczba wierszy (pozycji) w bloku, co najmniej 1
+    """
+    row_bytes = n_traces * np.dtype(np.float32).itemsize + max_cols * _CELL_TEXT_BYTES
+    return max(1, int(max_memory // max(row_bytes, 1)))
+
+
+def spill_compressed(runs, stack, directory, max_open=MAX_OPEN_COMPRESSED):
+    """
+    Rozpakowuje dane skompresowanych plików ponad limit max_open do plików tymczasowych.
+
+    Pierwsze max_open plików skompresowanych pozostaje otwartych przez całe
+    scalanie; pozostałe są czytane jak zwykłe pliki, więc liczba otwartych
+    deskryptorów nie zależy od liczby plików.
+
+    Args:
+        runs: Lista obiektów SortedRun
+        stack: ExitStack, który usuwa katalog tymczasowy po scaleniu
+        directory: Katalog, w którym utworzyć katalog tymczasowy
+        max_open: Największa liczba jednocześnie otwartych plików skompresowanych
+    """
+    compressed = [run for run in runs if is_compressed(run.filepath)]
+    if len(compressed) <= max_open:
+        return
+
+    spill_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix='.dts_stream_', dir=directory))
+    with metrics.stage('file_parse') as stage:
+        for i, run in enumerate(compressed[max_open:]):
+            stage.add(bytes_read=run.spill(os.path.join(spill_dir, f"{i}.csv")))
+
+
+def read_block(runs, buffer, block_rows, mismatched, log=print):
+    """
+    Wczytuje kolejny blok pozycji z plików do bufora, w kolumnach run.columns.
+
+    Args:
+        runs: Lista obiektów SortedRun
+        buffer: Bufor (block_rows × kolumny), wypełniany od nowa
+        block_rows: Liczba pozycji w bloku
+        mismatched: Zbiór plików, dla których zgłoszono już różne pozycje
+        log: Funkcja do wypisywania komunikatów
+
+    Returns:
+        list: Pozycje bloku (pusta lista na końcu plików)
+    """
+    buffer.fill(np.nan)
+    block_positions = []
+
+    with metrics.stage('file_parse') as stage:
+        for run in runs:
+            offset = run.offset
+            rows = run.read_rows(block_rows)
+            stage.add(rows=len(rows), bytes_read=run.offset - offset)
+
+            for r, row in enumerate(rows):
+                position = float(row[0].replace(',', '.'))
+                if r == len(block_positions):
+                    block_positions.append(position)
+                elif block_positions[r] != position and run.filepath not in mismatched:
+                    mismatched.add(run.filepath)
+                    log(f"UWAGA: Pozycje w pliku {source_name(run.filepath)} różnią się od referencyjnych!")
+
+                values = [parse_value(value) for value in row[1:run.n_traces + 1]]
+                buffer[r, run.columns[:len(values)]] = values
+                stage.add(cells=len(values))
+
+    return block_positions
+
+
+def resolve_repeated(runs, n_traces, repeated, duplicates, max_memory, mismatched, log=print):
+    """
+    Porównuje sumy kontrolne przebiegów o powtórzonym czasie z zachowanymi.
+
+    Pliki z takimi przebiegami są czytane blokami pozycji (bez zapisu),
+    po czym wracają na początek danych.
+
+    Args:
+        runs: Lista obiektów SortedRun po merge_order
+        n_traces: Liczba kolumn wyjściowych
+        repeated: Duplikaty zwrócone przez merge_order
+        duplicates: Raport duplikatów (DuplicateReport)
+        max_memory: Limit pamięci bufora bloku [B]
+        mismatched: Zbiór plików, dla których zgłoszono już różne pozycje
+        log: Funkcja do wypisywania komunikatów
+
+    Returns:
+        set: Przebiegi (nr_pliku, nr_kolumny) o innych wartościach, do zachowania
+    """
+    width = n_traces + len(repeated)
+    column_run = np.empty(width, dtype=np.intp)
+    for run_idx, run in enumerate(runs):
+        column_run[run.columns] = run_idx
+
+    candidates = [(n_traces + j, first) for j, (_, _, first) in enumerate(repeated)]
+    checksums = {column: TraceChecksum() for pair in candidates for column in pair}
+    involved = [runs[run_idx] for run_idx in np.unique(column_run[list(checksums)])]
+
+    block_rows = rows_per_block(width, max(run.n_traces for run in involved), max_memory)
+    buffer = np.empty((block_rows, width), dtype=np.float32)
+    try:
+        while True:
+            block_positions = read_block(involved, buffer, block_rows, mismatched, log)
+            if not block_positions:
+                break
+            for column, checksum in checksums.items():
+                checksum.update(buffer[:len(block_positions), column])
+    finally:
+        for run in involved:
+            run.rewind()
+
+    dropped = set(duplicates.resolve(candidates, lambda column: checksums[column].digest(),
+                                     lambda column: source_name(runs[column_run[column]].filepath)))
+    return {(run_idx, trace_idx) for j, (run_idx, trace_idx, _) in enumerate(repeated)
+            if n_traces + j not in dropped}
+
+
+def stream_merge(filepaths, output_file, max_memory=DEFAULT_MAX_MEMORY, units=True, log=print,
+                 duplicates=None):
+    """
+    Łączy pliki CSV w jeden plik posortowany chronologicznie, blokami pozycji.
+
+    Args:
+        filepaths: Lista ścieżek do plików CSV
+        output_file: Ścieżka do wyjściowego pliku CSV
+        max_memory: Limit pamięci bufora bloku [B]
+        units: Czy zapisać wiersze X Units i Y Units
+        log: Funkcja do wypisywania komunikatów
+        duplicates: Raport duplikatów (DuplicateReport); gdy podany, z przebiegów
+            o tym samym czasie i tych samych wartościach zapisywany jest tylko pierwszy
+
+    Returns:
+        dict: Podsumowanie (n_traces, n_positions, first, last, block_rows)
+    """
+    with metrics.stage('merge_sort') as stage:
+        runs = [SortedRun(filepath) for filepath in filepaths]
+        datetimes, repeated = merge_order(runs, deduplicate=duplicates is not None)
+        stage.add(rows=len(datetimes), bytes_read=sum(run.offset for run in runs))
+
+    n_positions = 0
+    mismatched = set()
+
+    with ExitStack() as stack:
+        for run in runs:
+            stack.callback(run.close)
+        spill_compressed(runs, stack, os.path.dirname(os.path.abspath(output_file)))
+
+        if repeated:
+            keep = resolve_repeated(runs, len(datetimes), repeated, duplicates, max_memory,
+                                    mismatched, log)
+            if keep:
+                datetimes, repeated = merge_order(runs, deduplicate=True, keep=keep)
+            # Wszystkie pominięte duplikaty trafiają do jednej, niezapisywanej kolumny
+            for run in runs:
+                np.minimum(run.columns, len(datetimes), out=run.columns)
+        n_traces = len(datetimes)
+        width = n_traces + min(len(repeated), 1)
+
+        block_rows = rows_per_block(width, max(run.n_traces for run in runs), max_memory)
+        buffer = np.empty((block_rows, width), dtype=np.float32)
+
+        with open(output_file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter=';')
+
+            times = np.array(datetimes, dtype='datetime64[s]')
+            writer.writerow(['Date:'] + format_dates(times))
+            writer.writerow(['Time:'] + format_times(times))
+
+            if units:
+                writer.writerow(['X Units:'] + ['[m]'] * n_traces)
+                writer.writerow(['Y Units:'] + ['[°C]'] * n_traces)
+
+            while True:
+                block_positions = read_block(runs, buffer, block_rows, mismatched, log)
+                if not block_positions:
+                    break
+
+                with metrics.stage('csv_write') as stage:
+                    for r, position in enumerate(block_positions):
+                        writer.writerow([f"{position:.2f}"] + format_values(buffer[r, :n_traces]))
+                    stage.add(rows=len(block_positions), cells=len(block_positions) * n_traces)
+
+                n_positions += len(block_positions)
+
+    metrics.count('csv_write', bytes_written=os.path.getsize(output_file))
+
+    return {
+        'n_traces': n_traces,
+        'n_positions': n_positions,
+        'first': datetimes[0] if datetimes else None,
+        'last': datetimes[-1] if datetimes else None,
+        'block_rows': block_rows,
+    }
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Generator syntetycznych danych pomiarowych AP Sensing.
+
+Zapisuje pliki CSV w układzie czytanym przez read_dts_csv (wiersze
+Date:/Time:/X Units:/Y Units:, przecinek dziesiętny, wartości
+w cudzysłowach) oraz pasujący plik referencyjny svws_measurements.csv
+(czasy w UTC). Temperatury to profil wzdłuż światłowodu z dobowym
+cyklem i szumem, a czujniki referencyjne mierzą temperaturę światłowodu
+w swoim miejscu z niewielkim stałym przesunięciem - kalibracja daje
+więc przewidywalny wynik.
+
+Dane służą do pomiarów wydajności (dts_bench.py) w dowolnej skali.
+"""
+
+import argparse
+import math
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from dts_time import DEFAULT_TIMEZONE, format_dates, format_datetimes, format_times, utc_to_local
+
+
+# Zakres i rozdzielczość tablicy gotowych napisów wartości [°C]
+_MIN_TEMP = -20.0
+_MAX_TEMP = 80.0
+
+# Przybliżony rozmiar jednej komórki pomiaru w pliku ("14,77";) [B]
+CELL_BYTES = 8
+
+# Wymiary domyślne: 1 km światłowodu co 0.25 m, godzina pomiarów co 2 min
+DEFAULT_POSITIONS = 4001
+DEFAULT_TRACES = 30
+DEFAULT_STEP = 0.25
+DEFAULT_INTERVAL = 120
+DEFAULT_START = '2025-10-25T20:00:00'
+
+
+def parse_size(text):
+    """Parsuje rozmiar w postaci 10MB, 1GB, 500kB (jednostki dziesiętne)."""
+    units = {'KB': 10**3, 'MB': 10**6, 'GB': 10**9, 'TB': 10**12, 'B': 1}
+    text = text.strip().upper()
+    for unit, factor in units.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def dataset_shape(size, n_positions=DEFAULT_POSITIONS, traces_per_file=DEFAULT_TRACES):
+    """
+    Dobiera liczbę plików tak, aby dane zajmowały ok. size bajtów.
+
+    Returns:
+        tuple: (liczba plików, liczba pozycji, liczba przebiegów w pliku)
+    """
+    file_bytes = n_positions * traces_per_file * CELL_BYTES
+    return max(1, math.ceil(size / file_bytes)), n_positions, traces_per_file
+
+
+class SyntheticFiber:
+    """Model temperatury wzdłuż światłowodu w czasie."""
+
+    def __init__(self, seed=0, noise=0.2):
+        self.rng = np.random.default_rng(seed)
+        self.noise = noise
+        # Kilka gorących miejsc (pozycja [m], szerokość [m], amplituda [°C])
+        self.hot_spots = [(float(self.rng.uniform(0, 1000)), float(self.rng.uniform(2, 20)),
+                           float(self.rng.uniform(2, 8))) for _ in range(5)]
+
+    def profile(self, positions, epochs):
+        """
+        Zwraca temperatury bez szumu.
+
+        Args:
+            positions: Pozycje [m]
+            epochs: Czasy przebiegów [s od epoki UTC]
+
+        Returns:
+            np.ndarray: Macierz float64 (przebieg × pozycja)
+        """
+        positions = np.asarray(positions, dtype=np.float64)
+        hours = (np.asarray(epochs, dtype=np.float64) / 3600.0) % 24.0
+
+        spatial = 15.0 + 1.5 * np.sin(2 * np.pi * positions / 173.0)
+        for center, width, amplitude in self.hot_spots:
+            spatial += amplitude * np.exp(-0.5 * ((positions - center) / width) ** 2)
+        daily = 2.0 * np.sin(2 * np.pi * (hours - 9.0) / 24.0)
+        return spatial[np.newaxis, :] + daily[:, np.newaxis]
+
+    def measure(self, positions, epochs):
+        """Zwraca temperatury z szumem pomiarowym."""
+        values = self.profile(positions, epochs)
+        return values + self.rng.normal(0.0, self.noise, values.shape)
+
+
+@lru_cache(maxsize=None)
+def _value_table():
+    """Zwraca tablicę napisów "XX,XX" w cudzysłowach dla wszystkich wartości z zakresu."""
+    n = int(round((_MAX_TEMP - _MIN_TEMP) * 100)) + 1
+    return np.array([f'"{_MIN_TEMP + i / 100:.2f}"'.replace('.', ',') for i in range(n)],
+                    dtype=object)
+
+
+def write_dts_file(filepath, epochs, positions, values, timezone=DEFAULT_TIMEZONE, missing=0.0,
+                   rng=None):
+    """
+    Zapisuje jeden plik CSV AP Sensing.
+
+    Args:
+        filepath: Ścieżka pliku
+        epochs: Czasy przebiegów [s od epoki UTC]
+        positions: Pozycje [m]
+        values: Temperatury (przebieg × pozycja)
+        timezone: Strefa czasowa nagłówków Date:/Time: (None = strefa systemu)
+        missing: Udział pustych komórek
+        rng: Generator liczb losowych (dla pustych komórek)
+
+    Returns:
+        int: Rozmiar pliku [B]
+    """
+    local = utc_to_local(np.asarray(epochs, dtype='datetime64[s]'), timezone)
+    n_traces = len(local)
+
+    # Indeksy w tablicy napisów (pozycja × przebieg)
+    table = _value_table()
+    cells = np.clip(np.round((values.T - _MIN_TEMP) * 100), 0, len(table) - 1).astype(np.intp)
+    if missing > 0:
+        table = np.append(table, '')
+        empty = (rng or np.random.default_rng()).random(cells.shape) < missing
+        cells[empty] = len(table) - 1
+
+    with open(filepath, 'w', encoding='latin-1', newline='') as f:
+        f.write(';'.join(['Date:'] + format_dates(local)) + '\r\n')
+        f.write(';'.join(['Time:'] + format_times(local)) + '\r\n')
+        f.write(';'.join(['X Units:'] + ['[m]'] * n_traces) + '\r\n')
+        f.write(';'.join(['Y Units:'] + ['[°C]'] * n_traces) + '\r\n')
+        for position, row in zip(positions.tolist(), cells):
+            f.write(f"{position:.2f}".replace('.', ',') + ';' + ';'.join(table[row]) + '\r\n')
+    return os.path.getsize(filepath)
+
+
+def write_reference_file(filepath, fiber, first, last, channels, interval=60, missing=0.01,
+                         offset=0.5):
+    """
+    Zapisuje plik referencyjny svws_measurements.csv (czasy w UTC).
+
+    Args:
+        filepath: Ścieżka pliku
+        fiber: Model temperatury (SyntheticFiber)
+        first: Pierwszy czas [s od epoki UTC]
+        last: Ostatni czas [s od epoki UTC]
+        channels: Słownik kanał -> pozycja czujnika na światłowodzie [m]
+        interval: Odstęp pomiarów [s]
+        missing: Udział pustych komórek
+        offset: Stała różnica czujnika referencyjnego względem światłowodu [°C]
+
+    Returns:
+        int: Rozmiar pliku [B]
+    """
+    epochs = np.arange(first, last + 1, interval, dtype=np.int64)
+    stamps = format_datetimes(epochs.astype('datetime64[s]'))
+    positions = np.array(list(channels.values()), dtype=np.float64)
+    temps = fiber.profile(positions, epochs) + offset
+    temps += fiber.rng.normal(0.0, 0.05, temps.shape)
+    empty = fiber.rng.random(temps.shape) < missing
+
+    header = ['timestamp']
+    for channel in channels:
+        header += [f'{channel}_temp_val_c', f'{channel}_status']
+
+    with open(filepath, 'w', encoding='latin-1', newline='') as f:
+        f.write(';'.join(header) + '\n')
+        for stamp, row, row_empty in zip(stamps, temps.tolist(), empty.tolist()):
+            cells = [stamp]
+            for temp, is_empty in zip(row, row_empty):
+                cells += ['' if is_empty else f'"{temp:.3f}"', 'ok']
+            f.write(';'.join(cells) + '\n')
+    return os.path.getsize(filepath)
+
+
+def generate_dataset(folder, n_files, n_positions=DEFAULT_POSITIONS, traces_per_file=DEFAULT_TRACES,
+                     step=DEFAULT_STEP, interval=DEFAULT_INTERVAL, start=DEFAULT_START,
+                     n_channels=2, timezone=DEFAULT_TIMEZONE, missing=0.0, seed=0):
+    """
+    Zapisuje zestaw plików CSV i pasujący plik referencyjny.
+
+    Pliki leżą w folder/csv_data (kolejne godziny pomiarów), plik
+    referencyjny to folder/svws_measurements.csv.
+
+    Args:
+        folder: Katalog wyjściowy
+        n_files: Liczba plików CSV
+        n_positions: Liczba pozycji w pliku
+        traces_per_file: Liczba przebiegów w pliku
+        step: Krok pozycji [m]
+        interval: Odstęp przebiegów [s]
+        start: Czas pierwszego przebiegu (UTC, ISO)
+        n_channels: Liczba kanałów referencyjnych
+        timezone: Strefa czasowa nagłówków plików (None = strefa systemu)
+        missing: Udział pustych komórek w plikach CSV
+        seed: Ziarno generatora
+
+    Returns:
+        dict: Opis zestawu (ścieżki, wymiary, rozmiar w bajtach, kanały)
+    """
+    folder = Path(folder)
+    csv_dir = folder / 'csv_data'
+    csv_dir.mkdir(parents=True, exist_ok=True)
+
+    fiber = SyntheticFiber(seed)
+    positions = np.round(np.arange(n_positions) * step, 2)
+    first = int(np.datetime64(start, 's').astype(np.int64))
+
+    files = []
+    total = 0
+    for i in range(n_files):
+        epochs = first + (i * traces_per_file + np.arange(traces_per_file)) * interval
+        filepath = csv_dir / f"dts_{i:05d}.csv"
+        total += write_dts_file(filepath, epochs, positions, fiber.measure(positions, epochs),
+                                timezone, missing, fiber.rng)
+        files.append(str(filepath))
+
+    last = first + (n_files * traces_per_file - 1) * interval
+    span = positions[-1] if len(positions) else 0.0
+    channels = {f"CH{k + 1:03d}": float(np.round(span * (k + 1) / (n_channels + 1) / step) * step)
+                for k in range(n_channels)}
+    reference = folder / 'svws_measurements.csv'
+    reference_bytes = write_reference_file(reference, fiber, first - 3600, last + 3600, channels)
+
+    return {
+        'files': files,
+        'reference': str(reference),
+        'channels': channels,
+        'n_files': n_files,
+        'n_positions': n_positions,
+        'traces_per_file': traces_per_file,
+        'bytes': total,
+        'reference_bytes': reference_bytes,
+    }
+
+
+def main():
+    """Główna funkcja programu."""
+    parser = argparse.ArgumentParser(description="Generator syntetycznych danych AP Sensing")
+    parser.add_argument('output', help="katalog wyjściowy (csv_data/ i svws_measurements.csv)")
+    parser.add_argument('--size', help="docelowy rozmiar danych, np. 10MB, 1GB (ustala liczbę plików)")
+    parser.add_argument('--files', type=int, default=4, help="liczba plików (domyślnie: %(default)s)")
+    parser.add_argument('--positions', type=int, default=DEFAULT_POSITIONS,
+                        help="liczba pozycji w pliku (domyślnie: %(default)s)")
+    parser.add_argument('--traces', type=int, default=DEFAULT_TRACES,
+                        help="liczba przebiegów w pliku (domyślnie: %(default)s)")
+    parser.add_argument('--channels', type=int, default=2,
+                        help="liczba kanałów referencyjnych (domyślnie: %(default)s)")
+    parser.add_argument('--missing', type=float, default=0.0,
+                        help="udział pustych komórek (domyślnie: %(default)s)")
+    parser.add_argument('--timezone', help="strefa czasowa nagłówków Date:/Time: (domyślnie: strefa systemu)")
+    parser.add_argument('--seed', type=int, default=0, help="ziarno generatora (domyślnie: %(default)s)")
+    args = parser.parse_args()
+
+    n_files = args.files
+    if args.size:
+        n_files, _, _ = dataset_shape(parse_size(args.size), args.positions, args.traces)
+
+    dataset = generate_dataset(args.output, n_files, args.positions, args.traces,
+                               n_channels=args.channels, timezone=args.timezone,
+                               missing=args.missing, seed=args.seed)
+    print(f"Zapisano {dataset['n_files']} plików ({dataset['bytes'] / 1e6:.1f} MB) "
+          f"i plik referencyjny z kanałami: "
+          f"{', '.join(f'{ch}@{pos:.2f}m' for ch, pos in dataset['channels'].items())}")
+
+
+if __name__ == '__main__':
+    main()
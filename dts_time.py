@@ -0,0 +1,302 @@
+"""
+Szybkie parsowanie znaczników czasu o stałym układzie.
+
+Obsługiwane są dwa układy:
+    - nagłówek plików AP Sensing: data DD.MM.YYYY i czas HH:MM:SS,
+    - plik referencyjny SVWS: YYYY-MM-DD HH:MM:SS (UTC).
+
+Zamiast datetime.strptime dla każdej komórki pola są wycinane z napisu
+(data zamieniana raz dla każdej różnej wartości), składane do postaci
+ISO i zamieniane na datetime64 jednym wywołaniem numpy. Komórki
+w innym układzie (np. bez zer wiodących) są parsowane przez strptime,
+więc wynik jest identyczny jak przy parsowaniu komórka po komórce.
+"""
+
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+
+HEADER_FORMAT = "%d.%m.%Y %H:%M:%S"
+REFERENCE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Strefa czasowa pomiarów referencyjnych po konwersji z UTC, np. Europe/Warsaw
+# (zmienna środowiskowa AP_SENSING_TIMEZONE; None = strefa systemu)
+DEFAULT_TIMEZONE = os.environ.get('AP_SENSING_TIMEZONE') or None
+
+# Odstęp sprawdzania przesunięcia strefy przy szukaniu zmian czasu [s]
+_OFFSET_PROBE = 24 * 3600
+
+
+def _is_fixed_time(text):
+    """Czy napis ma układ HH:MM:SS."""
+    return len(text) == 8 and text[2] == ':' and text[5] == ':'
+
+
+def _is_digits(text):
+    """Czy napis składa się tylko z cyfr ASCII."""
+    return text.isascii() and text.isdigit()
+
+
+def _to_datetime64(iso_strings, fallback):
+    """
+    Zamienia napisy ISO na datetime64[s] jednym wywołaniem numpy.
+
+    Komórki None (inny układ) są zamieniane funkcją fallback(i); jeśli
+    któraś komórka ISO ma niepoprawną wartość (np. 30.02), fallback
+    dostają wszystkie komórki, aby wskazać błędną.
+
+    Returns:
+        np.ndarray: Tablica datetime64[s]
+    """
+    result = np.empty(len(iso_strings), dtype='datetime64[s]')
+    fixed = [i for i, iso in enumerate(iso_strings) if iso is not None]
+    try:
+        result[fixed] = np.array([iso_strings[i] for i in fixed], dtype='datetime64[s]')
+    except ValueError:
+        fixed = []
+
+    fixed = set(fixed)
+    for i in range(len(iso_strings)):
+        if i not in fixed:
+            result[i] = fallback(i)
+    return result
+
+
+def parse_header_datetimes(dates, times):
+    """
+    Parsuje wiersze Date: i Time: nagłówka pliku AP Sensing.
+
+    Args:
+        dates: Daty w formacie DD.MM.YYYY
+        times: Czasy w formacie HH:MM:SS
+
+    Returns:
+        np.ndarray: Tablica datetime64[s]
+
+    Raises:
+        ValueError: Dla niepoprawnej komórki (komunikat zawiera jej treść)
+    """
+    dates = list(dates)
+    times = list(times)
+    if len(dates) != len(times):
+        raise ValueError(f"Różna liczba dat ({len(dates)}) i czasów ({len(times)})")
+
+    iso_dates = {}
+    iso_strings = []
+    for date, time_str in zip(dates, times):
+        # Data zamieniana raz dla każdej różnej wartości (None = inny układ)
+        if date not in iso_dates:
+            fixed_date = len(date) == 10 and date[2] == '.' and date[5] == '.' and \
+                _is_digits(date[0:2] + date[3:5] + date[6:10])
+            iso_dates[date] = f"{date[6:10]}-{date[3:5]}-{date[0:2]}" if fixed_date else None
+        iso_date = iso_dates[date]
+
+        if iso_date is not None and _is_fixed_time(time_str) and \
+                _is_digits(time_str[0:2] + time_str[3:5] + time_str[6:8]):
+            iso_strings.append(f"{iso_date}T{time_str}")
+        else:
+            iso_strings.append(None)
+
+    def fallback(i):
+        try:
+            return np.datetime64(datetime.strptime(f"{dates[i]} {times[i]}", HEADER_FORMAT), 's')
+        except ValueError as e:
+            raise ValueError(f"Niepoprawna data/czas: {dates[i]} {times[i]}") from e
+
+    return _to_datetime64(iso_strings, fallback)
+
+
+def parse_reference_datetimes(texts):
+    """
+    Parsuje znaczniki czasu pliku referencyjnego (YYYY-MM-DD HH:MM:SS).
+
+    Niepoprawne komórki nie przerywają wczytywania - są oznaczane w masce
+    (plik referencyjny bywa uzupełniany ręcznie).
+
+    Args:
+        texts: Napisy znaczników czasu
+
+    Returns:
+        tuple: (tablica datetime64[s], maska poprawnych komórek)
+    """
+    texts = list(texts)
+    valid = np.ones(len(texts), dtype=bool)
+
+    iso_strings = []
+    for text in texts:
+        if len(text) == 19 and text[4] == '-' and text[7] == '-' and text[10] == ' ' and \
+                _is_fixed_time(text[11:]) and \
+                _is_digits(text[0:4] + text[5:7] + text[8:10] + text[11:13] + text[14:16] + text[17:19]):
+            iso_strings.append(text)
+        else:
+            iso_strings.append(None)
+
+    def fallback(i):
+        try:
+            return np.datetime64(datetime.strptime(texts[i], REFERENCE_FORMAT), 's')
+        except ValueError:
+            valid[i] = False
+            return np.datetime64('NaT')
+
+    return _to_datetime64(iso_strings, fallback), valid
+
+
+def timezone_offset(timezone=None):
+    """
+    Zwraca funkcję offset(sekundy_od_epoki) -> przesunięcie strefy względem UTC [s].
+
+    Args:
+        timezone: Nazwa strefy IANA (np. Europe/Warsaw, UTC; None = strefa systemu)
+
+    Raises:
+        ValueError: Dla nieznanej strefy
+    """
+    if timezone is None:
+        return lambda epoch: time.localtime(epoch).tm_gmtoff
+
+    try:
+        from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    except ImportError:
+        raise ValueError("Wybór strefy czasowej wymaga Pythona 3.9 lub nowszego")
+    try:
+        tz = ZoneInfo(timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Nieznana strefa czasowa: {timezone} "
+                         f"(w systemie Windows zainstaluj pakiet tzdata)")
+    return lambda epoch: int(datetime.fromtimestamp(epoch, tz).utcoffset().total_seconds())
+
+
+def offset_intervals(first, last, offset):
+    """
+    Wyznacza przedziały stałego przesunięcia strefy w zakresie [first, last].
+
+    Przesunięcie jest sprawdzane co dobę, a każda zmiana (np. czasu letniego
+    na zimowy) jest lokalizowana z dokładnością do sekundy wyszukiwaniem
+    binarnym - kilkadziesiąt zapytań do bazy stref na zmianę czasu zamiast
+    jednego na każdy pomiar.
+
+    Args:
+        first: Początek zakresu [s od epoki]
+        last: Koniec zakresu [s od epoki]
+        offset: Funkcja z timezone_offset
+
+    Returns:
+        tuple: (początki przedziałów, przesunięcia [s]) - tablice int64
+    """
+    starts = [first]
+    offsets = [offset(first)]
+    probe = first
+    while probe < last:
+        step = min(probe + _OFFSET_PROBE, last)
+        if offset(step) == offsets[-1]:
+            probe = step
+            continue
+
+        # Zmiana w (probe, step] - pierwsza sekunda z nowym przesunięciem
+        lo, hi = probe, step
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if offset(mid) == offsets[-1]:
+                lo = mid
+            else:
+                hi = mid
+        starts.append(hi)
+        offsets.append(offset(hi))
+        probe = hi
+
+    return np.array(starts, dtype=np.int64), np.array(offsets, dtype=np.int64)
+
+
+def utc_to_local(times, timezone=DEFAULT_TIMEZONE):
+    """
+    Zamienia czasy UTC na czas lokalny (jak datetime.astimezone()).
+
+    Przesunięcie strefy jest wyznaczane raz dla każdego przedziału między
+    zmianami czasu w zakresie danych i dodawane do całej tablicy naraz.
+
+    Args:
+        times: Tablica datetime64 w UTC
+        timezone: Nazwa strefy IANA (None = strefa systemu)
+
+    Returns:
+        np.ndarray: Tablica datetime64[s] w czasie lokalnym (bez strefy)
+    """
+    epochs = np.asarray(times, dtype='datetime64[s]').astype(np.int64)
+    if not len(epochs):
+        return epochs.astype('datetime64[s]')
+
+    starts, offsets = offset_intervals(int(epochs.min()), int(epochs.max()),
+                                       timezone_offset(timezone))
+    interval = np.searchsorted(starts, epochs, side='right') - 1
+    return (epochs + offsets[interval]).astype('datetime64[s]')
+
+
+def parse_time_bound(text, end=False):
+    """
+    Parsuje granicę zakresu czasu (czas lokalny, jak w nagłówkach plików).
+
+    Przyjmuje YYYY-MM-DD, YYYY-MM-DD HH:MM lub YYYY-MM-DD HH:MM:SS
+    (także z T zamiast spacji) oraz DD.MM.YYYY [HH:MM[:SS]]. Sama data
+    jako koniec zakresu oznacza cały dzień (do 23:59:59).
+
+    Args:
+        text: Napis granicy (pusty = bez ograniczenia)
+        end: Czy to koniec zakresu
+
+    Returns:
+        np.datetime64 lub None
+
+    Raises:
+        ValueError: Dla niepoprawnego napisu
+    """
+    text = (text or '').strip()
+    if not text:
+        return None
+
+    date, _, clock = text.replace('T', ' ').partition(' ')
+    if len(date) == 10 and date[2] == '.' and date[5] == '.':
+        date = f"{date[6:10]}-{date[3:5]}-{date[0:2]}"
+    try:
+        if not clock:
+            day = np.datetime64(date, 'D')
+            return (day + 1).astype('datetime64[s]') - 1 if end else day.astype('datetime64[s]')
+        return np.datetime64(f"{date}T{clock.strip()}", 's')
+    except ValueError:
+        raise ValueError(f"Niepoprawny czas: {text} (oczekiwano RRRR-MM-DD [GG:MM[:SS]])")
+
+
+def format_datetimes(times, sep=' '):
+    """
+    Formatuje czasy jako YYYY-MM-DD HH:MM:SS.
+
+    Args:
+        times: Tablica datetime64
+        sep: Separator daty i czasu
+
+    Returns:
+        list: Lista napisów
+    """
+    iso = np.datetime_as_string(np.asarray(times, dtype='datetime64[s]'), unit='s')
+    return [text.replace('T', sep) for text in iso.tolist()]
+
+
+def format_dates(times):
+    """Formatuje daty jako DD.MM.YYYY (jak strftime("%d.%m.%Y"))."""
+    days = np.datetime_as_string(np.asarray(times, dtype='datetime64[D]'), unit='D')
+    cache = {}
+    result = []
+    for day in days.tolist():
+        text = cache.get(day)
+        if text is None:
+            text = cache[day] = f"{day[8:10]}.{day[5:7]}.{day[0:4]}"
+        result.append(text)
+    return result
+
+
+def format_times(times):
+    """Formatuje czasy jako HH:MM:SS (jak strftime("%H:%M:%S"))."""
+    iso = np.datetime_as_string(np.asarray(times, dtype='datetime64[s]'), unit='s')
+    return [text[11:19] for text in iso.tolist()]
@@ -0,0 +1,538 @@
+"""
+Hurtowe parsowanie bloku danych plików CSV AP Sensing.
+
+Blok danych (po 4 wierszach nagłówka) to wiersze "pozycja;wartość;..."
+z przecinkiem dziesiętnym i opcjonalnymi cudzysłowami. Zamiast dzielić
+każdą komórkę i wołać float() osobno, bufor bajtów jest parsowany
+bezpośrednio operacjami NumPy na całych tablicach:
+
+    - ostatnie 8 bajtów każdej komórki jest wczytywane jako jedna liczba
+      uint64, z której bajty cyfr są składane w mantysę kilkoma
+      mnożeniami (SWAR), a pozycja przecinka daje liczbę miejsc po nim,
+    - wartość to mantysa / 10**miejsca - dzielenie dwóch liczb dokładnie
+      reprezentowalnych jest poprawnie zaokrąglane, więc wynik jest
+      identyczny z float(tekst),
+    - puste komórki dostają NaN w tym samym przebiegu.
+
+W typowym pliku wszystkie komórki pomiarowe mają tę samą szerokość (np.
+"21,37" w cudzysłowach), więc leżą w stałych odstępach od końca wiersza.
+Takie wiersze są czytane jako dwuwymiarowy widok bufora (wiersz ×
+komórka) i porównywane bajt po bajcie z szablonem komórki, bez szukania
+separatorów. W wierszu z jedną pustą komórką komórki przed nią leżą w tych
+samych odstępach od separatora pozycji, a za nią - od końca wiersza, więc
+wystarczą dwa takie widoki. Pozostałe wiersze (więcej pustych komórek,
+inna szerokość) są dzielone na komórki według separatorów ';' -
+cudzysłowy na końcach komórek i CR przed końcem wiersza są pomijane przez
+przesunięcie granic komórki.
+
+Bufor jest przetwarzany porcjami po ok. CHUNK_BYTES bajtów, dzięki czemu
+tablice pośrednie mieszczą się w pamięci podręcznej procesora, a wyniki
+trafiają od razu do macierzy w układzie DtsCube (przebieg × pozycja).
+
+Bloki, których nie da się tak sparsować (wiersze o różnej liczbie
+komórek, komórki dłuższe niż 8 znaków, niepoprawne komórki, nietypowe
+cudzysłowy), zwracają None - wtedy należy użyć parsowania komórka po
+komórce.
+"""
+
+import re
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+# Rozmiar porcji bufora przetwarzanej naraz [B]
+CHUNK_BYTES = 1 << 16
+
+_SEMICOLON = ord(';')
+_NEWLINE = ord('\n')
+_CR = ord('\r')
+_QUOTE = ord('"')
+_MINUS = ord('-')
+_PLUS = ord('+')
+_COMMA = ord(',')
+_DOT = ord('.')
+
+_U64 = np.uint64
+_BYTE = _U64(0xFF)
+_HIGH_BITS = _U64(0x8080808080808080)
+_ASCII_ZEROS = _U64(0x3030303030303030)
+# Bajty po XOR z '0': przecinek/kropka po wyzerowaniu bitu 1, minus, plus
+_POINT_MASK = _U64(0xFD)
+_POINT_XOR = _U64(_COMMA ^ 0x30)
+_POINT_BYTES = (_COMMA ^ 0x30, _DOT ^ 0x30)
+_MINUS_XOR = _U64(_MINUS ^ 0x30)
+_PLUS_XOR = _U64(_PLUS ^ 0x30)
+# Dodane do bajtu < 0x80 ustawia jego najwyższy bit, gdy bajt >= 10 (nie jest cyfrą)
+_ABOVE_NINE = _U64(0x7676767676767676)
+_DIGIT_PAIRS = _U64(0x000000FF000000FF)
+_PAIR_MUL_LOW = _U64(100 + (1000000 << 32))
+_PAIR_MUL_HIGH = _U64(1 + (10000 << 32))
+
+# Maska bajtów k..7 słowa (k = 0..8) i przesunięcie do bajtu k [bity]
+_BYTES_FROM = np.array([~((1 << (8 * k)) - 1) & (2**64 - 1) for k in range(9)], dtype=np.uint64)
+_BYTE_SHIFT = np.array([8 * k for k in range(8)] + [0], dtype=np.uint64)
+_POW10 = 10.0 ** np.arange(9)
+# Wagi cyfr słowa (pierwsza w najniższym bajcie) dla mantys do 7 cyfr,
+# liczonych dokładnie we float32
+_DIGIT_WEIGHTS = np.float32(10.0) ** np.arange(7, -1, -1, dtype=np.float32)
+
+# Komórka pomiarowa, która może posłużyć za szablon: liczba, opcjonalnie
+# w cudzysłowach
+_TEMPLATE_CELL = re.compile(rb'(")?([-+]?)(\d*)([.,]?)(\d*)(?(1)")')
+# Liczba pierwszych wierszy, w których szukany jest szablon
+_TEMPLATE_ROWS = 16
+
+
+def _needs_filtering(body):
+    """Czy blok zawiera puste wiersze lub wiersze bez pozycji."""
+    return (body.startswith((b'\n', b'\r', b';')) or b'\n\n' in body
+            or b'\n\r' in body or b'\n;' in body)
+
+
+def _non_digits(digits, above_nine=_ABOVE_NINE):
+    """
+    Najwyższy bit każdego bajtu, który nie jest cyfrą 0-9 (po XOR z '0');
+    bajt o dodatku 0x7F w above_nine musi być zerem.
+    """
+    other = digits + above_nine
+    other |= digits
+    other &= _HIGH_BITS
+    return other
+
+
+def _mantissa(digits):
+    """8 cyfr (pierwsza w najniższym bajcie) -> liczba całkowita."""
+    digits = digits * _U64(10) + (digits >> _U64(8))
+    return ((digits & _DIGIT_PAIRS) * _PAIR_MUL_LOW
+            + ((digits >> _U64(16)) & _DIGIT_PAIRS) * _PAIR_MUL_HIGH) >> _U64(32)
+
+
+def _cell_values(body, first, last, cells, ends, lead, n_columns):
+    """
+    Wartości komórek o podanych granicach.
+
+    Args:
+        body: Bajty bloku danych
+        first: Indeks początku parsowanego fragmentu
+        last: Indeks końca parsowanego fragmentu
+        cells: Blok jako tablica uint64 o kroku 1 B (element i = bajty i..i+7)
+        ends: Indeks bajtu za ostatnim znakiem każdej komórki (nadpisywany)
+        lead: Liczba bajtów słowa przed początkiem komórki (8 - długość;
+            8 = pusta komórka)
+        n_columns: Liczba komórek w wierszu (pierwsza nie może być pusta)
+
+    Returns:
+        ndarray: Wartości float64 (NaN dla pustych komórek) lub None,
+            jeśli któraś komórka nie jest liczbą
+    """
+    if lead.min() < 0 or lead.max() > 8:  # Komórka dłuższa niż 8 znaków
+        return None
+
+    # 8 bajtów kończących się na ostatnim znaku komórki (bajt 7 = ostatni znak),
+    # cyfry jako wartości 0-9, bajty przed komórką wyzerowane
+    ends -= 8
+    digits = cells[ends]
+    digits ^= _ASCII_ZEROS
+    digits &= _BYTES_FROM.take(lead)
+
+    empty = lead == 8
+    if empty[::n_columns].any():  # Brak pozycji
+        return None
+    n_empty = np.count_nonzero(empty)
+
+    # Znak na początku komórki
+    negative = None
+    if body.find(b'-', first, last) >= 0 or body.find(b'+', first, last) >= 0:
+        sign = digits >> _BYTE_SHIFT.take(lead)
+        sign &= _BYTE
+        negative = sign == _MINUS_XOR
+        lead += negative | (sign == _PLUS_XOR)
+        digits &= _BYTES_FROM.take(lead)
+
+    # Typowy przypadek: przecinek w tym samym miejscu od końca każdej komórki
+    # (jak w pierwszej). Po wyzerowaniu przecinka w każdej niepustej
+    # komórce zostają same cyfry, a każda pusta ma ustawiony bit przecinka.
+    first_cell = int(digits[0])
+    point_flag = ((first_cell + int(_ABOVE_NINE)) | first_cell) & int(_HIGH_BITS)
+    k = point_flag.bit_length() // 8 - 1
+    uniform = False
+    if point_flag and point_flag == 0x80 << (8 * k):
+        point = _U64(first_cell & (0xFF << (8 * k)))
+        if point >> _U64(8 * k) in _POINT_BYTES and not (k == 7 and np.any(lead == 7)):
+            # Przecinek musi się wyzerować, a nie zamienić w cyfrę (',' ^ '.' = 2)
+            digits ^= point
+            above_nine = _ABOVE_NINE | _U64(0x09 << (8 * k))
+            uniform = np.count_nonzero(_non_digits(digits, above_nine)) == n_empty
+            if not uniform:
+                digits ^= point
+
+    if uniform:
+        # Bajty przed przecinkiem (już zerowym) o jeden bajt w górę:
+        # x + low * 255 = x - low + (low << 8)
+        low = digits & ~_BYTES_FROM[k]
+        low *= _BYTE
+        digits += low
+        scale = _POW10[7 - k]
+    else:
+        other = _non_digits(digits)
+        if np.any(other & (other - _U64(1))):  # Więcej niż jeden znak poza cyframi
+            return None
+        has_point = other != 0
+        k = np.frexp(other.astype(np.float64))[1] // 8 - 1
+        k[~has_point] = 0
+        point = digits >> _BYTE_SHIFT.take(k)
+        point &= _POINT_MASK
+        if np.any(has_point & (point != _POINT_XOR)):
+            return None
+        if np.any((lead + has_point > 7) & ~empty):  # Komórka bez cyfr
+            return None
+        low = digits & ~_BYTES_FROM.take(k)
+        low <<= _U64(8)
+        low |= digits & _BYTES_FROM.take(k + 1)
+        digits = np.where(has_point, low, digits)
+        scale = _POW10.take(np.where(has_point, 7 - k, 0))
+
+    values = np.divide(_mantissa(digits).view(np.int64), scale)
+    if negative is not None:
+        np.negative(values, out=values, where=negative)
+    if n_empty:
+        values[empty] = np.nan
+    return values
+
+
+def _parse_rows(body, a, cells, first, last, n_columns):
+    """
+    Parsuje wiersze bufora body[first:last] (ostatni bez znaku końca wiersza),
+    dzieląc je na komórki według separatorów.
+
+    Args:
+        body: Bajty bloku danych
+        a: Blok jako tablica bajtów
+        cells: Blok jako tablica uint64 o kroku 1 B (element i = bajty i..i+7)
+        first: Indeks początku pierwszego wiersza
+        last: Indeks końca ostatniego wiersza
+        n_columns: Liczba komórek w wierszu
+
+    Returns:
+        ndarray: Macierz wartości (wiersz × kolumna) lub None, jeśli porcji
+            nie da się sparsować hurtowo
+    """
+    chunk = a[first:last]
+    newline = chunk == _NEWLINE
+    separator = chunk == _SEMICOLON
+    separator |= newline
+    found = np.flatnonzero(separator)
+
+    # Każdy wiersz ma n_columns komórek: co n_columns-ty separator to koniec
+    # wiersza, a innych końców wiersza nie ma
+    n_rows = np.count_nonzero(newline) + 1
+    n_cells = len(found) + 1
+    if n_cells != n_rows * n_columns or not newline[found[n_columns - 1::n_columns]].all():
+        return None
+
+    # Koniec każdej komórki (indeks separatora) i liczba bajtów słowa przed
+    # jej początkiem
+    ends = np.empty(n_cells, dtype=np.intp)
+    np.add(found, first, out=ends[:-1])
+    ends[-1] = last
+    lead = np.empty_like(ends)
+    lead[0] = 8 - (ends[0] - first)
+    np.subtract(ends[:-1], ends[1:], out=lead[1:])
+    lead[1:] += 9
+
+    # CR przed końcem wiersza
+    if body.find(b'\r', first, last) >= 0:
+        line_ends = ends[n_columns - 1::n_columns]
+        cr = a.take(line_ends - 1) == _CR
+        line_ends -= cr
+        lead[n_columns - 1::n_columns] += cr
+
+    # Cudzysłowy otaczające całą komórkę. Sprawdzany jest tylko cudzysłów
+    # zamykający; pominięty bajt otwierający musi być cudzysłowem, bo każdy
+    # inny cudzysłów zostaje w komórce i odrzuca ją jako nie-cyfra, a liczba
+    # cudzysłowów w porcji musi wynosić dokładnie dwa na komórkę
+    n_quotes = np.count_nonzero(chunk == _QUOTE)
+    if n_quotes:
+        closing = a.take(ends - 1) == _QUOTE
+        if 2 * np.count_nonzero(closing) != n_quotes:
+            return None
+        closing = closing.astype(np.intp)
+        ends -= closing
+        closing <<= 1
+        lead += closing
+
+    values = _cell_values(body, first, last, cells, ends, lead, n_columns)
+    if values is None:
+        return None
+    return values.reshape(n_rows, n_columns)
+
+
+def _parse_lines(body, start, end, n_columns):
+    """
+    Parsuje wiersze body[start:end] porcjami, dzieląc je według separatorów.
+
+    Returns:
+        list: Macierze wartości kolejnych porcji lub None
+    """
+    a = np.frombuffer(body, dtype=np.uint8)
+    cells = np.ndarray((len(body) - 7,), dtype='<u8', buffer=body, strides=(1,))
+    chunks = []
+    first = start
+    while first < end:
+        last = body.find(b'\n', first + CHUNK_BYTES, end)
+        if last < 0:
+            last = end
+        values = _parse_rows(body, a, cells, first, last, n_columns)
+        if values is None:
+            return None
+        chunks.append(values)
+        first = last + 1
+    return chunks
+
+
+def _row_bounds(body, a, start, end):
+    """Początki i końce (bez CR) wierszy bufora body[start:end]."""
+    newline = a[start:end] == _NEWLINE
+    # Zwykle w każdym 8-bajtowym słowie jest najwyżej jeden koniec wiersza:
+    # wtedy słowo to 1 << (8 * bajt) i szuka się tylko niezerowych słów
+    n_words = len(newline) // 8
+    words = newline[:8 * n_words].view('<u8')
+    found = np.flatnonzero(words != 0)
+    hits = words[found]
+    if np.any(hits & (hits - _U64(1))):
+        row_end = np.flatnonzero(newline)
+    else:
+        row_end = found * 8 + np.frexp(hits.astype(np.float64))[1] // 8
+        row_end = np.append(row_end, np.flatnonzero(newline[8 * n_words:]) + 8 * n_words)
+    row_end = np.append(row_end + start, end)
+    row_start = np.empty_like(row_end)
+    row_start[0] = start
+    np.add(row_end[:-1], 1, out=row_start[1:])
+    if body.find(b'\r', start, end) >= 0:
+        row_end -= a.take(row_end - 1) == _CR
+    return row_start, row_end
+
+
+def _cell_template(sample):
+    """
+    Szablon komórki pomiarowej o kształcie komórki sample.
+
+    Słowo szablonu kończy się ostatnim znakiem komórki i obejmuje ją razem
+    z poprzedzającym separatorem: bajty stałe (separator, cudzysłowy, znak,
+    przecinek) muszą być równe bajtom próbki, a w miejscu cyfr próbki musi
+    stać dowolna cyfra.
+
+    Returns:
+        tuple: (xor, add, mask, k, scale, negative) - XOR zerujący poprawne
+            bajty, dodatek ustawiający bit 7 niepoprawnego bajtu, maska
+            bajtów komórki, bajt przecinka (-1 = brak), dzielnik mantysy
+            i czy komórki są ujemne; None, jeśli próbka się nie nadaje
+    """
+    match = _TEMPLATE_CELL.fullmatch(sample)
+    if match is None or len(sample) > 7 or not (match[3] or match[5]):
+        return None
+
+    word = b';' + sample
+    offset = 8 - len(word)
+    xor = add = mask = 0
+    for i, char in enumerate(word, offset):
+        digit = 0x30 <= char <= 0x39
+        xor |= (0x30 if digit else char) << (8 * i)
+        add |= (0x76 if digit else 0x7F) << (8 * i)
+        mask |= 0xFF << (8 * i)
+
+    # Po usunięciu przecinka cyfry kończą się przed zamykającym cudzysłowem,
+    # który jest liczony jak dodatkowe zero
+    trailing = len(match[5]) + (1 if match[1] else 0)
+    k = 7 - trailing if match[4] else -1
+    return _U64(xor), _U64(add), _U64(mask), k, np.float32(10 ** trailing), match[2] == b'-'
+
+
+def _find_template(body, row_start, row_end, n_traces):
+    """
+    Szablon komórki i jej szerokość z separatorem, wzięte z pierwszego
+    wiersza o komórkach pomiarowych równej szerokości (lub None).
+    """
+    for first, last in zip(row_start[:_TEMPLATE_ROWS].tolist(), row_end[:_TEMPLATE_ROWS].tolist()):
+        row = body[first:last].split(b';')
+        if len(row) == n_traces + 1 and len(set(map(len, row[1:]))) == 1:
+            template = _cell_template(row[1])
+            if template is not None:
+                return template, len(row[1]) + 1
+    return None
+
+
+def _parse_words(words, template):
+    """
+    Wartości komórek pomiarowych ze słów kończących się ostatnim znakiem
+    komórki.
+
+    Args:
+        words: Słowa komórek (wiersz × komórka), nadpisywane
+        template: Szablon komórki (_cell_template)
+
+    Returns:
+        tuple: (wartości float32, tablica niezerowa dla komórek niezgodnych
+            z szablonem)
+    """
+    xor, add, mask, k, scale, negative = template
+    digits = words
+    digits ^= xor
+    digits &= mask
+    other = digits + add
+    other |= digits
+    other &= _HIGH_BITS
+
+    if k >= 0:
+        # Bajty przed przecinkiem (już zerowym) o jeden bajt w górę
+        low = digits & ~_BYTES_FROM[k]
+        low *= _BYTE
+        digits += low
+
+    # Słowo szablonu ma najwyżej 7 cyfr, więc mantysa < 2**24 jest dokładna
+    # we float32, a iloraz przez 10**k poprawnie zaokrąglony - równy
+    # float32(float(komórka)), bo podwójne zaokrąglenie nic tu nie zmienia
+    mantissa = digits.view(np.uint8).reshape(-1, 8).astype(np.float32) @ _DIGIT_WEIGHTS
+    values = np.divide(mantissa.reshape(digits.shape), scale)
+    if negative:
+        np.negative(values, out=values)
+    return values, other
+
+
+def _parse_block(body, n_columns, start):
+    """Parsuje blok danych od bajtu start do (pozycje, dane) lub zwraca None."""
+    end = len(body)
+    while end > start and body[end - 1] in b'\r\n':
+        end -= 1
+    if end == start:
+        return np.empty(0), np.empty((n_columns - 1, 0), dtype=np.float32)
+    # Słowo pierwszej komórki zaczyna się do 8 bajtów przed blokiem
+    if start < 8 or end - start < 16:
+        body = b'\n' * 8 + body[start:end].ljust(16, b'\n')
+        end += 8 - start
+        start = 8
+
+    n_traces = n_columns - 1
+    a = np.frombuffer(body, dtype=np.uint8)
+    cells = np.ndarray((len(body) - 7,), dtype='<u8', buffer=body, strides=(1,))
+    row_start, row_end = _row_bounds(body, a, start, end)
+    n_rows = len(row_start)
+    positions = np.empty(n_rows)
+    data = np.empty((n_traces, n_rows), dtype=np.float32)
+
+    # Wiersze, których komórki pomiarowe są zgodne z szablonem
+    regular = np.zeros(n_rows, dtype=bool)
+    found = _find_template(body, row_start, row_end, n_traces)
+    if found is not None:
+        template, width = found
+        separator = row_end - n_traces * width
+        position_length = separator - row_start
+        rows = np.flatnonzero((position_length > 0) & (position_length <= 8))
+        starts = separator[rows] + (width - 8)
+        table = as_strided(cells, shape=(len(cells) - (n_traces - 1) * width, n_traces),
+                           strides=(1, width))
+        step = max(1, CHUNK_BYTES // (8 * n_traces))
+        for i in range(0, len(rows), step):
+            values, other = _parse_words(table[starts[i:i + step]], template)
+            matched = rows[i:i + step]
+            if other.any():
+                mismatch = other.any(axis=1)
+                values = values[~mismatch]
+                matched = matched[~mismatch]
+            data[:, matched] = values.T
+            regular[matched] = True
+
+        # Wiersze krótsze o width - 1 bajtów mają jedną pustą komórkę:
+        # komórki przed nią są wyrównane do separatora pozycji, a za nią
+        # do końca wiersza
+        if n_traces > 1:
+            rows = np.flatnonzero(~regular)
+            gap_separator = row_end[rows] - ((n_traces - 1) * width + 1)
+            gap_length = gap_separator - row_start[rows]
+            keep = ((gap_length > 0) & (gap_length <= 8)
+                    & (gap_separator + (width - 8) < len(table)))
+            rows = rows[keep]
+            gap_separator = gap_separator[keep]
+            columns = np.arange(n_traces)
+            first_bytes = as_strided(a, shape=(len(a) - (n_traces - 2) * width, n_traces - 1),
+                                     strides=(1, width))
+            for i in range(0, len(rows), step):
+                matched = rows[i:i + step]
+                before = gap_separator[i:i + step]
+                # Pusta komórka: pierwsza, za której separatorem stoi następny
+                # (ostatnia, jeśli żadna)
+                hit = first_bytes[before + 1] == _SEMICOLON
+                gap = np.where(hit.any(axis=1), hit.argmax(axis=1), n_traces - 1)
+                words = table[before + (width - 8)]
+                np.copyto(words, table[before - 7], where=columns > gap[:, None])
+                values, other = _parse_words(words, template)
+                cell = np.arange(len(gap))
+                other[cell, gap] = 0
+                values[cell, gap] = np.nan
+                mismatch = other.any(axis=1)
+                mismatch |= a[before + gap * width] != _SEMICOLON
+                if mismatch.any():
+                    values = values[~mismatch]
+                    matched = matched[~mismatch]
+                    before = before[~mismatch]
+                data[:, matched] = values.T
+                regular[matched] = True
+                separator[matched] = before
+
+        rows = np.flatnonzero(regular)
+        if len(rows):
+            values = _cell_values(body, start, end, cells, separator[rows],
+                                  row_start[rows] - separator[rows] + 8, 1)
+            if values is None:
+                regular[:] = False
+            else:
+                positions[rows] = values
+
+    # Pozostałe wiersze: podział według separatorów
+    rows = np.flatnonzero(~regular)
+    if len(rows) == n_rows:
+        chunks = _parse_lines(body, start, end, n_columns)
+    elif len(rows):
+        lines = b'\n'.join([b'\n' * 7] + [body[first:last] for first, last
+                                          in zip(row_start[rows].tolist(), row_end[rows].tolist())])
+        chunks = _parse_lines(lines, 8, len(lines), n_columns)
+    else:
+        chunks = []
+    if chunks is None:
+        return None
+
+    row = 0
+    for values in chunks:
+        chunk_rows = rows[row:row + len(values)]
+        positions[chunk_rows] = values[:, 0]
+        data[:, chunk_rows] = values[:, 1:].T
+        row += len(values)
+    if row != len(rows):  # Pusty wiersz wewnątrz bloku
+        return None
+    return positions, data
+
+
+def parse_body(body, n_traces, start=0):
+    """
+    Parsuje blok danych pliku CSV AP Sensing.
+
+    Puste wiersze i wiersze bez pozycji są pomijane, puste komórki
+    pomiarów dają NaN (jak parse_value).
+
+    Args:
+        body: Bajty pliku
+        n_traces: Liczba przebiegów (kolumn pomiarowych)
+        start: Indeks pierwszego bajtu bloku danych (po wierszach nagłówka)
+
+    Returns:
+        tuple: (pozycje float64, dane float32 (n_traces, n_pozycji))
+            lub None, jeśli blok wymaga parsowania komórka po komórce
+    """
+    parsed = _parse_block(body, n_traces + 1, start)
+    if parsed is None and _needs_filtering(body[start:]):
+        # Pomiń puste wiersze i wiersze bez pozycji, potem spróbuj ponownie
+        body = b'\n'.join(line for line in body[start:].split(b'\n')
+                          if line.strip(b'\r') and not line.startswith(b';'))
+        parsed = _parse_block(body, n_traces + 1, 0)
+    return parsed
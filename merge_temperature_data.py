@@ -2,103 +2,192 @@
 """
 Program do łączenia plików CSV z pomiarów temperatury AP Sensing.
 Łączy wszystkie pliki CSV z folderu w jeden plik posortowany chronologicznie.
+Pliki mogą być skompresowane (.csv.gz, .csv.bz2, .csv.xz) lub spakowane
+w archiwach .zip - są wtedy czytane bez rozpakowywania na dysk.
 """
 
+import argparse
+import json
 import os
-import csv
-from datetime import datetime
 from pathlib import Path
 
+import numpy as np
 
-def parse_datetime(date_str, time_str):
+import dts_metrics as metrics
+from dts_cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE, ParsedFileCache
+from dts_cube import format_values, iter_dts_files, merge_cubes, read_dts_file, write_dts_csv
+from dts_dedup import DuplicateReport
+from dts_grid import GridResampler, grid_fingerprint, parse_grid
+from dts_index import select_files
+from dts_source import find_data_files, source_name, source_signature, source_size
+from dts_store import DtsStore
+from dts_stream import DEFAULT_MAX_MEMORY, stream_merge
+from dts_time import parse_time_bound
+
+
+# Manifest scalonych plików zapisywany obok pliku wyjściowego
+MANIFEST_SUFFIX = '.manifest.json'
+
+
+def read_csv_file(filepath, cache=None):
     """
-    Parsuje datę i czas z formatu DD.MM.YYYY i HH:MM:SS.
+    Wczytuje pojedynczy plik CSV z pomiarami.
 
     Args:
-        date_str: Data w formacie DD.MM.YYYY
-        time_str: Czas w formacie HH:MM:SS
+        filepath: Ścieżka do pliku CSV
+        cache: Pamięć podręczna sparsowanych plików (ParsedFileCache, opcjonalnie)
 
     Returns:
-        datetime: Obiekt datetime
+        DtsCube: Kostka z przebiegami pliku:
+            - times: czasy przebiegów (datetime64)
+            - positions: pozycje (długości) czujnika
+            - data: macierz pomiarów float32 (przebieg × pozycja)
     """
-    datetime_str = f"{date_str} {time_str}"
-    return datetime.strptime(datetime_str, "%d.%m.%Y %H:%M:%S")
+    return read_dts_file(filepath, cache)
+
+
+def file_signature(filepath):
+    """Zwraca rozmiar i czas modyfikacji pliku (do wykrywania zmian)."""
+    size, mtime_ns = source_signature(filepath)
+    return {'size': size, 'mtime_ns': mtime_ns}
+
+
+def manifest_path(output_file):
+    """Zwraca ścieżkę manifestu dla pliku wyjściowego."""
+    return Path(f"{output_file}{MANIFEST_SUFFIX}")
 
 
-def read_csv_file(filepath):
+def source_entry(csv_file, data):
     """
-    Wczytuje pojedynczy plik CSV z pomiarami.
+    Tworzy wpis manifestu dla scalonego pliku źródłowego.
 
     Args:
-        filepath: Ścieżka do pliku CSV
+        csv_file: Ścieżka do pliku CSV
+        data: DtsCube z przebiegami pliku
 
     Returns:
-        dict: Słownik zawierający:
-            - dates: lista dat dla każdej kolumny pomiarów
-            - times: lista czasów dla każdej kolumny pomiarów
-            - datetimes: lista obiektów datetime dla sortowania
-            - positions: lista pozycji (długości) czujnika
-            - measurements: lista kolumn z pomiarami
-    """
-    with open(filepath, 'r', encoding='latin-1') as f:
-        reader = csv.reader(f, delimiter=';')
-
-        # Wczytaj pierwsze 4 wiersze nagłówkowe
-        date_row = next(reader)
-        time_row = next(reader)
-        x_units_row = next(reader)
-        y_units_row = next(reader)
-
-        # Wyciągnij daty i czasy (pomijając pierwszą kolumnę z etykietami)
-        dates = date_row[1:]
-        times = time_row[1:]
-
-        # Parsuj datetime dla każdej kolumny
-        datetimes = []
-        for date, time in zip(dates, times):
-            try:
-                dt = parse_datetime(date, time)
-                datetimes.append(dt)
-            except Exception as e:
-                print(f"Błąd parsowania daty/czasu w pliku {filepath}: {date} {time}")
-                raise e
-
-        # Wczytaj dane pomiarowe
-        positions = []
-        measurements = [[] for _ in range(len(dates))]
-
-        for row in reader:
-            if not row or not row[0]:  # Pomiń puste wiersze
-                continue
-
-            # Pierwsza kolumna to pozycja (zamień przecinek na kropkę)
-            position = row[0].replace(',', '.')
-            positions.append(position)
-
-            # Kolejne kolumny to pomiary (zamień przecinki na kropki, usuń cudzysłowy)
-            for i, value in enumerate(row[1:]):
-                cleaned_value = value.replace('"', '').replace(',', '.')
-                measurements[i].append(cleaned_value)
-
-        return {
-            'dates': dates,
-            'times': times,
-            'datetimes': datetimes,
-            'positions': positions,
-            'measurements': measurements
-        }
-
-
-def merge_csv_files(input_folder, output_file):
+        dict: Rozmiar, mtime, zakres czasu i liczba przebiegów pliku
+    """
+    entry = file_signature(csv_file)
+    entry['n_traces'] = data.n_traces
+    entry['first'] = str(data.times.min()) if data.n_traces else None
+    entry['last'] = str(data.times.max()) if data.n_traces else None
+    return entry
+
+
+def write_manifest(output_file, sources, positions):
+    """
+    Zapisuje manifest scalonych plików (atomowo).
+
+    Args:
+        output_file: Ścieżka do pliku wyjściowego
+        sources: Słownik nazwa_pliku -> wpis z source_entry
+        positions: Oś pozycji pliku wyjściowego
+    """
+    last_times = [entry['last'] for entry in sources.values() if entry['last']]
+    manifest = {
+        'output': file_signature(output_file),
+        'positions': np.asarray(positions).tolist(),
+        'last': max(last_times) if last_times else None,
+        'sources': sources,
+    }
+
+    path = manifest_path(output_file)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(output_file):
+    """
+    Wczytuje manifest, jeśli pasuje do aktualnego pliku wyjściowego.
+
+    Returns:
+        dict lub None, jeśli brak manifestu albo plik wyjściowy zmienił się od ostatniego scalenia
+    """
+    path = manifest_path(output_file)
+    if not path.exists() or not Path(output_file).exists():
+        return None
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('output') != file_signature(output_file):
+        return None
+    return manifest
+
+
+def append_columns(output_file, merged):
+    """
+    Dopisuje przebiegi jako nowe kolumny na końcu każdego wiersza pliku wyjściowego.
+
+    Istniejące wiersze są kopiowane jako tekst (bez parsowania), a nowe
+    wartości dopisywane na końcu; plik jest podmieniany atomowo.
+
+    Args:
+        output_file: Ścieżka do scalonego pliku (z wierszami X Units i Y Units)
+        merged: DtsCube z nowymi przebiegami (o tych samych pozycjach)
+    """
+    header_suffixes = [
+        merged.date_strings(),
+        merged.time_strings(),
+        ['[m]'] * merged.n_traces,
+        ['[°C]'] * merged.n_traces,
+    ]
+    n_header = len(header_suffixes)
+
+    output_file = Path(output_file)
+    tmp_path = output_file.with_name(output_file.name + '.tmp')
+    n_rows = 0
+    try:
+        with open(output_file, 'r', encoding='utf-8', newline='') as src, \
+                open(tmp_path, 'w', encoding='utf-8', newline='') as dst:
+            for line in src:
+                line = line.rstrip('\r\n')
+                if n_rows < n_header:
+                    cells = header_suffixes[n_rows]
+                else:
+                    i = n_rows - n_header
+                    if i >= merged.n_positions or line.split(';', 1)[0] != f"{merged.positions[i]:.2f}":
+                        raise ValueError(f"Pozycje w pliku {output_file.name} nie pasują do nowych danych")
+                    cells = format_values(merged.data[:, i])
+
+                dst.write(line + ';' + ';'.join(cells) + '\r\n')
+                n_rows += 1
+
+        if n_rows != n_header + merged.n_positions:
+            raise ValueError(f"Niepełny plik {output_file.name}: {n_rows} wierszy")
+
+        os.replace(tmp_path, output_file)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def merge_csv_files(input_folder, output_file, workers=1, cache=None, store_path=None,
+                    manifest=False, duplicates=None, resampler=None, start=None, end=None):
     """
     Łączy wszystkie pliki CSV z folderu w jeden plik posortowany chronologicznie.
 
     Args:
         input_folder: Ścieżka do folderu z plikami CSV
         output_file: Ścieżka do wyjściowego pliku CSV
+        workers: Liczba procesów parsujących pliki (1 = sekwencyjnie, None = liczba rdzeni)
+        cache: Pamięć podręczna sparsowanych plików (ParsedFileCache, opcjonalnie)
+        store_path: Katalog magazynu DtsStore, do którego dopisać nowe przebiegi (opcjonalnie)
+        manifest: Czy zapisać manifest scalonych plików (dla trybu przyrostowego)
+        duplicates: Raport duplikatów (DuplicateReport, None = bez deduplikacji)
+        resampler: Wspólna siatka pozycji (GridResampler); gdy podana, pliki
+            o innej osi pozycji są na nią przeliczane zamiast ostrzeżenia
+        start: Początek zakresu czasu (datetime64, None = bez limitu)
+        end: Koniec zakresu czasu włącznie (None = bez limitu); przy zakresie
+            wczytywane są tylko pliki, które na niego zachodzą (dts_index)
     """
     # Znajdź wszystkie pliki CSV
-    csv_files = list(Path(input_folder).glob('*.csv'))
+    csv_files = find_data_files(input_folder)
 
     if not csv_files:
         print(f"Nie znaleziono plików CSV w folderze: {input_folder}")
@@ -106,67 +195,265 @@ def merge_csv_files(input_folder, output_file):
 
     print(f"Znaleziono {len(csv_files)} plików CSV")
 
-    # Wczytaj wszystkie pliki i zbierz wszystkie pomiary
-    all_measurements = []
+    if start is not None or end is not None:
+        csv_files = select_files(csv_files, start, end)
+        print(f"Pliki zachodzące na zakres czasu: {len(csv_files)}")
+        if not csv_files:
+            return
+
+    # Wczytaj wszystkie pliki
+    cubes = []
+    sources = {}
     reference_positions = None
 
-    for csv_file in csv_files:
-        print(f"Przetwarzam: {csv_file.name}")
-        data = read_csv_file(csv_file)
-
-        # Sprawdź czy pozycje są takie same we wszystkich plikach
-        if reference_positions is None:
-            reference_positions = data['positions']
-        elif reference_positions != data['positions']:
-            print(f"UWAGA: Pozycje w pliku {csv_file.name} różnią się od referencyjnych!")
-
-        # Dodaj każdą kolumnę pomiarów z datą i czasem
-        for i, dt in enumerate(data['datetimes']):
-            all_measurements.append({
-                'datetime': dt,
-                'date': data['dates'][i],
-                'time': data['times'][i],
-                'measurements': data['measurements'][i]
-            })
-
-    # Posortuj pomiary chronologicznie
-    all_measurements.sort(key=lambda x: x['datetime'])
-
-    print(f"\nŁącznie pomiarów: {len(all_measurements)}")
-    print(f"Zakres dat: od {all_measurements[0]['datetime']} do {all_measurements[-1]['datetime']}")
+    with metrics.stage('file_parse') as stage:
+        for csv_file, data in iter_dts_files(csv_files, workers, cache):
+            print(f"Przetwarzam: {source_name(csv_file)}")
+            stage.add(rows=data.n_positions, cells=data.data.size,
+                      bytes_read=source_size(csv_file))
+
+            # Sprawdź czy pozycje są takie same we wszystkich plikach
+            if resampler is not None:
+                data = resampler.resample(data, source_name(csv_file))
+            elif reference_positions is None:
+                reference_positions = data.positions
+            elif not np.array_equal(reference_positions, data.positions):
+                print(f"UWAGA: Pozycje w pliku {source_name(csv_file)} różnią się od referencyjnych!")
+
+            cubes.append(data)
+            sources[source_name(csv_file)] = source_entry(csv_file, data)
+
+    # Połącz i posortuj pomiary chronologicznie
+    with metrics.stage('merge_sort') as stage:
+        merged = merge_cubes(cubes, duplicates, [source_name(csv_file) for csv_file in csv_files])
+        stage.add(rows=merged.n_traces, cells=merged.data.size)
+    merged = merged.time_window(start, end)
+    if not merged.n_traces:
+        print("Brak pomiarów w podanym zakresie czasu")
+        return
+    print_summary(duplicates, resampler)
+
+    print(f"\nŁącznie pomiarów: {merged.n_traces}")
+    print(f"Zakres dat: od {merged.times[0]} do {merged.times[-1]}")
 
     # Zapisz do pliku wyjściowego
-    with open(output_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f, delimiter=';')
+    write_dts_csv(merged, output_file, units=True)
+
+    print(f"\nPlik wyjściowy zapisany: {output_file}")
+    print(f"Liczba pozycji pomiarowych: {merged.n_positions}")
+    print(f"Liczba kolumn pomiarowych: {merged.n_traces}")
+
+    if manifest:
+        write_manifest(output_file, sources, merged.positions)
 
-        # Wiersz 1: Daty
-        date_row = ['Date:'] + [m['date'] for m in all_measurements]
-        writer.writerow(date_row)
+    # Dopisz nowe przebiegi do magazynu
+    if store_path is not None:
+        append_to_store(store_path, merged)
 
-        # Wiersz 2: Czasy
-        time_row = ['Time:'] + [m['time'] for m in all_measurements]
-        writer.writerow(time_row)
 
-        # Wiersz 3: Jednostki X
-        x_units_row = ['X Units:'] + ['[m]'] * len(all_measurements)
-        writer.writerow(x_units_row)
+def print_summary(*reports):
+    """Wypisuje podsumowania pominiętych duplikatów i przeliczonych osi pozycji."""
+    for report in reports:
+        if report is not None:
+            for message in report.messages():
+                print(message)
 
-        # Wiersz 4: Jednostki Y
-        y_units_row = ['Y Units:'] + ['[°C]'] * len(all_measurements)
-        writer.writerow(y_units_row)
 
-        # Wiersze z danymi pomiarowymi
-        for i, position in enumerate(reference_positions):
-            row = [position] + [m['measurements'][i] for m in all_measurements]
-            writer.writerow(row)
+def append_to_store(store_path, merged):
+    """Dopisuje do magazynu przebiegi nowsze niż już zapisane."""
+    store = DtsStore.open_or_create(store_path, merged.positions)
+    appended = store.append(merged, only_newer=True)
+    print(f"Magazyn {store_path}: dopisano {appended} pomiarów (łącznie {store.n_traces})")
 
+
+def merge_incremental(input_folder, output_file, workers=1, cache=None, store_path=None,
+                      duplicates=None, resampler=None):
+    """
+    Dopisuje do scalonego pliku tylko nowe pliki CSV z folderu.
+
+    Scalone pliki (rozmiar, mtime, zakres czasu) są zapisane w manifeście
+    obok pliku wyjściowego. Parsowane są tylko pliki spoza manifestu,
+    a ich przebiegi dopisywane jako nowe kolumny. Pełne scalanie jest
+    wykonywane, gdy brak manifestu, plik wyjściowy lub źródłowy zmienił
+    się, pozycje się różnią albo nowe pomiary przeplatają się w czasie
+    z już scalonymi.
+
+    Args:
+        input_folder: Ścieżka do folderu z plikami CSV
+        output_file: Ścieżka do wyjściowego pliku CSV
+        workers: Liczba procesów parsujących pliki
+        cache: Pamięć podręczna sparsowanych plików (opcjonalnie)
+        store_path: Katalog magazynu DtsStore (opcjonalnie)
+        duplicates: Raport duplikatów (DuplicateReport, None = bez deduplikacji)
+        resampler: Wspólna siatka pozycji (GridResampler, None = bez przeliczania)
+    """
+    def full_merge(reason):
+        print(f"{reason} - pełne scalanie")
+        merge_csv_files(input_folder, output_file, workers=workers, cache=cache,
+                        store_path=store_path, manifest=True, duplicates=duplicates,
+                        resampler=resampler)
+
+    csv_files = find_data_files(input_folder)
+
+    if not csv_files:
+        print(f"Nie znaleziono plików CSV w folderze: {input_folder}")
+        return
+
+    manifest = load_manifest(output_file)
+    if manifest is None:
+        full_merge("Brak aktualnego manifestu")
+        return
+
+    sources = manifest['sources']
+    new_files = []
+    for csv_file in csv_files:
+        entry = sources.get(source_name(csv_file))
+        if entry is None:
+            new_files.append(csv_file)
+        elif file_signature(csv_file) != {'size': entry['size'], 'mtime_ns': entry['mtime_ns']}:
+            full_merge(f"Plik {source_name(csv_file)} zmienił się od ostatniego scalenia")
+            return
+
+    if not new_files:
+        print("Brak nowych plików - plik wyjściowy jest aktualny")
+        return
+
+    print(f"Nowe pliki: {len(new_files)} (już scalonych: {len(sources)})")
+
+    reference_positions = np.asarray(manifest['positions'])
+    if resampler is not None and resampler.positions is not None and \
+            resampler.fingerprint != grid_fingerprint(reference_positions):
+        full_merge("Siatka pozycji różni się od scalonej")
+        return
+
+    # Pliki są najpierw tylko sprawdzane (pozycje, czas): przeliczenie siatki
+    # i deduplikacja trafiają do raportów, więc nie mogą poprzedzać pełnego
+    # scalania, które zapisałoby je drugi raz
+    parsed = []
+    last = np.datetime64(manifest['last']) if manifest['last'] else None
+    for csv_file, data in iter_dts_files(new_files, workers, cache):
+        print(f"Przetwarzam: {source_name(csv_file)}")
+        if resampler is None and not np.array_equal(reference_positions, data.positions):
+            full_merge(f"Pozycje w pliku {source_name(csv_file)} różnią się od scalonych")
+            return
+        if last is not None and data.n_traces and data.times.min() <= last:
+            full_merge("Nowe pomiary przeplatają się w czasie z już scalonymi")
+            return
+        parsed.append((csv_file, data))
+
+    if resampler is not None and resampler.positions is None:
+        resampler.set_grid(reference_positions)
+    cubes = []
+    new_sources = {}
+    for csv_file, data in parsed:
+        if resampler is not None:
+            data = resampler.resample(data, source_name(csv_file))
+        cubes.append(data)
+        new_sources[source_name(csv_file)] = source_entry(csv_file, data)
+
+    merged = merge_cubes(cubes, duplicates, list(new_sources))
+
+    print_summary(duplicates, resampler)
+    append_columns(output_file, merged)
+    sources.update(new_sources)
+    write_manifest(output_file, sources, reference_positions)
+
+    print(f"\nDopisano pomiarów: {merged.n_traces}")
+    if merged.n_traces:
+        print(f"Zakres dat: od {merged.times[0]} do {merged.times[-1]}")
+    print(f"Plik wyjściowy zaktualizowany: {output_file}")
+
+    if store_path is not None:
+        append_to_store(store_path, merged)
+
+
+def merge_csv_files_streaming(input_folder, output_file, max_memory=DEFAULT_MAX_MEMORY,
+                              duplicates=None):
+    """
+    Łączy pliki CSV strumieniowo, z ograniczonym zużyciem pamięci.
+
+    Pliki są scalane po nagłówkach (scalanie k posortowanych ciągów na
+    kopcu), a dane zapisywane blokami pozycji, więc pamięć nie rośnie
+    z długością kampanii pomiarowej.
+
+    Args:
+        input_folder: Ścieżka do folderu z plikami CSV
+        output_file: Ścieżka do wyjściowego pliku CSV
+        max_memory: Limit pamięci bufora bloku pozycji [B]
+        duplicates: Raport duplikatów (DuplicateReport, None = bez deduplikacji)
+    """
+    csv_files = find_data_files(input_folder)
+
+    if not csv_files:
+        print(f"Nie znaleziono plików CSV w folderze: {input_folder}")
+        return
+
+    print(f"Znaleziono {len(csv_files)} plików CSV (tryb strumieniowy, "
+          f"limit bufora {max_memory / 2**20:.0f} MB)")
+
+    summary = stream_merge(csv_files, output_file, max_memory=max_memory, units=True,
+                           duplicates=duplicates)
+    print_summary(duplicates)
+
+    print(f"\nŁącznie pomiarów: {summary['n_traces']}")
+    print(f"Zakres dat: od {summary['first']} do {summary['last']}")
     print(f"\nPlik wyjściowy zapisany: {output_file}")
-    print(f"Liczba pozycji pomiarowych: {len(reference_positions)}")
-    print(f"Liczba kolumn pomiarowych: {len(all_measurements)}")
+    print(f"Liczba pozycji pomiarowych: {summary['n_positions']} "
+          f"(bloki po {summary['block_rows']} pozycji)")
+    print(f"Liczba kolumn pomiarowych: {summary['n_traces']}")
 
 
 def main():
     """Główna funkcja programu."""
+    parser = argparse.ArgumentParser(description="Łączenie pomiarów temperatury AP Sensing")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="liczba procesów parsujących pliki (domyślnie: liczba rdzeni)")
+    parser.add_argument('--stream', action='store_true',
+                        help="łączenie strumieniowe z ograniczonym zużyciem pamięci")
+    parser.add_argument('--max-memory', type=int, default=DEFAULT_MAX_MEMORY // 2**20,
+                        help="limit pamięci bufora w trybie strumieniowym [MB] (domyślnie: %(default)s)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="dopisz tylko nowe pliki (manifest obok pliku wyjściowego)")
+    parser.add_argument('--store',
+                        help="katalog magazynu mapowanego w pamięci, do którego dopisać nowe przebiegi")
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help="nie pomijaj przebiegów o powtórzonym czasie i tych samych wartościach")
+    parser.add_argument('--resample', action='store_true',
+                        help="przelicz pliki o innej osi pozycji na wspólną siatkę "
+                             "(nie działa z --stream)")
+    parser.add_argument('--grid', metavar='START:KONIEC:KROK',
+                        help="siatka dla --resample [m] (domyślnie: oś pierwszego pliku)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="nie używaj pamięci podręcznej sparsowanych plików")
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR),
+                        help="katalog pamięci podręcznej (domyślnie: %(default)s)")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE // 2**20,
+                        help="limit rozmiaru pamięci podręcznej [MB] (domyślnie: %(default)s)")
+    parser.add_argument('--start', help="początek zakresu czasu (RRRR-MM-DD [GG:MM[:SS]]); "
+                                        "wczytywane są tylko pliki zachodzące na zakres")
+    parser.add_argument('--end', help="koniec zakresu czasu włącznie (sama data = cały dzień)")
+    parser.add_argument('--metrics', metavar='PLIK.json',
+                        help="zmierz czas i liczniki etapów i zapisz je w raporcie JSON")
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enable()
+    if args.resample and args.stream:
+        parser.error("--resample nie działa w trybie strumieniowym (--stream)")
+    if (args.start or args.end) and (args.stream or args.incremental):
+        parser.error("--start i --end nie działają z --stream ani --incremental")
+    try:
+        start = parse_time_bound(args.start)
+        end = parse_time_bound(args.end, end=True)
+    except ValueError as e:
+        parser.error(str(e))
+
+    resampler = None
+    if args.resample:
+        try:
+            resampler = GridResampler(parse_grid(args.grid) if args.grid else None)
+        except ValueError as e:
+            parser.error(str(e))
+
     # Ustaw ścieżki
     script_dir = Path(__file__).parent
     input_folder = script_dir / 'csv_data'
@@ -185,8 +472,26 @@ def main():
         return
 
     # Połącz pliki
-    merge_csv_files(input_folder, output_file)
-
+    cache = None
+    if not args.no_cache:
+        cache = ParsedFileCache(args.cache_dir, max_size=args.cache_size * 2**20)
+
+    duplicates = None
+    if not args.keep_duplicates:
+        duplicates = DuplicateReport()
+
+    if args.stream:
+        merge_csv_files_streaming(input_folder, output_file, max_memory=args.max_memory * 2**20,
+                                  duplicates=duplicates)
+    elif args.incremental:
+        merge_incremental(input_folder, output_file, workers=args.workers, cache=cache,
+                          store_path=args.store, duplicates=duplicates, resampler=resampler)
+    else:
+        merge_csv_files(input_folder, output_file, workers=args.workers, cache=cache,
+                        store_path=args.store, duplicates=duplicates, resampler=resampler,
+                        start=start, end=end)
+
+    metrics.publish(args.metrics)
     print("\nGotowe!")
 
 
@@ -6,11 +6,41 @@ Umożliwia wczytywanie plików CSV, łączenie ich, definiowanie czujników i ek
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import csv
 import os
-from datetime import datetime, timezone, timedelta
+import threading
 from pathlib import Path
 
+import numpy as np
+
+import dts_metrics as metrics
+from dts_aggregate import Aggregation
+from dts_cache import ParsedFileCache
+from dts_calibration import CALIBRATION_MODES
+from dts_cube import replace_when_done, write_dts_csv
+from dts_dedup import DuplicateReport
+from dts_engine import export_sensors, make_sensor, merge_files
+from dts_export import EXPORT_FORMATS, available_formats, format_for_path, write_cube
+from dts_grid import GridResampler
+from dts_index import file_spans, select_files
+from dts_jobs import BackgroundJob
+from dts_reference import DEFAULT_MAX_TIME_DIFF, read_reference_csv
+from dts_source import DATA_PATTERNS, expand_archives, find_data_files, source_name
+from dts_store import DtsStore
+from dts_time import DEFAULT_TIMEZONE, format_datetimes, parse_time_bound, timezone_offset
+
+
+# Odstęp odczytu komunikatów zadania w tle [ms]
+JOB_POLL_MS = 100
+
+# Liczba wątków zapisujących pliki czujników równolegle
+EXPORT_THREADS = 4
+
+# Wartość pola statystyk oznaczająca eksport pomiarów
+NO_AGGREGATION = 'brak'
+
+# Wartość pola trybu kalibracji oznaczająca tryb domyślny (offset/linear)
+AUTO_CALIBRATION = 'auto'
+
 
 class SensorDataProcessor:
     def __init__(self, root):
@@ -22,10 +52,16 @@ class SensorDataProcessor:
         # Dane aplikacji
         self.input_files = []
         self.merged_data = None
-        self.positions = []
+        self.axis = None
         self.sensors = []
+        self.reference_points = []  # Punkty (kanał, metr) formularza czujnika
         self.reference_data = None  # Dane z pliku svws_measurements.csv
         self.reference_channels = []  # Lista dostępnych kanałów (CH001, CH002, ...)
+        self.file_cache = ParsedFileCache()  # Pamięć podręczna sparsowanych plików
+        self.job = None  # Aktualne zadanie w tle (BackgroundJob)
+        self.job_on_done = None
+        self.job_error_message = ""
+        self.saved_button_states = []
 
         # Konfiguracja stylów
         self.setup_styles()
@@ -98,6 +134,18 @@ class SensorDataProcessor:
                               style='Info.TLabel', relief=tk.SUNKEN, anchor=tk.W)
         status_bar.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=(5, 0))
 
+        # Postęp zadań w tle
+        progress_frame = ttk.Frame(main_container)
+        progress_frame.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(5, 0))
+        progress_frame.columnconfigure(0, weight=1)
+
+        self.progress = ttk.Progressbar(progress_frame, mode='determinate')
+        self.progress.grid(row=0, column=0, sticky=(tk.W, tk.E))
+
+        self.btn_cancel = ttk.Button(progress_frame, text="✖ Anuluj",
+                                     command=self.cancel_job, state=tk.DISABLED)
+        self.btn_cancel.grid(row=0, column=1, padx=(10, 0))
+
     def create_tab1(self):
         """Zakładka wczytywania plików."""
         # Instrukcja
@@ -123,6 +171,40 @@ class SensorDataProcessor:
                                    state=tk.DISABLED)
         self.btn_merge.grid(row=0, column=2)
 
+        self.btn_open_store = ttk.Button(btn_frame, text="📦 Otwórz magazyn",
+                                         command=self.open_store, style='Action.TButton')
+        self.btn_open_store.grid(row=0, column=6, padx=(20, 0))
+
+        # Liczba procesów parsujących pliki
+        ttk.Label(btn_frame, text="Procesy:").grid(row=0, column=3, padx=(20, 5))
+        self.parse_workers = tk.IntVar()
+        self.parse_workers.set(os.cpu_count() or 1)
+        ttk.Spinbox(btn_frame, from_=1, to=64, textvariable=self.parse_workers,
+                    width=5).grid(row=0, column=4)
+
+        # Pamięć podręczna sparsowanych plików
+        self.use_cache = tk.BooleanVar()
+        self.use_cache.set(True)
+        ttk.Checkbutton(btn_frame, text="Pamięć podręczna",
+                        variable=self.use_cache).grid(row=0, column=5, padx=(20, 0))
+
+        # Zakres czasu scalania i eksportu (wczytywane są tylko pliki, które na niego zachodzą)
+        window_frame = ttk.Frame(btn_frame)
+        window_frame.grid(row=1, column=0, columnspan=7, sticky=tk.W, pady=(10, 0))
+        ttk.Label(window_frame, text="Zakres czasu od:").grid(row=0, column=0, padx=(0, 5))
+        self.time_start = tk.StringVar()
+        ttk.Entry(window_frame, textvariable=self.time_start, width=20).grid(row=0, column=1)
+        ttk.Label(window_frame, text="do:").grid(row=0, column=2, padx=5)
+        self.time_end = tk.StringVar()
+        ttk.Entry(window_frame, textvariable=self.time_end, width=20).grid(row=0, column=3)
+        ttk.Label(window_frame, text="(RRRR-MM-DD [GG:MM], puste = bez limitu)",
+                  style='Info.TLabel').grid(row=0, column=4, padx=(10, 0))
+
+        # Bez deduplikacji przebiegów o tym samym czasie i tych samych wartościach
+        self.keep_duplicates = tk.BooleanVar()
+        ttk.Checkbutton(window_frame, text="Zachowaj duplikaty",
+                        variable=self.keep_duplicates).grid(row=0, column=5, padx=(20, 0))
+
         # Lista plików
         list_label = ttk.Label(self.tab1, text="Wybrane pliki:", style='Title.TLabel')
         list_label.grid(row=2, column=0, sticky=tk.W, pady=(15, 5))
@@ -172,6 +254,20 @@ class SensorDataProcessor:
                                               style='Action.TButton')
         self.btn_select_reference.grid(row=0, column=0, padx=(0, 10))
 
+        # Maksymalna różnica czasu przy dopasowaniu (puste = bez limitu)
+        ttk.Label(btn_frame, text="Maks. różnica czasu [s]:").grid(row=0, column=1, padx=(10, 5))
+        self.reference_tolerance = tk.StringVar()
+        self.reference_tolerance.set(str(DEFAULT_MAX_TIME_DIFF))
+        ttk.Entry(btn_frame, textvariable=self.reference_tolerance, width=8).grid(row=0, column=2)
+
+        # Strefa czasowa nagłówków plików DTS (czasy UTC z pliku referencyjnego są do niej przeliczane)
+        ttk.Label(btn_frame, text="Strefa czasowa:").grid(row=0, column=3, padx=(20, 5))
+        self.reference_timezone = tk.StringVar()
+        self.reference_timezone.set(DEFAULT_TIMEZONE or '')
+        ttk.Entry(btn_frame, textvariable=self.reference_timezone, width=18).grid(row=0, column=4)
+        ttk.Label(btn_frame, text="(np. Europe/Warsaw, puste = strefa systemu)",
+                  style='Info.TLabel').grid(row=0, column=5, padx=(10, 0))
+
         # Informacja o wczytanym pliku
         self.reference_info = ttk.Label(self.tab1b, text="Nie wczytano pliku referencyjnego",
                                        style='Info.TLabel')
@@ -239,8 +335,24 @@ class SensorDataProcessor:
         self.sensor_ref_position = ttk.Entry(form_frame, width=10)
         self.sensor_ref_position.grid(row=1, column=3, padx=5, pady=5)
 
+        # Kolejne punkty kalibracji wielopunktowej (kanał + metr)
+        ttk.Button(form_frame, text="➕ Dodaj punkt",
+                   command=self.add_reference_point).grid(row=1, column=4, columnspan=2, padx=10, pady=5)
+        ttk.Button(form_frame, text="✖ Wyczyść punkty",
+                   command=self.clear_reference_points).grid(row=1, column=6, columnspan=2, padx=5, pady=5)
+
+        # Trzeci wiersz - tryb kalibracji i lista dodanych punktów
+        ttk.Label(form_frame, text="Tryb kalibracji:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
+        self.sensor_calibration = ttk.Combobox(form_frame, width=18, state='readonly',
+                                               values=[AUTO_CALIBRATION] + list(CALIBRATION_MODES))
+        self.sensor_calibration.grid(row=2, column=1, padx=5, pady=5)
+        self.sensor_calibration.current(0)
+
+        self.sensor_points_info = ttk.Label(form_frame, text="Punkty ref.: -", style='Info.TLabel')
+        self.sensor_points_info.grid(row=2, column=2, columnspan=2, sticky=tk.W, padx=5)
+
         ttk.Button(form_frame, text="➕ Dodaj czujnik",
-                  command=self.add_sensor, style='Action.TButton').grid(row=1, column=4, columnspan=2, padx=10, pady=5)
+                  command=self.add_sensor, style='Action.TButton').grid(row=2, column=4, columnspan=2, padx=10, pady=5)
 
         # Lista czujników
         list_label = ttk.Label(self.tab2, text="Zdefiniowane czujniki:", style='Title.TLabel')
@@ -252,7 +364,7 @@ class SensorDataProcessor:
         tree_frame.columnconfigure(0, weight=1)
         tree_frame.rowconfigure(0, weight=1)
 
-        columns = ('name', 'start', 'end', 'reversed', 'ref_channel', 'ref_position')
+        columns = ('name', 'start', 'end', 'reversed', 'ref_channel', 'ref_position', 'calibration')
         self.sensor_tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=10)
 
         self.sensor_tree.heading('name', text='Nazwa')
@@ -261,6 +373,7 @@ class SensorDataProcessor:
         self.sensor_tree.heading('reversed', text='Odwrócony')
         self.sensor_tree.heading('ref_channel', text='Kanał ref.')
         self.sensor_tree.heading('ref_position', text='Pozycja ref.')
+        self.sensor_tree.heading('calibration', text='Kalibracja')
 
         self.sensor_tree.column('name', width=150)
         self.sensor_tree.column('start', width=100)
@@ -268,6 +381,7 @@ class SensorDataProcessor:
         self.sensor_tree.column('reversed', width=80)
         self.sensor_tree.column('ref_channel', width=80)
         self.sensor_tree.column('ref_position', width=90)
+        self.sensor_tree.column('calibration', width=80)
 
         tree_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL,
                                        command=self.sensor_tree.yview)
@@ -310,6 +424,21 @@ class SensorDataProcessor:
         ttk.Button(export_frame, text="Przeglądaj...",
                   command=self.select_export_folder).grid(row=0, column=2, padx=5)
 
+        # Format plików czujników (npz/parquet - binarne, bez parsowania przy wczytaniu)
+        ttk.Label(export_frame, text="Format:").grid(row=1, column=0, sticky=tk.W, padx=5)
+        self.export_format = tk.StringVar()
+        self.export_format.set('csv')
+        ttk.Combobox(export_frame, textvariable=self.export_format, values=available_formats(),
+                     state='readonly', width=10).grid(row=1, column=1, sticky=tk.W, padx=5)
+
+        # Statystyki czasowe zamiast pomiarów (min/mean/max/std w przedziałach)
+        ttk.Label(export_frame, text="Statystyki:").grid(row=2, column=0, sticky=tk.W, padx=5)
+        self.export_aggregate = tk.StringVar()
+        self.export_aggregate.set(NO_AGGREGATION)
+        ttk.Combobox(export_frame, textvariable=self.export_aggregate,
+                     values=[NO_AGGREGATION, '15min', '1h', '6h', '1d'],
+                     width=10).grid(row=2, column=1, sticky=tk.W, padx=5)
+
         # Przyciski eksportu
         btn_frame = ttk.Frame(self.tab3)
         btn_frame.grid(row=2, column=0, sticky=tk.W, pady=10)
@@ -328,6 +457,19 @@ class SensorDataProcessor:
                                             state=tk.DISABLED)
         self.btn_export_sensors.grid(row=0, column=1)
 
+        self.btn_append_store = ttk.Button(btn_frame,
+                                           text="📦 Dopisz do magazynu",
+                                           command=self.append_to_store,
+                                           style='Action.TButton',
+                                           state=tk.DISABLED)
+        self.btn_append_store.grid(row=0, column=2, padx=(10, 0))
+
+        # Czas i liczniki etapów w logu po każdym zadaniu
+        self.collect_metrics = tk.BooleanVar()
+        self.collect_metrics.set(metrics.active() is not None)
+        ttk.Checkbutton(btn_frame, text="Statystyki etapów",
+                        variable=self.collect_metrics).grid(row=0, column=3, padx=(20, 0))
+
         # Log eksportu
         log_label = ttk.Label(self.tab3, text="Log eksportu:", style='Title.TLabel')
         log_label.grid(row=3, column=0, sticky=tk.W, pady=(15, 5))
@@ -353,217 +495,253 @@ class SensorDataProcessor:
                 messagebox.showerror("Błąd", f"Błąd podczas wczytywania pliku referencyjnego:\n{str(e)}")
 
     def load_reference_data(self, filepath):
-        """Wczytuje dane referencyjne z pliku CSV."""
-        with open(filepath, 'r', encoding='latin-1') as f:
-            reader = csv.reader(f, delimiter=';')
-            header = next(reader)
-
-            # Znajdź kolumny z kanałami (CHxxx_temp_val_c)
-            channels = {}
-            channel_names = []
-
-            for idx, col_name in enumerate(header):
-                if '_temp_val_c' in col_name:
-                    channel = col_name.split('_')[0]  # np. CH001
-                    channels[channel] = idx
-                    channel_names.append(channel)
-
-            # Wczytaj wszystkie wiersze
-            measurements = []
-            for row in reader:
-                if not row or not row[0]:
-                    continue
-
-                # Parsuj timestamp (UTC) i konwertuj na czas lokalny
-                timestamp_str = row[0]
-                try:
-                    # Timestamp w pliku jest w UTC
-                    timestamp_utc = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
-                    # Dodaj informację o UTC
-                    timestamp_utc = timestamp_utc.replace(tzinfo=timezone.utc)
-                    # Konwertuj na czas lokalny
-                    timestamp_local = timestamp_utc.astimezone()
-                    # Format dla wyświetlania (bez strefy czasowej)
-                    timestamp_local_str = timestamp_local.strftime("%Y-%m-%d %H:%M:%S")
-                except:
-                    continue
-
-                # Zbierz wartości temperatur dla każdego kanału
-                temps = {}
-                for channel, idx in channels.items():
-                    try:
-                        temp_val = float(row[idx].replace('"', ''))
-                        temps[channel] = temp_val
-                    except:
-                        temps[channel] = None
-
-                measurements.append({
-                    'timestamp': timestamp_local.replace(tzinfo=None),  # Dla porównania bez tzinfo
-                    'timestamp_str': timestamp_local_str,  # Już w czasie lokalnym
-                    'temperatures': temps
-                })
-
-            # Sortuj chronologicznie (powinny być już posortowane, ale dla pewności)
-            measurements.sort(key=lambda x: x['timestamp'])
-
-            self.reference_data = {
-                'channels': channel_names,
-                'measurements': measurements
-            }
-            self.reference_channels = channel_names
-
-            # Aktualizuj UI
-            self.reference_info.config(text=f"✓ Wczytano {len(measurements)} pomiarów referencyjnych | "
-                                           f"Kanały: {', '.join(channel_names)}")
-
-            self.channels_listbox.delete(0, tk.END)
-            for channel in channel_names:
-                self.channels_listbox.insert(tk.END, channel)
-
-            # Aktualizuj combobox w formularzu czujnika
-            self.sensor_ref_channel['values'] = ['Brak'] + channel_names
-
-            self.status_var.set("Dane referencyjne wczytane pomyślnie!")
+        """Wczytuje dane referencyjne z pliku CSV (sam nagłówek - pomiary przy eksporcie)."""
+        self.reference_data = read_reference_csv(filepath, self.get_timezone())
+        channel_names = self.reference_data.channels
+        self.reference_channels = channel_names
+
+        # Aktualizuj UI
+        self.reference_info.config(text=f"✓ Wczytano plik {Path(filepath).name} | "
+                                       f"Kanały: {', '.join(channel_names)}")
+
+        self.channels_listbox.delete(0, tk.END)
+        for channel in channel_names:
+            self.channels_listbox.insert(tk.END, channel)
+
+        # Aktualizuj combobox w formularzu czujnika
+        self.sensor_ref_channel['values'] = ['Brak'] + channel_names
+
+        self.status_var.set("Dane referencyjne wczytane pomyślnie!")
 
     def select_files(self):
         """Wybór pojedynczych plików CSV."""
         files = filedialog.askopenfilenames(
             title="Wybierz pliki CSV",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            filetypes=[("CSV files", DATA_PATTERNS), ("All files", "*.*")]
         )
         if files:
-            self.input_files = list(files)
+            try:
+                self.input_files = [str(f) for f in expand_archives(files)]
+            except ValueError as e:
+                messagebox.showerror("Błąd", str(e))
+                return
             self.update_file_list()
 
     def select_folder(self):
         """Wybór folderu z plikami CSV."""
         folder = filedialog.askdirectory(title="Wybierz folder z plikami CSV")
         if folder:
-            csv_files = list(Path(folder).glob("*.csv"))
+            try:
+                csv_files = find_data_files(folder)
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Błąd", str(e))
+                return
             self.input_files = [str(f) for f in csv_files]
             self.update_file_list()
 
     def update_file_list(self):
-        """Aktualizuje listę wybranych plików."""
-        self.file_listbox.delete(0, tk.END)
-        for file in self.input_files:
-            self.file_listbox.insert(tk.END, Path(file).name)
+        """
+        Aktualizuje listę wybranych plików; zakresy czasu z indeksu nagłówków
+        są dopisywane po jego odświeżeniu w tle.
+        """
+        self.show_file_list({})
 
         if self.input_files:
             self.btn_merge.config(state=tk.NORMAL)
-            self.status_var.set(f"Wybrano {len(self.input_files)} plików")
+            self.start_job("Indeksowanie plików...", "Błąd podczas indeksowania plików",
+                           self.run_file_spans, self.on_file_spans_done, list(self.input_files))
         else:
             self.btn_merge.config(state=tk.DISABLED)
 
-    def parse_datetime(self, date_str, time_str):
-        """Parsuje datę i czas."""
-        datetime_str = f"{date_str} {time_str}"
-        return datetime.strptime(datetime_str, "%d.%m.%Y %H:%M:%S")
-
-    def read_csv_file(self, filepath):
-        """Wczytuje pojedynczy plik CSV."""
-        with open(filepath, 'r', encoding='latin-1') as f:
-            reader = csv.reader(f, delimiter=';')
-
-            date_row = next(reader)
-            time_row = next(reader)
-            x_units_row = next(reader)  # Pomijamy
-            y_units_row = next(reader)  # Pomijamy
-
-            dates = date_row[1:]
-            times = time_row[1:]
-
-            datetimes = []
-            for date, time in zip(dates, times):
-                dt = self.parse_datetime(date, time)
-                datetimes.append(dt)
+    def show_file_list(self, spans):
+        """Wypełnia listę plików (z zakresem czasu, jeśli jest w spans)."""
+        self.file_listbox.delete(0, tk.END)
+        for file in self.input_files:
+            first, last = spans.get(file, (None, None))
+            if first is None:
+                self.file_listbox.insert(tk.END, source_name(file))
+            else:
+                first, last = format_datetimes([first, last])
+                self.file_listbox.insert(tk.END, f"{source_name(file)}    {first} - {last}")
 
-            positions = []
-            measurements = [[] for _ in range(len(dates))]
+    def run_file_spans(self, job, files):
+        """Odświeża indeksy nagłówków plików (wykonywane w wątku roboczym)."""
+        return files, file_spans(files)
 
-            for row in reader:
-                if not row or not row[0]:
-                    continue
+    def on_file_spans_done(self, result):
+        """Uzupełnia listę plików o zakresy czasu."""
+        files, spans = result
+        if files == self.input_files:
+            self.show_file_list(spans)
+        self.status_var.set(f"Wybrano {len(files)} plików")
 
-                position = row[0].replace(',', '.')
-                positions.append(float(position))
+    def get_file_cache(self):
+        """Zwraca pamięć podręczną plików lub None, jeśli wyłączona."""
+        return self.file_cache if self.use_cache.get() else None
 
-                for i, value in enumerate(row[1:]):
-                    cleaned_value = value.replace('"', '').replace(',', '.')
-                    measurements[i].append(cleaned_value)
+    def get_time_window(self):
+        """Zwraca zakres czasu (początek, koniec) jako datetime64 (None = bez limitu)."""
+        return (parse_time_bound(self.time_start.get()),
+                parse_time_bound(self.time_end.get(), end=True))
 
-            return {
-                'dates': dates,
-                'times': times,
-                'datetimes': datetimes,
-                'positions': positions,
-                'measurements': measurements
-            }
+    def windowed_data(self):
+        """Zwraca scalone dane ograniczone do zakresu czasu."""
+        return self.merged_data.time_window(*self.get_time_window())
 
     def merge_files(self):
-        """Scala wszystkie wybrane pliki."""
+        """Scala wszystkie wybrane pliki (w tle)."""
         if not self.input_files:
             messagebox.showwarning("Ostrzeżenie", "Nie wybrano żadnych plików!")
             return
 
-        self.status_var.set("Scalanie plików...")
-        self.root.update()
+        try:
+            start, end = self.get_time_window()
+        except ValueError as e:
+            messagebox.showerror("Błąd", str(e))
+            return
+
+        self.start_job("Scalanie plików...", "Błąd podczas scalania plików",
+                       self.run_merge, self.on_merge_done,
+                       list(self.input_files), self.parse_workers.get(), self.get_file_cache(),
+                       start, end, self.keep_duplicates.get())
+
+    def run_merge(self, job, files, workers, cache, start=None, end=None, keep_duplicates=False):
+        """Wczytuje i scala pliki (wykonywane w wątku roboczym)."""
+        if start is not None or end is not None:
+            # Tylko pliki zachodzące na zakres (według indeksu nagłówków)
+            selected = select_files(files, start, end)
+            self.log_export(f"Zakres czasu: wczytywanie {len(selected)} z {len(files)} plików")
+            if not selected:
+                raise ValueError("Żaden plik nie zawiera pomiarów z wybranego zakresu czasu")
+            files = selected
+
+        duplicates = None if keep_duplicates else DuplicateReport()
+        resampler = GridResampler()  # Oś pierwszego pliku
+        merged = merge_files(files, workers, cache, progress=job.progress,
+                             duplicates=duplicates, resampler=resampler)
+        messages = resampler.messages()
+        if duplicates is not None:
+            messages = duplicates.messages() + messages
+        for message in messages:
+            self.log_export(message)
+        dropped = duplicates.n_dropped if duplicates is not None else 0
+        return merged.time_window(start, end), dropped, len(files)
+
+    def on_merge_done(self, result):
+        """Aktualizuje interfejs po scaleniu plików."""
+        merged, dropped, n_files = result
+        header = f"✓ Scalono pomyślnie!\nPlików: {n_files}"
+        if dropped:
+            header += f" | Pominięte duplikaty: {dropped}"
+        self.set_merged_data(merged, header)
+        self.btn_append_store.config(state=tk.NORMAL)
+        self.status_var.set("Pliki scalone pomyślnie!")
+
+        # Przejdź do następnej zakładki
+        self.notebook.select(1)
+
+    def set_merged_data(self, merged_data, header):
+        """Ustawia scalone dane (DtsCube lub DtsStore) i aktualizuje interfejs."""
+        self.merged_data = merged_data
+        reference_positions = np.asarray(merged_data.positions)
+        self.axis = merged_data.axis
+
+        info_text = (f"{header} | "
+                    f"Pomiarów: {merged_data.n_traces} | "
+                    f"Pozycji: {len(reference_positions)} | "
+                    f"Zakres: {reference_positions[0]:.2f}m - {reference_positions[-1]:.2f}m")
+        self.merge_info.config(text=info_text)
+
+        self.range_info.config(text=f"Dostępny zakres danych: {reference_positions[0]:.2f}m - {reference_positions[-1]:.2f}m (co 0.25m)")
+
+        self.btn_export_merged.config(state=tk.NORMAL)
+
+    def open_store(self):
+        """Otwiera magazyn scalonych danych (bez wczytywania pomiarów do pamięci)."""
+        folder = filedialog.askdirectory(title="Wybierz folder magazynu")
+        if not folder:
+            return
 
         try:
-            all_measurements = []
-            reference_positions = None
-
-            for csv_file in self.input_files:
-                data = self.read_csv_file(csv_file)
-
-                if reference_positions is None:
-                    reference_positions = data['positions']
-                    self.positions = reference_positions
-
-                for i, dt in enumerate(data['datetimes']):
-                    all_measurements.append({
-                        'datetime': dt,
-                        'date': data['dates'][i],
-                        'time': data['times'][i],
-                        'measurements': data['measurements'][i]
-                    })
-
-            # Sortuj chronologicznie
-            all_measurements.sort(key=lambda x: x['datetime'])
-
-            self.merged_data = {
-                'positions': reference_positions,
-                'measurements': all_measurements
-            }
-
-            # Aktualizuj interfejs
-            info_text = (f"✓ Scalono pomyślnie!\n"
-                        f"Plików: {len(self.input_files)} | "
-                        f"Pomiarów: {len(all_measurements)} | "
-                        f"Pozycji: {len(reference_positions)} | "
-                        f"Zakres: {reference_positions[0]:.2f}m - {reference_positions[-1]:.2f}m")
-            self.merge_info.config(text=info_text)
-
-            self.range_info.config(text=f"Dostępny zakres danych: {reference_positions[0]:.2f}m - {reference_positions[-1]:.2f}m (co 0.25m)")
-
-            self.btn_export_merged.config(state=tk.NORMAL)
-            self.status_var.set("Pliki scalone pomyślnie!")
-
-            # Przejdź do następnej zakładki
+            store = DtsStore(folder)
+            if store.n_traces == 0:
+                messagebox.showwarning("Ostrzeżenie", "Magazyn jest pusty!")
+                return
+
+            self.set_merged_data(store, f"✓ Otwarto magazyn: {Path(folder).name}")
+            self.btn_append_store.config(state=tk.DISABLED)
+            self.status_var.set("Magazyn otwarty pomyślnie!")
             self.notebook.select(1)
 
         except Exception as e:
-            messagebox.showerror("Błąd", f"Błąd podczas scalania plików:\n{str(e)}")
-            self.status_var.set("Błąd podczas scalania")
+            messagebox.showerror("Błąd", f"Błąd podczas otwierania magazynu:\n{str(e)}")
+
+    def append_to_store(self):
+        """Dopisuje scalone dane do magazynu (tylko przebiegi nowsze niż zapisane)."""
+        if not self.merged_data:
+            messagebox.showwarning("Ostrzeżenie", "Brak danych do zapisu!")
+            return
+
+        folder = filedialog.askdirectory(title="Wybierz folder magazynu")
+        if not folder:
+            return
+
+        self.start_job("Zapis do magazynu...", "Błąd podczas zapisu do magazynu",
+                       self.run_append_store, self.on_append_store_done,
+                       self.merged_data, folder)
+
+    def run_append_store(self, job, merged_data, folder):
+        """Dopisuje dane do magazynu (wykonywane w wątku roboczym)."""
+        job.progress("Zapis do magazynu", 0, merged_data.n_traces)
+        store = DtsStore.open_or_create(folder, merged_data.positions)
+        appended = store.append(merged_data, only_newer=True)
+        job.progress("Zapis do magazynu", merged_data.n_traces, merged_data.n_traces)
+        return folder, appended, merged_data.n_traces - appended, store.n_traces
+
+    def on_append_store_done(self, result):
+        """Aktualizuje interfejs po zapisie do magazynu."""
+        folder, appended, skipped, total = result
+        self.log_export(f"✓ Magazyn {Path(folder).name}: dopisano {appended} pomiarów"
+                        f"{f', pominięto {skipped} już zapisanych' if skipped else ''}"
+                        f" (łącznie {total})")
+        self.status_var.set("Zapis do magazynu zakończony pomyślnie")
 
     def find_nearest_position(self, target):
         """Znajduje najbliższą dostępną pozycję."""
-        if not self.positions:
+        if self.axis is None or len(self.axis) == 0:
             return None
 
-        target_float = float(target)
-        nearest = min(self.positions, key=lambda x: abs(x - target_float))
-        return nearest
+        return self.axis.nearest(target)
+
+    def add_reference_point(self):
+        """Dodaje punkt referencyjny (kanał + metr) do formularza czujnika."""
+        ref_channel = self.sensor_ref_channel.get()
+        ref_position = self.sensor_ref_position.get().strip()
+
+        if ref_channel == 'Brak' or not ref_position:
+            messagebox.showwarning("Ostrzeżenie", "Wybierz kanał i podaj metr czujnika referencyjnego!")
+            return
+
+        try:
+            float(ref_position)
+        except ValueError:
+            messagebox.showerror("Błąd", "Podaj poprawną wartość liczbową dla metra!")
+            return
+
+        self.reference_points.append((ref_channel, ref_position))
+        self.sensor_ref_channel.current(0)
+        self.sensor_ref_position.delete(0, tk.END)
+        self.update_reference_points()
+
+    def clear_reference_points(self):
+        """Usuwa punkty referencyjne z formularza czujnika."""
+        self.reference_points = []
+        self.update_reference_points()
+
+    def update_reference_points(self):
+        """Aktualizuje opis punktów referencyjnych formularza."""
+        points = ", ".join(f"{channel}@{position}m" for channel, position in self.reference_points)
+        self.sensor_points_info.config(text=f"Punkty ref.: {points or '-'}")
 
     def add_sensor(self):
         """Dodaje nowy czujnik do listy."""
@@ -577,6 +755,7 @@ class SensorDataProcessor:
         reverse = self.sensor_reverse.get()
         ref_channel = self.sensor_ref_channel.get()
         ref_position = self.sensor_ref_position.get().strip()
+        calibration = self.sensor_calibration.get()
 
         if not name or not start or not end:
             messagebox.showwarning("Ostrzeżenie", "Wypełnij wszystkie pola podstawowe!")
@@ -587,72 +766,75 @@ class SensorDataProcessor:
             messagebox.showwarning("Ostrzeżenie", "Podaj metr czujnika referencyjnego!")
             return
 
-        if ref_channel != 'Brak' and not self.reference_data:
+        # Punkty dodane przyciskiem i punkt wpisany w pola formularza
+        points = list(self.reference_points)
+        if ref_channel != 'Brak':
+            points.append((ref_channel, ref_position))
+
+        if points and not self.reference_data:
             messagebox.showwarning("Ostrzeżenie", "Najpierw wczytaj plik referencyjny!")
             return
 
-        try:
-            # Znajdź najbliższe pozycje
-            start_nearest = self.find_nearest_position(start)
-            end_nearest = self.find_nearest_position(end)
-
-            if start_nearest is None or end_nearest is None:
-                messagebox.showerror("Błąd", "Nie można znaleźć pozycji!")
-                return
-
-            # Przygotuj dane czujnika
-            sensor = {
-                'name': name,
-                'start': start_nearest,
-                'end': end_nearest,
-                'reversed': reverse,
-                'ref_channel': None if ref_channel == 'Brak' else ref_channel,
-                'ref_position': None
-            }
-
-            # Jeśli podano dane referencyjne, znajdź najbliższą pozycję
-            if ref_channel != 'Brak':
-                ref_position_nearest = self.find_nearest_position(ref_position)
-                sensor['ref_position'] = ref_position_nearest
-
-            self.sensors.append(sensor)
-
-            # Dodaj do treeview
-            reverse_text = "TAK" if reverse else "NIE"
-            ref_channel_text = ref_channel if ref_channel != 'Brak' else '-'
-            ref_position_text = f"{sensor['ref_position']:.2f}m" if sensor['ref_position'] is not None else '-'
-
-            self.sensor_tree.insert('', tk.END, values=(name, f"{start_nearest:.2f}m",
-                                                       f"{end_nearest:.2f}m", reverse_text,
-                                                       ref_channel_text, ref_position_text))
-
-            # Wyczyść pola
-            self.sensor_name.delete(0, tk.END)
-            self.sensor_start.delete(0, tk.END)
-            self.sensor_end.delete(0, tk.END)
-            self.sensor_reverse.set(False)
-            self.sensor_ref_channel.current(0)
-            self.sensor_ref_position.delete(0, tk.END)
-
-            self.btn_export_sensors.config(state=tk.NORMAL)
-            self.status_var.set(f"Dodano czujnik: {name}")
-
-            # Pokaż info jeśli wartości zostały skorygowane
-            corrections = []
-            if float(start) != start_nearest:
-                corrections.append(f"Start: {start} → {start_nearest:.2f}m")
-            if float(end) != end_nearest:
-                corrections.append(f"Koniec: {end} → {end_nearest:.2f}m")
-            if ref_position and float(ref_position) != sensor['ref_position']:
-                corrections.append(f"Pozycja ref.: {ref_position} → {sensor['ref_position']:.2f}m")
-
-            if corrections:
-                messagebox.showinfo("Informacja",
-                                  f"Skorygowano pozycje do najbliższych dostępnych:\n" +
-                                  "\n".join(corrections))
+        if self.axis is None or len(self.axis) == 0:
+            messagebox.showerror("Błąd", "Nie można znaleźć pozycji!")
+            return
 
+        try:
+            start_value, end_value = float(start), float(end)
+            references = [(channel, float(position)) for channel, position in points]
         except ValueError:
             messagebox.showerror("Błąd", "Podaj poprawne wartości liczbowe dla metrów!")
+            return
+
+        try:
+            # Pozycje dopasowane do najbliższych dostępnych
+            sensor = make_sensor(self.axis, name, start_value, end_value, reverse, references=references,
+                                 calibration=None if calibration == AUTO_CALIBRATION else calibration)
+        except ValueError as e:
+            messagebox.showerror("Błąd", str(e))
+            return
+
+        self.sensors.append(sensor)
+
+        # Dodaj do treeview
+        reverse_text = "TAK" if reverse else "NIE"
+        references = sensor['references']
+        ref_channel_text = ", ".join(channel for channel, _ in references) or '-'
+        ref_position_text = ", ".join(f"{position:.2f}m" for _, position in references) or '-'
+        calibration_text = sensor['calibration'] if references else '-'
+
+        self.sensor_tree.insert('', tk.END, values=(name, f"{sensor['start']:.2f}m",
+                                                   f"{sensor['end']:.2f}m", reverse_text,
+                                                   ref_channel_text, ref_position_text,
+                                                   calibration_text))
+
+        # Wyczyść pola
+        self.sensor_name.delete(0, tk.END)
+        self.sensor_start.delete(0, tk.END)
+        self.sensor_end.delete(0, tk.END)
+        self.sensor_reverse.set(False)
+        self.sensor_ref_channel.current(0)
+        self.sensor_ref_position.delete(0, tk.END)
+        self.sensor_calibration.current(0)
+        self.clear_reference_points()
+
+        self.btn_export_sensors.config(state=tk.NORMAL)
+        self.status_var.set(f"Dodano czujnik: {name}")
+
+        # Pokaż info jeśli wartości zostały skorygowane
+        corrections = []
+        if start_value != sensor['start']:
+            corrections.append(f"Start: {start} → {sensor['start']:.2f}m")
+        if end_value != sensor['end']:
+            corrections.append(f"Koniec: {end} → {sensor['end']:.2f}m")
+        for (channel, position), (_, nearest) in zip(points, references):
+            if float(position) != nearest:
+                corrections.append(f"Pozycja ref. {channel}: {position} → {nearest:.2f}m")
+
+        if corrections:
+            messagebox.showinfo("Informacja",
+                              f"Skorygowano pozycje do najbliższych dostępnych:\n" +
+                              "\n".join(corrections))
 
     def remove_sensor(self):
         """Usuwa wybrany czujnik."""
@@ -679,39 +861,46 @@ class SensorDataProcessor:
             messagebox.showwarning("Ostrzeżenie", "Brak danych do eksportu!")
             return
 
+        try:
+            merged_data = self.windowed_data()
+        except ValueError as e:
+            messagebox.showerror("Błąd", str(e))
+            return
+
+        fmt = self.export_format.get()
         filepath = filedialog.asksaveasfilename(
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv")],
-            initialfile="merged_temperature_data.csv"
+            defaultextension=EXPORT_FORMATS[fmt],
+            filetypes=[(f"{name.upper()} files", f"*{EXPORT_FORMATS[name]}")
+                       for name in [fmt] + [f for f in available_formats() if f != fmt]],
+            initialfile=f"merged_temperature_data{EXPORT_FORMATS[fmt]}"
         )
 
         if not filepath:
             return
 
-        try:
-            with open(filepath, 'w', encoding='utf-8', newline='') as f:
-                writer = csv.writer(f, delimiter=';')
+        self.start_job("Zapis scalonego pliku...", "Błąd podczas eksportu",
+                       self.run_export_merged, self.on_export_merged_done,
+                       merged_data, filepath)
 
-                # Wiersz dat
-                date_row = ['Date:'] + [m['date'] for m in self.merged_data['measurements']]
-                writer.writerow(date_row)
+    def run_export_merged(self, job, merged_data, filepath):
+        """Zapisuje scalony plik (wykonywane w wątku roboczym)."""
+        def progress(done, total):
+            job.progress("Zapis scalonego pliku", done, total)
 
-                # Wiersz czasów
-                time_row = ['Time:'] + [m['time'] for m in self.merged_data['measurements']]
-                writer.writerow(time_row)
-
-                # Dane pomiarowe
-                for i, position in enumerate(self.merged_data['positions']):
-                    row = [f"{position:.2f}"] + [m['measurements'][i]
-                                                 for m in self.merged_data['measurements']]
-                    writer.writerow(row)
-
-            self.log_export(f"✓ Zapisano scalony plik: {Path(filepath).name}")
-            messagebox.showinfo("Sukces", f"Plik zapisany:\n{filepath}")
-            self.status_var.set("Eksport zakończony pomyślnie")
+        # Zapis bez wierszy X Units i Y Units; plik pojawia się dopiero po zakończeniu
+        fmt = format_for_path(filepath)
+        with replace_when_done(filepath) as part:
+            if fmt == 'csv':
+                write_dts_csv(merged_data, part, units=False, progress=progress)
+            else:
+                write_cube(merged_data, part, fmt, progress=progress)
+        return filepath
 
-        except Exception as e:
-            messagebox.showerror("Błąd", f"Błąd podczas eksportu:\n{str(e)}")
+    def on_export_merged_done(self, filepath):
+        """Aktualizuje interfejs po zapisie scalonego pliku."""
+        self.log_export(f"✓ Zapisano scalony plik: {Path(filepath).name}")
+        messagebox.showinfo("Sukces", f"Plik zapisany:\n{filepath}")
+        self.status_var.set("Eksport zakończony pomyślnie")
 
     def export_all_sensors(self):
         """Eksportuje wszystkie zdefiniowane czujniki."""
@@ -725,176 +914,160 @@ class SensorDataProcessor:
             return
 
         try:
-            for sensor in self.sensors:
-                self.export_single_sensor(sensor, export_dir)
+            max_diff = self.get_max_time_diff()
+            self.refresh_reference_timezone()
+            merged_data = self.windowed_data()
+            aggregation = self.get_aggregation()
+        except ValueError as e:
+            messagebox.showerror("Błąd", str(e))
+            return
 
-            self.log_export(f"\n{'='*60}")
-            self.log_export(f"✓ Wyeksportowano wszystkie czujniki ({len(self.sensors)} sztuk)")
-            self.log_export(f"Lokalizacja: {export_dir}")
+        if not merged_data.n_traces:
+            messagebox.showwarning("Ostrzeżenie", "Brak pomiarów w wybranym zakresie czasu!")
+            return
 
-            messagebox.showinfo("Sukces",
-                              f"Wyeksportowano {len(self.sensors)} czujników\n"
-                              f"do folderu:\n{export_dir}")
-            self.status_var.set(f"Wyeksportowano {len(self.sensors)} czujników")
+        self.start_job("Eksport czujników...", "Błąd podczas eksportu czujników",
+                       self.run_export_sensors, self.on_export_sensors_done,
+                       list(self.sensors), export_dir, max_diff, self.export_format.get(),
+                       merged_data, aggregation)
+
+    def run_export_sensors(self, job, sensors, export_dir, max_diff, fmt='csv', merged_data=None,
+                           aggregation=None):
+        """Eksportuje czujniki (wykonywane w wątku roboczym)."""
+        if merged_data is None:
+            merged_data = self.merged_data
+        export_sensors(merged_data, sensors, export_dir, self.reference_data, max_diff,
+                       log=self.log_export, threads=EXPORT_THREADS, progress=job.progress,
+                       fmt=fmt, aggregation=aggregation)
+        return len(sensors), export_dir
+
+    def on_export_sensors_done(self, result):
+        """Aktualizuje interfejs po eksporcie czujników."""
+        count, export_dir = result
+        self.log_export(f"\n{'='*60}")
+        self.log_export(f"✓ Wyeksportowano wszystkie czujniki ({count} sztuk)")
+        self.log_export(f"Lokalizacja: {export_dir}")
+
+        messagebox.showinfo("Sukces",
+                          f"Wyeksportowano {count} czujników\n"
+                          f"do folderu:\n{export_dir}")
+        self.status_var.set(f"Wyeksportowano {count} czujników")
+
+        # Przejdź do zakładki eksportu
+        self.notebook.select(2)
+
+    def get_max_time_diff(self):
+        """Zwraca maksymalną różnicę czasu dopasowania w sekundach (None = bez limitu)."""
+        value = self.reference_tolerance.get().strip()
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError(f"Niepoprawna maksymalna różnica czasu: {value}")
+
+    def get_timezone(self):
+        """Zwraca strefę czasową nagłówków plików DTS (None = strefa systemu)."""
+        value = self.reference_timezone.get().strip() or None
+        timezone_offset(value)  # Nieznana strefa - ValueError
+        return value
+
+    def refresh_reference_timezone(self):
+        """Otwiera ponownie plik referencyjny, jeśli od wczytania zmieniono strefę czasową."""
+        timezone = self.get_timezone()
+        if self.reference_data is not None and self.reference_data.timezone != timezone:
+            self.reference_data = read_reference_csv(self.reference_data.filepath, timezone)
+
+    def get_aggregation(self):
+        """Zwraca statystyki czasowe eksportu (None = eksport pomiarów)."""
+        value = self.export_aggregate.get().strip()
+        if not value or value == NO_AGGREGATION:
+            return None
+        return Aggregation(value)
 
-            # Przejdź do zakładki eksportu
-            self.notebook.select(2)
+    def log_export(self, message):
+        """Dodaje wpis do logu eksportu (z wątku roboczego - przez kolejkę zadania)."""
+        if threading.current_thread() is not threading.main_thread():
+            self.job.log(message)
+            return
 
-        except Exception as e:
-            messagebox.showerror("Błąd", f"Błąd podczas eksportu czujników:\n{str(e)}")
+        self.export_log.insert(tk.END, message + "\n")
+        self.export_log.see(tk.END)
 
-    def find_reference_temperature(self, measurement_datetime, channel):
-        """
-        Znajduje najbliższy pomiar referencyjny dla danej daty/godziny i kanału.
-        Zwraca (temperature, ref_datetime_str) lub (None, None) jeśli nie znaleziono.
+    def action_buttons(self):
+        """Przyciski blokowane na czas zadania w tle."""
+        return [self.btn_select, self.btn_select_folder, self.btn_merge, self.btn_open_store,
+                self.btn_export_merged, self.btn_export_sensors, self.btn_append_store]
+
+    def start_job(self, description, error_message, target, on_done, *args):
         """
-        if not self.reference_data or channel not in self.reference_data['channels']:
-            return None, None
+        Uruchamia zadanie w wątku roboczym.
 
-        # Znajdź najbliższy pomiar w czasie
-        min_diff = None
-        best_measurement = None
+        Postęp i komunikaty są odczytywane przez poll_job (root.after),
+        a po zakończeniu wywoływane jest on_done(wynik) w wątku interfejsu.
+        """
+        if self.job is not None:
+            messagebox.showwarning("Ostrzeżenie", "Trwa inne zadanie!")
+            return
 
-        for ref_measurement in self.reference_data['measurements']:
-            time_diff = abs((ref_measurement['timestamp'] - measurement_datetime).total_seconds())
-            if min_diff is None or time_diff < min_diff:
-                min_diff = time_diff
-                best_measurement = ref_measurement
+        self.saved_button_states = [(btn, str(btn.cget('state'))) for btn in self.action_buttons()]
+        for btn in self.action_buttons():
+            btn.config(state=tk.DISABLED)
+        self.btn_cancel.config(state=tk.NORMAL)
+        self.progress.config(maximum=1, value=0)
+        self.status_var.set(description)
 
-        if best_measurement and best_measurement['temperatures'][channel] is not None:
-            return best_measurement['temperatures'][channel], best_measurement['timestamp_str']
+        if self.collect_metrics.get():
+            metrics.enable()
         else:
-            return None, None
-
-    def export_single_sensor(self, sensor, export_dir):
-        """Eksportuje dane pojedynczego czujnika."""
-        # Znajdź indeksy pozycji
-        positions = self.merged_data['positions']
-
-        start_idx = positions.index(sensor['start'])
-        end_idx = positions.index(sensor['end'])
-
-        # Upewnij się że start < end
-        if start_idx > end_idx:
-            start_idx, end_idx = end_idx, start_idx
-
-        # Wyciągnij fragment
-        sensor_positions = positions[start_idx:end_idx+1]
-
-        # Jeśli odwrócony, odwróć pozycje
-        if sensor['reversed']:
-            sensor_positions = sensor_positions[::-1]
-
-        # Nazwa pliku
-        filename = f"{sensor['name'].replace(' ', '_')}.csv"
-        filepath = os.path.join(export_dir, filename)
-
-        # Jeśli czujnik ma dane referencyjne, przygotuj je
-        ref_temps = []
-        ref_datetimes = []
-        offsets = []  # Offset dla każdego pomiaru
-        has_reference = sensor['ref_channel'] is not None and sensor['ref_position'] is not None
-
-        if has_reference:
-            # Znajdź indeks pozycji czujnika referencyjnego
-            ref_position_idx = positions.index(sensor['ref_position'])
-
-            # Dla każdego pomiaru światłowodowego znajdź odpowiedni pomiar referencyjny
-            for measurement in self.merged_data['measurements']:
-                ref_temp, ref_datetime = self.find_reference_temperature(
-                    measurement['datetime'],
-                    sensor['ref_channel']
-                )
-                ref_temps.append(ref_temp if ref_temp is not None else '')
-                ref_datetimes.append(ref_datetime if ref_datetime is not None else '')
-
-                # Oblicz offset (różnica między temperaturą referencyjną a światłowodową)
-                if ref_temp is not None:
-                    try:
-                        fiber_temp_at_ref_position = float(measurement['measurements'][ref_position_idx])
-                        offset = ref_temp - fiber_temp_at_ref_position
-                        offsets.append(offset)
-                    except:
-                        offsets.append(0.0)
-                else:
-                    offsets.append(0.0)
-
-        # Zapisz do pliku
-        with open(filepath, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f, delimiter=';')
-
-            # Wiersz dat
-            date_row = ['Date:'] + [m['date'] for m in self.merged_data['measurements']]
-            writer.writerow(date_row)
-
-            # Wiersz czasów
-            time_row = ['Time:'] + [m['time'] for m in self.merged_data['measurements']]
-            writer.writerow(time_row)
-
-            # Jeśli są dane referencyjne, dodaj wiersze
-            if has_reference:
-                # Wiersz z temperaturą referencyjną
-                ref_temp_row = [f'Ref_Temp({sensor["ref_channel"]}@{sensor["ref_position"]:.2f}m):'] + ref_temps
-                writer.writerow(ref_temp_row)
-
-                # Wiersz z datą/godziną referencyjną
-                ref_datetime_row = ['Ref_DateTime:'] + ref_datetimes
-                writer.writerow(ref_datetime_row)
-
-            # Dane pomiarowe
-            if sensor['reversed']:
-                # Odwrócone dane
-                for i in range(len(sensor_positions)):
-                    original_idx = end_idx - i
-                    position = sensor_positions[i]
-
-                    # Zastosuj offset jeśli są dane referencyjne
-                    if has_reference:
-                        row = [f"{position:.2f}"]
-                        for j, m in enumerate(self.merged_data['measurements']):
-                            try:
-                                calibrated_value = float(m['measurements'][original_idx]) + offsets[j]
-                                row.append(f"{calibrated_value:.2f}")
-                            except:
-                                row.append(m['measurements'][original_idx])
-                        writer.writerow(row)
-                    else:
-                        row = [f"{position:.2f}"] + [m['measurements'][original_idx]
-                                                     for m in self.merged_data['measurements']]
-                        writer.writerow(row)
+            metrics.disable()
+
+        self.job_on_done = on_done
+        self.job_error_message = error_message
+        self.job = BackgroundJob(target, *args)
+        self.job.start()
+        self.root.after(JOB_POLL_MS, self.poll_job)
+
+    def poll_job(self):
+        """Odczytuje komunikaty zadania w tle i aktualizuje pasek postępu."""
+        for kind, payload in self.job.messages():
+            if kind == 'progress':
+                stage, done, total = payload
+                self.progress.config(maximum=max(total, 1), value=done)
+                self.status_var.set(f"{stage}: {done}/{total}")
+            elif kind == 'log':
+                self.log_export(payload)
             else:
-                # Normalne dane
-                for i in range(len(sensor_positions)):
-                    original_idx = start_idx + i
-                    position = sensor_positions[i]
-
-                    # Zastosuj offset jeśli są dane referencyjne
-                    if has_reference:
-                        row = [f"{position:.2f}"]
-                        for j, m in enumerate(self.merged_data['measurements']):
-                            try:
-                                calibrated_value = float(m['measurements'][original_idx]) + offsets[j]
-                                row.append(f"{calibrated_value:.2f}")
-                            except:
-                                row.append(m['measurements'][original_idx])
-                        writer.writerow(row)
-                    else:
-                        row = [f"{position:.2f}"] + [m['measurements'][original_idx]
-                                                     for m in self.merged_data['measurements']]
-                        writer.writerow(row)
-
-        ref_info = ""
-        if has_reference:
-            ref_info = f" | Ref: {sensor['ref_channel']}@{sensor['ref_position']:.2f}m"
-
-        self.log_export(f"✓ {sensor['name']}: {sensor['start']:.2f}m - {sensor['end']:.2f}m "
-                       f"({'odwrócony' if sensor['reversed'] else 'normalny'}){ref_info} → {filename}")
+                self.finish_job(kind, payload)
+                return
 
-    def log_export(self, message):
-        """Dodaje wpis do logu eksportu."""
-        self.export_log.insert(tk.END, message + "\n")
-        self.export_log.see(tk.END)
-        self.root.update()
+        self.root.after(JOB_POLL_MS, self.poll_job)
+
+    def finish_job(self, kind, payload):
+        """Kończy zadanie w tle: odblokowuje przyciski i obsługuje wynik."""
+        on_done = self.job_on_done
+        self.job = None
+
+        for btn, state in self.saved_button_states:
+            btn.config(state=state)
+        self.btn_cancel.config(state=tk.DISABLED)
+        self.progress.config(value=0)
+
+        if kind == 'done':
+            on_done(payload)
+            metrics.publish(log=self.log_export)
+        elif kind == 'cancelled':
+            self.log_export("✖ Zadanie anulowane")
+            self.status_var.set("Zadanie anulowane")
+        else:
+            messagebox.showerror("Błąd", f"{self.job_error_message}:\n{str(payload)}")
+            self.status_var.set(self.job_error_message)
+
+    def cancel_job(self):
+        """Przerywa zadanie w tle (pliki w trakcie zapisu są usuwane)."""
+        if self.job is not None:
+            self.job.cancel()
+            self.status_var.set("Anulowanie...")
 
 
 def main():